@@ -1,5 +1,11 @@
+import bisect
 import logging
 import os
+import queue
+import threading
+import time
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
 
 from boto3 import Session
@@ -10,6 +16,11 @@ from skymantle_boto_buddy import EnableCache, get_boto3_client
 
 logger = logging.getLogger()
 
+_stack_outputs_cache: dict[tuple, tuple[float, dict]] = {}
+_stack_outputs_lock = threading.Lock()
+_exports_cache: dict[tuple, tuple[float, dict[str, str], list[str]]] = {}
+_exports_lock = threading.Lock()
+
 
 def get_cloudformation_client(
     region_name: str | None = None,
@@ -35,13 +46,385 @@ def describe_stacks(stack_name: str, *, region_name: str | None = None, session:
     return response
 
 
-def get_stack_outputs(stack_name: str, *, region_name: str | None = None, session: Session = None) -> dict:
+def _outputs(stack: dict) -> dict:
+    return {output["OutputKey"]: output["OutputValue"] for output in stack.get("Outputs", [])}
+
+
+def _cache_outputs(region_name: str | None, session: Session, stack_name: str, outputs: dict) -> None:
+    with _stack_outputs_lock:
+        _stack_outputs_cache[(region_name, session, stack_name)] = (time.monotonic(), outputs)
+
+
+def _cached_outputs(region_name: str | None, session: Session, stack_name: str, ttl: float) -> dict | None:
+    with _stack_outputs_lock:
+        cached = _stack_outputs_cache.get((region_name, session, stack_name))
+
+    if cached and time.monotonic() - cached[0] < ttl:
+        return dict(cached[1])
+
+    return None
+
+
+def clear_stack_outputs_cache() -> None:
+    with _stack_outputs_lock:
+        _stack_outputs_cache.clear()
+
+
+def get_stack_outputs(
+    stack_name: str, *, ttl: float = 0, region_name: str | None = None, session: Session = None
+) -> dict:
+    """Returns the outputs of a stack by output key.
+
+    Args:
+        stack_name (str): The stack name or id
+        ttl (float, optional): Seconds outputs read earlier are reused without calling describe_stacks,
+            0 always calls it. Defaults to 0.
+
+    Returns:
+        dict: The output values by key
+    """
+    if (outputs := _cached_outputs(region_name, session, stack_name, ttl)) is not None:
+        return outputs
+
     response = describe_stacks(stack_name, region_name=region_name, session=session)
+    outputs = _outputs(response["Stacks"][0])
+    _cache_outputs(region_name, session, stack_name, outputs)
+
+    return dict(outputs)
 
-    stack_outputs = response["Stacks"][0]["Outputs"]
 
+def get_outputs_for_stacks(
+    stack_names: list[str],
+    *,
+    all_stacks: bool = False,
+    ttl: float = 0,
+    max_concurrency: int = 8,
+    region_name: str | None = None,
+    session: Session = None,
+) -> dict[str, dict]:
+    """Returns the outputs of many stacks, stacks not cached are described concurrently. With all_stacks a
+    single paginated describe_stacks lists every stack of the account instead, which needs fewer calls when
+    there are many stacks to resolve. Every stack listed is cached.
+
+    Args:
+        stack_names (list[str]): The stack names
+        all_stacks (bool, optional): Describe all stacks instead of one call per stack. Defaults to False.
+        ttl (float, optional): Seconds outputs read earlier are reused, see get_stack_outputs. Defaults to 0.
+        max_concurrency (int, optional): Number of describe_stacks calls running at the same time. Defaults to 8.
+
+    Returns:
+        dict[str, dict]: The outputs of each stack by stack name
+    """
     outputs = {}
-    for stack_output in stack_outputs:
-        outputs[stack_output["OutputKey"]] = stack_output["OutputValue"]
+    for stack_name in stack_names:
+        if (cached := _cached_outputs(region_name, session, stack_name, ttl)) is not None:
+            outputs[stack_name] = cached
+
+    missing = [stack_name for stack_name in dict.fromkeys(stack_names) if stack_name not in outputs]
+
+    if missing and all_stacks:
+        cloudformation_client = get_cloudformation_client(region_name, session)
+        paginator = cloudformation_client.get_paginator("describe_stacks")
+
+        listed = {}
+        for page in paginator.paginate():
+            for stack in page["Stacks"]:
+                listed[stack["StackName"]] = _outputs(stack)
+                _cache_outputs(region_name, session, stack["StackName"], listed[stack["StackName"]])
+
+        for stack_name in missing:
+            if stack_name not in listed:
+                raise Exception(f"Cannot find stack {stack_name} in {cloudformation_client.meta.region_name}")
+            outputs[stack_name] = dict(listed[stack_name])
+
+    elif missing:
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            responses = executor.map(
+                lambda stack_name: get_stack_outputs(stack_name, region_name=region_name, session=session), missing
+            )
+            outputs.update(zip(missing, responses, strict=True))
+
+    return {stack_name: outputs[stack_name] for stack_name in stack_names}
+
+
+def clear_exports_cache() -> None:
+    with _exports_lock:
+        _exports_cache.clear()
+
+
+def _get_export_index(ttl: float, region_name: str | None, session: Session) -> tuple[dict[str, str], list[str]]:
+    with _exports_lock:
+        cached = _exports_cache.get((region_name, session))
+
+    if cached and time.monotonic() - cached[0] < ttl:
+        return cached[1], cached[2]
+
+    cloudformation_client = get_cloudformation_client(region_name, session)
+    paginator = cloudformation_client.get_paginator("list_exports")
+
+    values = {}
+    for page in paginator.paginate():
+        for export in page.get("Exports", []):
+            values[export["Name"]] = export["Value"]
+
+    names = sorted(values)
+
+    with _exports_lock:
+        _exports_cache[(region_name, session)] = (time.monotonic(), values, names)
+
+    return values, names
+
+
+def get_exports(*, ttl: float = 0, region_name: str | None = None, session: Session = None) -> dict[str, str]:
+    """Returns every export of the region by name, read with a paginated list_exports and kept in an index that
+    is reused for `ttl` seconds.
+
+    Args:
+        ttl (float, optional): Seconds the index is reused without calling list_exports, 0 always calls it.
+            Defaults to 0.
+
+    Returns:
+        dict[str, str]: The export values by name
+    """
+    values, _ = _get_export_index(ttl, region_name, session)
+    return dict(values)
+
+
+def get_export_value(name: str, *, ttl: float = 0, region_name: str | None = None, session: Session = None) -> str:
+    """Returns the value of an export from the export index, see get_exports."""
+    values, _ = _get_export_index(ttl, region_name, session)
+
+    if name not in values:
+        region = get_cloudformation_client(region_name, session).meta.region_name
+        raise Exception(f"Cannot find export {name} in {region}")
+
+    return values[name]
+
+
+def get_export_values(
+    names: list[str], *, ttl: float = 0, region_name: str | None = None, session: Session = None
+) -> dict[str, str]:
+    """Returns the values of many exports from a single export index, see get_exports. Raises when an export
+    doesn't exist."""
+    values, _ = _get_export_index(ttl, region_name, session)
+
+    if missing := [name for name in names if name not in values]:
+        region = get_cloudformation_client(region_name, session).meta.region_name
+        raise Exception(f"Cannot find exports {', '.join(missing)} in {region}")
+
+    return {name: values[name] for name in names}
+
+
+def get_exports_by_prefix(
+    prefix: str, *, ttl: float = 0, region_name: str | None = None, session: Session = None
+) -> dict[str, str]:
+    """Returns the exports with a name starting with a prefix, found with a binary search of the sorted export
+    names, see get_exports."""
+    values, names = _get_export_index(ttl, region_name, session)
+
+    start = bisect.bisect_left(names, prefix)
+    end = start
+    while end < len(names) and names[end].startswith(prefix):
+        end += 1
+
+    return {name: values[name] for name in names[start:end]}
+
+
+def iter_stack_resources(stack_name: str, *, region_name: str | None = None, session: Session = None) -> Iterator[dict]:
+    """Yields the resource summaries of a stack (LogicalResourceId, PhysicalResourceId, ResourceType,
+    ResourceStatus, ...), following NextToken one page at a time."""
+    cloudformation_client = get_cloudformation_client(region_name, session)
+    paginator = cloudformation_client.get_paginator("list_stack_resources")
+
+    try:
+        for page in paginator.paginate(StackName=stack_name):
+            yield from page.get("StackResourceSummaries", [])
+    except ClientError as e:
+        raise Exception(f"Cannot find stack {stack_name} in {cloudformation_client.meta.region_name}") from e
+
+
+def _is_terminal_stack_event(event: dict) -> bool:
+    """Whether an event ends an operation of the stack itself, nested stacks have their own stack id"""
+    return (
+        event["ResourceType"] == "AWS::CloudFormation::Stack"
+        and event.get("PhysicalResourceId") == event["StackId"]
+        and not event["ResourceStatus"].endswith("_IN_PROGRESS")
+    )
+
+
+def _iter_events(cloudformation_client, stack_name: str) -> Iterator[dict]:
+    paginator = cloudformation_client.get_paginator("describe_stack_events")
+
+    try:
+        for page in paginator.paginate(StackName=stack_name):
+            yield from page.get("StackEvents", [])
+    except ClientError as e:
+        raise Exception(f"Cannot find stack {stack_name} in {cloudformation_client.meta.region_name}") from e
+
+
+def _read_new_events(cloudformation_client, stack: str, last_event_id: str | None) -> tuple[list[dict], dict | None]:
+    """Returns the events newer than the last event seen, newest first. Without a last event the events of the
+    operation in progress are returned, or the event that ended the last operation when none is in progress."""
+    events = []
+
+    # Pages are newest first, only the events since the last poll are read
+    for event in _iter_events(cloudformation_client, stack):
+        if event["EventId"] == last_event_id:
+            break
+
+        if last_event_id is None and _is_terminal_stack_event(event):
+            return events, None if events else event
+
+        events.append(event)
+
+    return events, None
+
+
+def _tail_stack_events(
+    cloudformation_client, stack_name: str, after_event_id: str | None, polling: dict, stopped: threading.Event
+) -> Iterator[dict]:
+    stack = stack_name
+    last_event_id = after_event_id
+    interval = polling["min_interval"]
+    deadline = None if polling["timeout"] is None else time.monotonic() + polling["timeout"]
+
+    while True:
+        events, idle_event = _read_new_events(cloudformation_client, stack, last_event_id)
+
+        if idle_event:
+            if polling["stop_on_terminal"]:
+                return
+            stack, last_event_id = idle_event["StackId"], idle_event["EventId"]
+
+        if events:
+            # Poll by stack id so a deleted stack can still be followed
+            stack, last_event_id = events[0]["StackId"], events[0]["EventId"]
+            interval = polling["min_interval"]
+
+            for event in reversed(events):
+                yield event
+                if polling["stop_on_terminal"] and _is_terminal_stack_event(event):
+                    return
+        else:
+            interval = min(interval * 2, polling["max_interval"])
+
+        if deadline is not None and time.monotonic() + interval > deadline:
+            return
+
+        if stopped.wait(interval):
+            return
+
+
+def iter_stack_events(
+    stack_name: str,
+    *,
+    follow: bool = False,
+    after_event_id: str | None = None,
+    min_interval: float = 1.0,
+    max_interval: float = 15.0,
+    timeout: float | None = None,
+    stop_on_terminal: bool = True,
+    region_name: str | None = None,
+    session: Session = None,
+) -> Iterator[dict]:
+    """Yields the events of a stack. Without follow the history is yielded newest first, one page at a time.
+    With follow new events are tailed oldest first: each poll only reads the pages newer than the last event
+    seen, the polling interval doubles up to `max_interval` while nothing happens and resets to `min_interval`
+    when events arrive. Tailing stops when the stack operation completes or fails.
+
+    Args:
+        stack_name (str): The stack name or id
+        follow (bool, optional): Keep polling for new events. Defaults to False.
+        after_event_id (str | None, optional): Only yield events newer than this event, e.g. the id of the
+            newest event read before starting a deployment. When None, following starts with the first event
+            of the operation in progress and stops at once when no operation is in progress. Defaults to None.
+        min_interval (float, optional): Seconds between polls while events arrive. Defaults to 1.
+        max_interval (float, optional): Maximum seconds between polls. Defaults to 15.
+        timeout (float | None, optional): Seconds after which following stops, None follows until the
+            operation ends. Defaults to None.
+        stop_on_terminal (bool, optional): Stop following when the stack reaches a complete or failed status.
+            Defaults to True.
+
+    Yields:
+        Iterator[dict]: The stack events
+    """
+    cloudformation_client = get_cloudformation_client(region_name, session)
+
+    if not follow:
+        for event in _iter_events(cloudformation_client, stack_name):
+            if event["EventId"] == after_event_id:
+                return
+            yield event
+        return
+
+    polling = {
+        "min_interval": min_interval,
+        "max_interval": max_interval,
+        "timeout": timeout,
+        "stop_on_terminal": stop_on_terminal,
+    }
+    yield from _tail_stack_events(cloudformation_client, stack_name, after_event_id, polling, threading.Event())
+
+
+def iter_events_for_stacks(
+    stack_names: list[str],
+    *,
+    after_event_ids: dict[str, str] | None = None,
+    min_interval: float = 1.0,
+    max_interval: float = 15.0,
+    timeout: float | None = None,
+    stop_on_terminal: bool = True,
+    region_name: str | None = None,
+    session: Session = None,
+) -> Iterator[dict]:
+    """Tails the events of many stacks concurrently, each stack is followed on its own thread like
+    iter_stack_events with follow and events are yielded as they arrive. Ends when every stack stopped.
+
+    Args:
+        stack_names (list[str]): The stack names or ids
+        after_event_ids (dict[str, str] | None, optional): The event to start after by stack name.
+            Defaults to None.
+    """
+    cloudformation_client = get_cloudformation_client(region_name, session)
+    after_event_ids = after_event_ids or {}
+    polling = {
+        "min_interval": min_interval,
+        "max_interval": max_interval,
+        "timeout": timeout,
+        "stop_on_terminal": stop_on_terminal,
+    }
+
+    events: queue.Queue = queue.Queue()
+    stopped = threading.Event()
+    done = object()
+
+    def tail(stack_name: str) -> None:
+        try:
+            tailed = _tail_stack_events(
+                cloudformation_client, stack_name, after_event_ids.get(stack_name), polling, stopped
+            )
+            for event in tailed:
+                events.put(event)
+        except Exception as e:
+            events.put(e)
+        finally:
+            events.put(done)
+
+    executor = ThreadPoolExecutor(max_workers=max(len(stack_names), 1))
+    try:
+        for stack_name in stack_names:
+            executor.submit(tail, stack_name)
+
+        remaining = len(stack_names)
+        while remaining:
+            event = events.get()
 
-    return outputs
+            if event is done:
+                remaining -= 1
+            elif isinstance(event, Exception):
+                raise event
+            else:
+                yield event
+    finally:
+        stopped.set()
+        executor.shutdown(wait=True, cancel_futures=True)
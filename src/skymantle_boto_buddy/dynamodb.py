@@ -1,16 +1,37 @@
 import logging
 import os
+import threading
+import time
+from collections.abc import Hashable
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
+from functools import lru_cache
 from typing import Any
 
 from boto3 import Session
+from boto3.dynamodb.conditions import ConditionExpressionBuilder
 from botocore.client import Config
+from botocore.exceptions import ClientError
 
 from skymantle_boto_buddy import EnableCache, get_boto3_resource
 
 logger = logging.getLogger()
 
 
+MAX_TRANSACTION_ITEMS = 100
+UPDATE_EXPRESSION_CACHE_SIZE = 1024
+
+
+class TransactionCancelledError(Exception):
+    """Raised when a transaction is cancelled, `reasons` has one cancellation reason per operation of the
+    cancelled transaction, in the same order as `operations`."""
+
+    def __init__(self, message: str, operations: list[dict], reasons: list[dict]) -> None:
+        super().__init__(message)
+        self.operations = operations
+        self.reasons = reasons
+
+
 class ReturnValues(Enum):
     NONE = 1
     ALL_OLD = 2
@@ -53,40 +74,344 @@ def put_item_simplified(
     return response
 
 
+@lru_cache(maxsize=UPDATE_EXPRESSION_CACHE_SIZE)
+def _build_update_expression(
+    set_fields: tuple[str, ...],
+    if_not_exists_fields: tuple[str, ...],
+    append_fields: tuple[str, ...],
+    add_fields: tuple[str, ...],
+    remove_fields: tuple[str, ...],
+) -> tuple[str, dict[str, str], tuple[str, ...]]:
+    """Builds an update expression for the shape of an update, the attribute names of each clause.
+    Cached so repeated updates with the same shape don't rebuild the expression, the cache is bounded because
+    attribute names can depend on the data being written.
+
+    Returns:
+        tuple[str, dict[str, str], tuple[str, ...]]: The update expression, the attribute name placeholders
+            and the value placeholders in the order of set, if_not_exists, append and add fields.
+    """
+    set_expressions: list[str] = []
+    add_expressions: list[str] = []
+    remove_expressions: list[str] = []
+    names = {}
+    value_placeholders = []
+
+    count = 0
+    for fields, clause in [
+        (set_fields, "set"),
+        (if_not_exists_fields, "if_not_exists"),
+        (append_fields, "append"),
+        (add_fields, "add"),
+        (remove_fields, "remove"),
+    ]:
+        for field in fields:
+            attribute = f"attr{count}"
+            count += 1
+
+            names[f"#{attribute}"] = field
+
+            if clause == "remove":
+                remove_expressions.append(f"#{attribute}")
+                continue
+
+            value_placeholders.append(f":{attribute}")
+
+            if clause == "set":
+                set_expressions.append(f"#{attribute} = :{attribute}")
+            elif clause == "if_not_exists":
+                set_expressions.append(f"#{attribute} = if_not_exists(#{attribute}, :{attribute})")
+            elif clause == "append":
+                set_expressions.append(
+                    f"#{attribute} = list_append(if_not_exists(#{attribute}, :empty_list), :{attribute})"
+                )
+            else:
+                add_expressions.append(f"#{attribute} :{attribute}")
+
+    clauses = []
+    if set_expressions:
+        clauses.append(f"set {', '.join(set_expressions)}")
+    if add_expressions:
+        clauses.append(f"add {', '.join(add_expressions)}")
+    if remove_expressions:
+        clauses.append(f"remove {', '.join(remove_expressions)}")
+
+    return " ".join(clauses), names, tuple(value_placeholders)
+
+
+def _build_update_kwargs(
+    update_map: dict[str, Any],
+    *,
+    add_map: dict[str, Any] | None = None,
+    remove: list[str] | None = None,
+    append_map: dict[str, list] | None = None,
+    if_not_exists_map: dict[str, Any] | None = None,
+) -> dict[str, Any]:
+    """Creates the UpdateExpression, ExpressionAttributeNames and ExpressionAttributeValues for an update.
+
+    Args:
+        update_map (dict[str, Any]): Attributes to set
+        add_map (dict[str, Any] | None, optional): Numbers to atomically add or sets to merge. Defaults to None.
+        remove (list[str] | None, optional): Attributes to remove. Defaults to None.
+        append_map (dict[str, list] | None, optional): Lists appended to list attributes, created when missing.
+            Defaults to None.
+        if_not_exists_map (dict[str, Any] | None, optional): Attributes only set when they don't exist.
+            Defaults to None.
+
+    Returns:
+        dict[str, Any]: Keyword arguments for an update_item call
+    """
+    add_map = add_map or {}
+    append_map = append_map or {}
+    if_not_exists_map = if_not_exists_map or {}
+
+    expression, names, value_placeholders = _build_update_expression(
+        tuple(update_map), tuple(if_not_exists_map), tuple(append_map), tuple(add_map), tuple(remove or [])
+    )
+
+    if not expression:
+        msg = "At least one attribute must be updated"
+        raise Exception(msg)
+
+    values = [*update_map.values(), *if_not_exists_map.values(), *append_map.values(), *add_map.values()]
+
+    # boto3 adds condition expression placeholders to the names, the cached version must not be modified
+    kwargs = {"UpdateExpression": expression, "ExpressionAttributeNames": dict(names)}
+
+    if value_placeholders:
+        kwargs["ExpressionAttributeValues"] = dict(zip(value_placeholders, values, strict=True))
+
+        if append_map:
+            kwargs["ExpressionAttributeValues"][":empty_list"] = []
+
+    return kwargs
+
+
 def update_item_simplified(
     table_name: str,
     key: dict[str, Any],
     update_map: dict[str, Any],
     return_values: ReturnValues = ReturnValues.NONE,
     *,
+    add_map: dict[str, Any] | None = None,
+    remove: list[str] | None = None,
+    append_map: dict[str, list] | None = None,
+    if_not_exists_map: dict[str, Any] | None = None,
+    condition_expression=None,
     region_name: str | None = None,
     session: Session = None,
 ):
+    """Updates an item in a single call, without having to read it first.
+
+    Args:
+        table_name (str): The table name
+        key (dict[str, Any]): The item's primary key
+        update_map (dict[str, Any]): Attributes to set, can be empty when other updates are provided
+        return_values (ReturnValues, optional): Values returned by the update. Defaults to ReturnValues.NONE.
+        add_map (dict[str, Any] | None, optional): Numbers to atomically add (counters) or sets to merge.
+            Defaults to None.
+        remove (list[str] | None, optional): Attributes to remove. Defaults to None.
+        append_map (dict[str, list] | None, optional): Lists appended to list attributes, created when missing.
+            Defaults to None.
+        if_not_exists_map (dict[str, Any] | None, optional): Attributes only set when they don't exist.
+            Defaults to None.
+        condition_expression (optional): A boto3.dynamodb.conditions condition the item must meet.
+            Defaults to None.
+
+    Returns:
+        dict: The update_item response
+    """
     table = get_table(table_name, region_name=region_name, session=session)
 
-    expressions: list[str] = []
-    values = {}
-    names = {}
-
-    # count = 0
-    for count, field in enumerate(update_map):
-        attribute = f"attr{count}"
+    update_kwargs = _build_update_kwargs(
+        update_map,
+        add_map=add_map,
+        remove=remove,
+        append_map=append_map,
+        if_not_exists_map=if_not_exists_map,
+    )
 
-        names[f"#{attribute}"] = field
-        values[f":{attribute}"] = update_map[field]
-        expressions.append(f"#{attribute} = :{attribute}")
+    if condition_expression is not None:
+        update_kwargs["ConditionExpression"] = condition_expression
 
     response = table.update_item(
         Key=key,
-        UpdateExpression=f"set {', '.join(expressions)}",
-        ExpressionAttributeValues=values,
-        ExpressionAttributeNames=names,
         ReturnValues=return_values.name,
+        **update_kwargs,
     )
 
     return response
 
 
+def _build_condition_kwargs(condition_expression) -> dict[str, Any]:
+    # Conditions inside TransactItems aren't expanded by boto3, each operation needs its own placeholders
+    built = ConditionExpressionBuilder().build_expression(condition_expression)
+
+    kwargs = {
+        "ConditionExpression": built.condition_expression,
+        "ExpressionAttributeNames": built.attribute_name_placeholders,
+    }
+
+    if built.attribute_value_placeholders:
+        kwargs["ExpressionAttributeValues"] = built.attribute_value_placeholders
+
+    return kwargs
+
+
+def transact_put(table_name: str, item: dict[str, Any], *, condition_expression=None) -> dict:
+    operation = {"TableName": table_name, "Item": item}
+
+    if condition_expression is not None:
+        operation.update(_build_condition_kwargs(condition_expression))
+
+    return {"Put": operation}
+
+
+def transact_update(
+    table_name: str,
+    key: dict[str, Any],
+    update_map: dict[str, Any],
+    *,
+    add_map: dict[str, Any] | None = None,
+    remove: list[str] | None = None,
+    append_map: dict[str, list] | None = None,
+    if_not_exists_map: dict[str, Any] | None = None,
+    condition_expression=None,
+) -> dict:
+    operation = {
+        "TableName": table_name,
+        "Key": key,
+        **_build_update_kwargs(
+            update_map,
+            add_map=add_map,
+            remove=remove,
+            append_map=append_map,
+            if_not_exists_map=if_not_exists_map,
+        ),
+    }
+
+    if condition_expression is not None:
+        condition_kwargs = _build_condition_kwargs(condition_expression)
+        operation["ConditionExpression"] = condition_kwargs["ConditionExpression"]
+        operation["ExpressionAttributeNames"].update(condition_kwargs["ExpressionAttributeNames"])
+
+        if "ExpressionAttributeValues" in condition_kwargs:
+            operation.setdefault("ExpressionAttributeValues", {})
+            operation["ExpressionAttributeValues"].update(condition_kwargs["ExpressionAttributeValues"])
+
+    return {"Update": operation}
+
+
+def transact_delete(table_name: str, key: dict[str, Any], *, condition_expression=None) -> dict:
+    operation = {"TableName": table_name, "Key": key}
+
+    if condition_expression is not None:
+        operation.update(_build_condition_kwargs(condition_expression))
+
+    return {"Delete": operation}
+
+
+def transact_condition_check(table_name: str, key: dict[str, Any], condition_expression) -> dict:
+    return {"ConditionCheck": {"TableName": table_name, "Key": key, **_build_condition_kwargs(condition_expression)}}
+
+
+def transact_get(table_name: str, key: dict[str, Any], projection_expressions: list[str] | None = None) -> dict:
+    operation = {"TableName": table_name, "Key": key}
+
+    if isinstance(projection_expressions, list) and len(projection_expressions) > 0:
+        operation["ProjectionExpression"] = ", ".join(projection_expressions)
+
+    return {"Get": operation}
+
+
+def _transact_with_retries(transact_call, operations: list[dict], max_attempts: int, retry_delay: float) -> dict:
+    attempt = 1
+    while True:
+        try:
+            return transact_call(TransactItems=operations)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") != "TransactionCanceledException":
+                raise
+
+            reasons = e.response.get("CancellationReasons", [])
+            codes = {reason.get("Code") for reason in reasons}
+
+            if "TransactionConflict" in codes and attempt < max_attempts:
+                time.sleep(retry_delay * 2 ** (attempt - 1))
+                attempt += 1
+                continue
+
+            msg = f"Transaction cancelled: {[reason.get('Code') for reason in reasons]}"
+            raise TransactionCancelledError(msg, operations, reasons) from e
+
+
+def transact_write_items(
+    operations: list[dict],
+    max_attempts: int = 5,
+    retry_delay: float = 0.1,
+    *,
+    transaction_size: int = MAX_TRANSACTION_ITEMS,
+    region_name: str | None = None,
+    session: Session = None,
+) -> None:
+    """Writes the operations created with transact_put, transact_update, transact_delete and
+    transact_condition_check. Operations are grouped into transactions of up to 100 items, each group is atomic but
+    groups are committed one after the other.
+
+    Args:
+        operations (list[dict]): The transaction operations
+        max_attempts (int, optional): Attempts per transaction when cancelled by a TransactionConflict.
+            Defaults to 5.
+        retry_delay (float, optional): Initial delay in seconds between attempts, doubled after each attempt.
+            Defaults to 0.1.
+        transaction_size (int, optional): Maximum operations per transaction. Defaults to 100.
+
+    Raises:
+        TransactionCancelledError: A transaction was cancelled, includes the reason for each operation
+    """
+    client = get_dynamodb_resource(region_name, session).meta.client
+
+    for start in range(0, len(operations), transaction_size):
+        chunk = operations[start : start + transaction_size]
+        _transact_with_retries(client.transact_write_items, chunk, max_attempts, retry_delay)
+
+
+def transact_get_items(
+    operations: list[dict],
+    max_attempts: int = 5,
+    retry_delay: float = 0.1,
+    *,
+    transaction_size: int = MAX_TRANSACTION_ITEMS,
+    region_name: str | None = None,
+    session: Session = None,
+) -> list[dict[str, Any]]:
+    """Reads the items of operations created with transact_get, grouped into transactions of up to 100 items.
+
+    Args:
+        operations (list[dict]): The transaction operations
+        max_attempts (int, optional): Attempts per transaction when cancelled by a TransactionConflict.
+            Defaults to 5.
+        retry_delay (float, optional): Initial delay in seconds between attempts, doubled after each attempt.
+            Defaults to 0.1.
+        transaction_size (int, optional): Maximum operations per transaction. Defaults to 100.
+
+    Raises:
+        TransactionCancelledError: A transaction was cancelled, includes the reason for each operation
+
+    Returns:
+        list[dict[str, Any]]: The items in the same order as the operations, empty when an item doesn't exist
+    """
+    client = get_dynamodb_resource(region_name, session).meta.client
+
+    items = []
+    for start in range(0, len(operations), transaction_size):
+        chunk = operations[start : start + transaction_size]
+        response = _transact_with_retries(client.transact_get_items, chunk, max_attempts, retry_delay)
+
+        items.extend(item_response.get("Item", {}) for item_response in response.get("Responses", []))
+
+    return items
+
+
 def get_item(
     table_name: str,
     key: dict[str, Any],
@@ -198,3 +523,188 @@ def query_no_paging(
         last_evaluated_key = results.get("LastEvaluatedKey", None)
 
     return items
+
+
+def scan_segment(
+    table_name: str,
+    segment: int,
+    total_segments: int,
+    *,
+    region_name: str | None = None,
+    session: Session = None,
+) -> list[dict[str, Any]]:
+    table = get_table(table_name, region_name=region_name, session=session)
+
+    items = []
+    scan_kwargs = {"Segment": segment, "TotalSegments": total_segments}
+
+    while True:
+        results = table.scan(**scan_kwargs)
+        items.extend(results.get("Items", []))
+
+        last_evaluated_key = results.get("LastEvaluatedKey", None)
+        if not last_evaluated_key:
+            return items
+
+        scan_kwargs["ExclusiveStartKey"] = last_evaluated_key
+
+
+def scan_parallel(
+    table_name: str,
+    total_segments: int = 4,
+    *,
+    region_name: str | None = None,
+    session: Session = None,
+) -> list[dict[str, Any]]:
+    """Scans a whole table using a parallel scan, one thread per segment.
+
+    Args:
+        table_name (str): The table to scan
+        total_segments (int, optional): Number of segments scanned concurrently. Defaults to 4.
+
+    Returns:
+        list[dict[str, Any]]: Every item in the table
+    """
+    with ThreadPoolExecutor(max_workers=total_segments) as executor:
+        futures = [
+            executor.submit(scan_segment, table_name, segment, total_segments, region_name=region_name, session=session)
+            for segment in range(total_segments)
+        ]
+
+        items = []
+        for future in futures:
+            items.extend(future.result())
+
+    return items
+
+
+class TableSnapshot:
+    """An in-memory copy of a small, read-heavy table (feature flags, configuration, price lists).
+
+    The table is loaded once with a parallel scan and hash indexes are built on the primary key and
+    any additional attributes (typically GSI keys). Lookups are answered locally without calling
+    DynamoDB. When a refresh interval is provided, a background thread re-scans the table and swaps
+    in the new indexes, readers keep using the previous snapshot until the swap completes.
+
+    Args:
+        table_name (str): The table to load
+        index_attributes (list[str] | None, optional): Extra attributes to index for `query`. The partition
+            key is always indexed. Defaults to None.
+        total_segments (int, optional): Number of segments used by the parallel scan. Defaults to 4.
+        refresh_interval (float | None, optional): Seconds between background refreshes, None disables
+            refreshing. Defaults to None.
+    """
+
+    def __init__(
+        self,
+        table_name: str,
+        index_attributes: list[str] | None = None,
+        total_segments: int = 4,
+        refresh_interval: float | None = None,
+        *,
+        region_name: str | None = None,
+        session: Session = None,
+    ) -> None:
+        self.table_name = table_name
+        self.total_segments = total_segments
+        self.refresh_interval = refresh_interval
+        self._region_name = region_name
+        self._session = session
+
+        table = get_table(table_name, region_name=region_name, session=session)
+        self.key_attributes = [key["AttributeName"] for key in table.key_schema]
+
+        self.index_attributes = [self.key_attributes[0]]
+        for attribute in index_attributes or []:
+            if attribute not in self.index_attributes:
+                self.index_attributes.append(attribute)
+
+        # The primary index and attribute indexes, replaced together as one tuple
+        self._snapshot: tuple[dict[tuple, dict[str, Any]], dict[str, dict[Hashable, list[dict[str, Any]]]]] = ({}, {})
+        self._stop_event = threading.Event()
+        self._refresh_thread: threading.Thread | None = None
+
+        self.load()
+
+    def __enter__(self) -> "TableSnapshot":
+        self.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+
+    def __len__(self) -> int:
+        return len(self._snapshot[0])
+
+    def load(self) -> None:
+        """Scans the table and replaces the current snapshot."""
+        items = scan_parallel(
+            self.table_name, self.total_segments, region_name=self._region_name, session=self._session
+        )
+
+        primary_index = {}
+        indexes: dict[str, dict[Hashable, list[dict[str, Any]]]] = {name: {} for name in self.index_attributes}
+
+        for item in items:
+            primary_index[self._item_key(item)] = item
+
+            for attribute, index in indexes.items():
+                value = item.get(attribute)
+                if isinstance(value, Hashable) and value is not None:
+                    index.setdefault(value, []).append(item)
+
+        if len(self.key_attributes) > 1:
+            sort_key = self.key_attributes[1]
+            for index in indexes.values():
+                for values in index.values():
+                    values.sort(key=lambda item: item.get(sort_key))
+
+        # A single attribute assignment, so concurrent readers see either the old or the new snapshot
+        self._snapshot = (primary_index, indexes)
+
+    def get_item(self, key: dict[str, Any]) -> dict[str, Any]:
+        """Returns the item for a primary key, or an empty dict like `dynamodb.get_item`."""
+        primary_index, _ = self._snapshot
+        return primary_index.get(self._item_key(key), {})
+
+    def query(self, attribute_name: str, value: Any) -> list[dict[str, Any]]:
+        """Returns every item where `attribute_name` equals `value`.
+
+        When the table has a sort key the items are ordered by it.
+        """
+        _, indexes = self._snapshot
+        index = indexes.get(attribute_name)
+
+        if index is None:
+            msg = f"Attribute is not indexed: {attribute_name}"
+            raise Exception(msg)
+
+        return list(index.get(value, []))
+
+    def start(self) -> None:
+        """Starts the background refresh thread, does nothing without a refresh interval."""
+        if not self.refresh_interval or self._refresh_thread is not None:
+            return
+
+        self._stop_event.clear()
+        self._refresh_thread = threading.Thread(target=self._refresh_loop, daemon=True)
+        self._refresh_thread.start()
+
+    def stop(self) -> None:
+        """Stops the background refresh thread."""
+        if self._refresh_thread is None:
+            return
+
+        self._stop_event.set()
+        self._refresh_thread.join()
+        self._refresh_thread = None
+
+    def _refresh_loop(self) -> None:
+        while not self._stop_event.wait(self.refresh_interval):
+            try:
+                self.load()
+            except Exception:
+                logger.exception(f"Failed to refresh snapshot of table {self.table_name}")
+
+    def _item_key(self, item: dict[str, Any]) -> tuple:
+        return tuple(item.get(attribute) for attribute in self.key_attributes)
@@ -1,14 +1,155 @@
+import bz2
+import codecs
+import contextlib
 import csv
+import gzip
+import hashlib
+import hmac
+import io
 import json
+import mmap
 import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+import weakref
+import zlib
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+from enum import Enum
+from functools import cache, partial
+from http import HTTPStatus
 from io import BytesIO
-from typing import Any
+from itertools import islice
+from typing import IO, Any
+from urllib.parse import parse_qs, quote, urlsplit
 
+import boto3
 from boto3 import Session
+from boto3.s3.transfer import TransferConfig
 from botocore.client import Config
+from botocore.exceptions import BotoCoreError, ClientError
 
 from skymantle_boto_buddy import EnableCache, get_boto3_client, get_boto3_resource
 
+try:
+    import zstandard
+except ImportError:  # no cov
+    zstandard = None
+
+
+MB = 1024 * 1024
+MIN_PART_SIZE = 5 * MB
+MAX_PARTS = 10000
+DEFAULT_MAX_POOL_CONNECTIONS = 10
+
+# Shared so the client cache hits, Config has no equality
+_S3V4_CONFIG = Config(signature_version="s3v4")
+_PRESIGN_CLIENT_METHODS = {"GET": "get_object", "PUT": "put_object", "HEAD": "head_object", "DELETE": "delete_object"}
+_PRESIGN_QUERY = {"X-Amz-Algorithm", "X-Amz-Credential", "X-Amz-Date", "X-Amz-Expires", "X-Amz-SignedHeaders"}
+MAX_DELETE_KEYS = 1000
+
+
+class Compression(Enum):
+    NONE = 1
+    GZIP = 2
+    ZSTD = 3
+    BZIP2 = 4
+
+
+_CONTENT_ENCODINGS = {Compression.GZIP: "gzip", Compression.ZSTD: "zstd", Compression.BZIP2: "bzip2"}
+_KEY_EXTENSIONS = {Compression.GZIP: (".gz",), Compression.ZSTD: (".zst", ".zstd"), Compression.BZIP2: (".bz2",)}
+
+
+def _content_encoding_compression(response: dict) -> Compression:
+    content_encoding = response.get("ContentEncoding", "").lower()
+
+    for compression, encoding in _CONTENT_ENCODINGS.items():
+        if content_encoding == encoding:
+            return compression
+
+    return Compression.NONE
+
+
+def _detect_compression(key: str, response: dict) -> Compression:
+    compression = _content_encoding_compression(response)
+
+    if compression == Compression.NONE:
+        for key_compression, extensions in _KEY_EXTENSIONS.items():
+            if key.endswith(extensions):
+                return key_compression
+
+    return compression
+
+
+def _get_zstandard():
+    if zstandard is None:
+        msg = "The zstandard package is required for zstd compression, install skymantle_boto_buddy[zstd]"
+        raise Exception(msg)
+
+    return zstandard
+
+
+def _open_body_stream(body: IO[bytes], compression: Compression) -> IO[bytes]:
+    if compression == Compression.GZIP:
+        return gzip.GzipFile(fileobj=body, mode="rb")
+
+    if compression == Compression.ZSTD:
+        return _get_zstandard().ZstdDecompressor().stream_reader(body)
+
+    if compression == Compression.BZIP2:
+        return bz2.BZ2File(body, mode="rb")
+
+    return body
+
+
+class _Compressor:
+    """Incremental compressor with the same compress/flush interface for every codec"""
+
+    def __init__(self, compression: Compression) -> None:
+        if compression == Compression.GZIP:
+            self._compressor = zlib.compressobj(wbits=31)
+        elif compression == Compression.ZSTD:
+            self._compressor = _get_zstandard().ZstdCompressor().compressobj()
+        elif compression == Compression.BZIP2:
+            self._compressor = bz2.BZ2Compressor()
+        else:
+            self._compressor = None
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) if self._compressor else bytes(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush() if self._compressor else b""
+
+
+def _compress(data: bytes, compression: Compression) -> bytes:
+    compressor = _Compressor(compression)
+    return compressor.compress(data) + compressor.flush()
+
+
+def _iter_compressed(chunks: Iterable[bytes], compression: Compression) -> Iterator[bytes]:
+    compressor = _Compressor(compression)
+
+    for chunk in chunks:
+        if compressed := compressor.compress(chunk):
+            yield compressed
+
+    yield compressor.flush()
+
+
+def _decompress(data: bytes, compression: Compression) -> bytes:
+    if compression == Compression.NONE:
+        return data
+
+    with _open_body_stream(BytesIO(data), compression) as stream:
+        return stream.read()
+
 
 def get_s3_client(
     region_name: str | None = None,
@@ -28,6 +169,21 @@ def get_s3_resource(
     return get_boto3_resource("s3", region_name, session, config, enable_cache)
 
 
+@cache
+def _pool_config(max_pool_connections: int) -> Config:
+    """One Config per pool size, Config has no equality so the client cache only hits for the same instance"""
+    return Config(max_pool_connections=max_pool_connections)
+
+
+def _get_transfer_client(max_concurrency: int, region_name: str | None = None, session: Session = None) -> Any:
+    """The client for concurrent requests, its connection pool holds at least `max_concurrency` connections so
+    threads don't open and discard a connection per request once the default pool of 10 is in use"""
+    if max_concurrency <= DEFAULT_MAX_POOL_CONNECTIONS:
+        return get_s3_client(region_name, session)
+
+    return get_s3_client(region_name, session, _pool_config(max_concurrency))
+
+
 # When imported in a lambda function will load the boto client during initialization
 if os.environ.get("AWS_LAMBDA_FUNCTION_NAME") is not None:
     get_s3_client()
@@ -49,7 +205,7 @@ def get_bucket(
 def get_object_signed_url(
     bucket: str, key: str, expires_in: int = 300, *, region_name: str | None = None, session: Session = None
 ):
-    s3_client = get_s3_client(region_name, session, Config(signature_version="s3v4"))
+    s3_client = get_s3_client(region_name, session, _S3V4_CONFIG)
 
     response = s3_client.generate_presigned_url(
         "get_object", Params={"Bucket": bucket, "Key": key}, HttpMethod="GET", ExpiresIn=expires_in
@@ -61,7 +217,7 @@ def get_object_signed_url(
 def put_object_signed_url(
     bucket: str, key: str, expires_in: int = 300, *, region_name: str | None = None, session: Session = None
 ):
-    s3_client = get_s3_client(region_name, session, Config(signature_version="s3v4"))
+    s3_client = get_s3_client(region_name, session, _S3V4_CONFIG)
 
     response = s3_client.generate_presigned_url(
         "put_object", Params={"Bucket": bucket, "Key": key}, HttpMethod="PUT", ExpiresIn=expires_in
@@ -70,6 +226,102 @@ def put_object_signed_url(
     return response
 
 
+def _hmac_sha256(key: bytes, message: str) -> bytes:
+    return hmac.new(key, message.encode("utf-8"), hashlib.sha256).digest()
+
+
+def presign_many(
+    bucket: str,
+    keys: Iterable[str],
+    method: str = "GET",
+    expires_in: int = 300,
+    *,
+    region_name: str | None = None,
+    session: Session = None,
+) -> dict[str, str]:
+    """Generates SigV4 presigned URLs for many keys. The credentials, signing key and canonical query string are
+    computed once and each URL only signs its own path, instead of going through the botocore request
+    building for every key like get_object_signed_url and put_object_signed_url. The host, addressing style and
+    signing region are taken from one URL presigned by botocore, so custom endpoints, accelerate, dualstack and
+    FIPS configurations give the same URLs as botocore.
+
+    Args:
+        bucket (str): The s3 bucket
+        keys (Iterable[str]): The s3 keys
+        method (str, optional): The HTTP method, one of GET, PUT, HEAD or DELETE. Defaults to "GET".
+        expires_in (int, optional): Seconds the URLs are valid. Defaults to 300.
+
+    Returns:
+        dict[str, str]: The presigned URL of each key
+    """
+    method = method.upper()
+    client_method = _PRESIGN_CLIENT_METHODS.get(method)
+
+    if not client_method:
+        msg = f"Method is not supported: {method}"
+        raise Exception(msg)
+
+    s3_client = get_s3_client(region_name, session, _S3V4_CONFIG)
+
+    def generate_presigned_url(key: str) -> str:
+        return s3_client.generate_presigned_url(
+            client_method, Params={"Bucket": bucket, "Key": key}, HttpMethod=method, ExpiresIn=expires_in
+        )
+
+    sample_url = urlsplit(generate_presigned_url("key"))
+    sample_query = parse_qs(sample_url.query)
+    credential_scope = sample_query.get("X-Amz-Credential", [""])[0].split("/")
+
+    # Signatures botocore computes differently (e.g. SigV4a or extra signed headers) are left to botocore
+    if (
+        set(sample_query) - {"X-Amz-Security-Token", "X-Amz-Signature"} != _PRESIGN_QUERY
+        or sample_query["X-Amz-Algorithm"] != ["AWS4-HMAC-SHA256"]
+        or sample_query["X-Amz-SignedHeaders"] != ["host"]
+        or credential_scope[-2:] != ["s3", "aws4_request"]
+        or not sample_url.path.endswith("/key")
+    ):
+        return {key: generate_presigned_url(key) for key in keys}
+
+    credentials = (session or boto3._get_default_session()).get_credentials().get_frozen_credentials()
+    region = credential_scope[-3]
+    host, path_prefix = sample_url.netloc, sample_url.path[: -len("/key")]
+
+    now = datetime.now(timezone.utc)
+    amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+    scope = f"{now.strftime('%Y%m%d')}/{region}/s3/aws4_request"
+
+    signing_key = f"AWS4{credentials.secret_key}".encode()
+    for scope_part in scope.split("/"):
+        signing_key = _hmac_sha256(signing_key, scope_part)
+
+    query = {
+        "X-Amz-Algorithm": "AWS4-HMAC-SHA256",
+        "X-Amz-Credential": f"{credentials.access_key}/{scope}",
+        "X-Amz-Date": amz_date,
+        "X-Amz-Expires": str(expires_in),
+        "X-Amz-SignedHeaders": "host",
+    }
+    if credentials.token:
+        query["X-Amz-Security-Token"] = credentials.token
+
+    canonical_query = "&".join(
+        f"{quote(name, safe='-_.~')}={quote(value, safe='-_.~')}" for name, value in sorted(query.items())
+    )
+    string_to_sign_prefix = f"AWS4-HMAC-SHA256\n{amz_date}\n{scope}\n"
+    canonical_request_suffix = f"\n{canonical_query}\nhost:{host}\n\nhost\nUNSIGNED-PAYLOAD"
+
+    urls = {}
+    for key in keys:
+        path = f"{path_prefix}/{quote(key, safe='/~')}"
+        canonical_request = f"{method}\n{path}{canonical_request_suffix}"
+        string_to_sign = string_to_sign_prefix + hashlib.sha256(canonical_request.encode("utf-8")).hexdigest()
+        signature = hmac.new(signing_key, string_to_sign.encode("utf-8"), hashlib.sha256).hexdigest()
+
+        urls[key] = f"{sample_url.scheme}://{host}{path}?{canonical_query}&X-Amz-Signature={signature}"
+
+    return urls
+
+
 def get_object(bucket: str, key: str, *, region_name: str | None = None, session: Session = None):
     s3_client = get_s3_client(region_name, session)
     response = s3_client.get_object(
@@ -79,174 +331,2107 @@ def get_object(bucket: str, key: str, *, region_name: str | None = None, session
     return response
 
 
-def get_object_bytes(bucket: str, key: str, *, region_name: str | None = None, session: Session = None):
-    response = get_object(bucket, key, region_name=region_name, session=session)
-    return response["Body"].read()
+def get_object_range(
+    bucket: str,
+    key: str,
+    start: int,
+    end: int | None = None,
+    *,
+    region_name: str | None = None,
+    session: Session = None,
+) -> bytes:
+    """Reads a byte range of an object with a ranged GET, e.g. a file header.
 
+    Args:
+        bucket (str): The s3 bucket with the file
+        key (str): The s3 key to the file
+        start (int): The first byte
+        end (int | None, optional): The last byte, inclusive, the end of the object when None. Defaults to None.
 
-def get_object_json(bucket: str, key: str, *, region_name: str | None = None, session: Session = None):
-    s3_object = get_object_bytes(bucket, key, region_name=region_name, session=session)
-    return json.loads(s3_object.decode("utf-8"))
+    Returns:
+        bytes: The bytes of the range, shorter when the object ends before `end`
+    """
+    s3_client = get_s3_client(region_name, session)
+    byte_range = f"bytes={start}-{'' if end is None else end}"
 
+    return s3_client.get_object(Bucket=bucket, Key=key, Range=byte_range)["Body"].read()
 
-def get_object_csv_reader(bucket: str, key: str, *, region_name: str | None = None, session: Session = None):
-    s3_object: bytes = get_object_bytes(bucket, key, region_name=region_name, session=session)
-    return csv.DictReader(s3_object.decode("utf-8").splitlines(keepends=True))
 
+def get_object_tail(
+    bucket: str, key: str, nbytes: int, *, region_name: str | None = None, session: Session = None
+) -> bytes:
+    """Reads the last bytes of an object with a suffix range GET, e.g. the end of a log or a Parquet footer.
 
-def upload_fileobj(
-    bucket: str, key: str, object_data: BytesIO, *, region_name: str | None = None, session: Session = None
-):
-    object_data.seek(0)
+    Args:
+        bucket (str): The s3 bucket with the file
+        key (str): The s3 key to the file
+        nbytes (int): The number of bytes
+
+    Returns:
+        bytes: The last `nbytes` bytes, the whole object when it's smaller
+    """
+    if nbytes <= 0:
+        return b""
 
     s3_client = get_s3_client(region_name, session)
-    response = s3_client.upload_fileobj(Bucket=bucket, Key=key, Fileobj=object_data)
 
-    return response
+    try:
+        response = s3_client.get_object(Bucket=bucket, Key=key, Range=f"bytes=-{nbytes}")
+    except ClientError as e:
+        # An empty object has no satisfiable range
+        if e.response.get("Error", {}).get("Code") == "InvalidRange":
+            return b""
+        raise
+
+    return response["Body"].read()
 
 
-def put_object(bucket: str, key: str, object_data, *, region_name: str | None = None, session: Session = None):
+class S3File(io.RawIOBase):
+    """A read-only, seekable file object over an object, reads are served from a read-ahead buffer that is
+    filled with ranged GETs, so libraries like csv, zipfile or pyarrow can random-access a large object without
+    downloading it. Ranges are requested with the ETag of the object so a change while reading fails instead of
+    mixing versions.
+
+    Args:
+        bucket (str): The s3 bucket with the file
+        key (str): The s3 key to the file
+        buffer_size (int, optional): Minimum bytes fetched per ranged GET. Defaults to 1 MiB.
+    """
+
+    def __init__(
+        self,
+        bucket: str,
+        key: str,
+        buffer_size: int = MB,
+        *,
+        region_name: str | None = None,
+        session: Session = None,
+    ) -> None:
+        super().__init__()
+        self.bucket = bucket
+        self.key = key
+        self.name = f"s3://{bucket}/{key}"
+        self.mode = "rb"
+        self.buffer_size = buffer_size
+        self.requests = 0
+
+        self._s3_client = get_s3_client(region_name, session)
+        response = self._s3_client.head_object(Bucket=bucket, Key=key)
+        self.size = response["ContentLength"]
+        self.etag = response["ETag"]
+
+        self._position = 0
+        self._buffer = b""
+        self._buffer_start = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            msg = f"Invalid whence: {whence}"
+            raise ValueError(msg)
+
+        if position < 0:
+            msg = f"Negative seek position: {position}"
+            raise ValueError(msg)
+
+        self._position = position
+        return position
+
+    def _fill(self, size: int) -> None:
+        start = self._position
+        end = min(start + max(size, self.buffer_size), self.size) - 1
+
+        try:
+            response = self._s3_client.get_object(
+                Bucket=self.bucket, Key=self.key, Range=f"bytes={start}-{end}", IfMatch=self.etag
+            )
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") == "PreconditionFailed":
+                msg = f"Object changed during read: {self.bucket}/{self.key}"
+                raise Exception(msg) from e
+            raise
+
+        self.requests += 1
+        self._buffer = response["Body"].read()
+        self._buffer_start = start
+
+    def readinto(self, buffer) -> int:
+        if self.closed:
+            msg = "I/O operation on closed file"
+            raise ValueError(msg)
+
+        with memoryview(buffer) as view, view.cast("B") as target:
+            size = min(len(target), max(self.size - self._position, 0))
+            copied = 0
+
+            while copied < size:
+                offset = self._position - self._buffer_start
+                if not 0 <= offset < len(self._buffer):
+                    self._fill(size - copied)
+                    offset = 0
+
+                chunk = self._buffer[offset : offset + size - copied]
+                if not chunk:
+                    break
+
+                target[copied : copied + len(chunk)] = chunk
+                copied += len(chunk)
+                self._position += len(chunk)
+
+        return copied
+
+    def readall(self) -> bytes:
+        return self.read(max(self.size - self._position, 0))
+
+
+_HEAD_FIELDS = ["ContentLength", "ETag", "LastModified", "ContentType", "ContentEncoding", "Metadata"]
+
+
+def _head_object(s3_client, bucket: str, key: str) -> dict | None:
+    try:
+        response = s3_client.head_object(Bucket=bucket, Key=key)
+    except ClientError as e:
+        if e.response.get("ResponseMetadata", {}).get("HTTPStatusCode") == HTTPStatus.NOT_FOUND:
+            return None
+        raise
+
+    return {field: response[field] for field in _HEAD_FIELDS if field in response}
+
+
+def head_object(bucket: str, key: str, *, region_name: str | None = None, session: Session = None) -> dict | None:
+    """Returns the ContentLength, ETag, LastModified, ContentType, ContentEncoding and Metadata of an object
+    without downloading the body, None when the object doesn't exist.
+    """
     s3_client = get_s3_client(region_name, session)
-    response = s3_client.put_object(
-        Bucket=bucket,
-        Key=key,
-        Body=object_data,
-    )
+    return _head_object(s3_client, bucket, key)
 
-    return response
 
+def head_objects(
+    bucket: str,
+    keys: Iterable[str],
+    *,
+    max_concurrency: int = 16,
+    region_name: str | None = None,
+    session: Session = None,
+) -> dict[str, dict | None]:
+    """Checks many objects with concurrent HEAD requests, see head_object.
 
-def put_object_json(bucket: str, key: str, json_object, *, region_name: str | None = None, session: Session = None):
-    return put_object(bucket, key, json.dumps(json_object), region_name=region_name, session=session)
+    Args:
+        bucket (str): The s3 bucket
+        keys (Iterable[str]): The s3 keys
+        max_concurrency (int, optional): Number of HEAD requests running at the same time. Defaults to 16.
 
+    Returns:
+        dict[str, dict | None]: The metadata of each key, None for keys that don't exist
+    """
+    s3_client = _get_transfer_client(max_concurrency, region_name, session)
+    keys = list(dict.fromkeys(keys))
 
-def delete_object(bucket: str, key: str, region_name: str | None = None, session: Session = None):
-    s3_client = get_s3_client(region_name, session)
+    responses = _run_concurrently(max_concurrency, _head_object, [(s3_client, bucket, key) for key in keys])
 
-    response = s3_client.delete_object(Bucket=bucket, Key=key)
+    return dict(zip(keys, responses, strict=True))
 
-    return response
 
+class S3ObjectIndex:
+    """An in-memory index of the objects under a prefix built from one paginated listing, answering existence,
+    size and ETag checks for thousands of keys without a request per key. With a max age the listing is
+    repeated on the first lookup after it expires.
 
-def delete_objects_simplified(bucket: str, keys: list[str], *, region_name: str | None = None, session: Session = None):
-    s3_client = get_s3_client(region_name, session)
+    Args:
+        bucket (str): The s3 bucket
+        prefix (str, optional): The key prefix. Defaults to "".
+        max_age (float | None, optional): Seconds before the listing is reloaded, None never reloads.
+            Defaults to None.
+    """
 
-    delete_objects = {"Objects": [{"Key": key} for key in keys]}
-    response = s3_client.delete_objects(Bucket=bucket, Delete=delete_objects)
+    def __init__(
+        self,
+        bucket: str,
+        prefix: str = "",
+        max_age: float | None = None,
+        *,
+        region_name: str | None = None,
+        session: Session = None,
+    ) -> None:
+        self.bucket = bucket
+        self.prefix = prefix
+        self.max_age = max_age
+        self._region_name = region_name
+        self._session = session
+        self._objects: dict[str, dict] = {}
+        self._loaded = 0.0
 
-    return response
+        self.load()
 
+    def __len__(self) -> int:
+        return len(self._current())
 
-def copy(
-    source_bucket: str,
-    source_key: str,
-    destination_bucket: str,
-    destination_key: str,
+    def __contains__(self, key: str) -> bool:
+        return key in self._current()
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._current()))
+
+    def load(self) -> None:
+        """Lists the prefix and replaces the current index."""
+        objects = iter_objects(self.bucket, self.prefix, region_name=self._region_name, session=self._session)
+        self._objects = {item["Key"]: item for item in objects}
+        self._loaded = time.monotonic()
+
+    def _current(self) -> dict[str, dict]:
+        if self.max_age is not None and time.monotonic() - self._loaded >= self.max_age:
+            self.load()
+
+        return self._objects
+
+    def get(self, key: str) -> dict | None:
+        """Returns the listing metadata (Key, Size, ETag, LastModified, StorageClass), None when missing."""
+        return self._current().get(key)
+
+    def exists(self, key: str) -> bool:
+        return key in self._current()
+
+    def size(self, key: str) -> int | None:
+        item = self._current().get(key)
+        return item["Size"] if item else None
+
+    def changed(self, key: str, etag: str) -> bool:
+        """Returns whether an object is missing or has another ETag than a previously seen one."""
+        item = self._current().get(key)
+        return item is None or item["ETag"] != etag
+
+
+class S3ObjectCache:
+    """An opt-in cache for object bodies, small objects are kept in memory and larger ones on local disk (e.g. /tmp
+    in a lambda function). Both tiers are size-bounded LRUs. Cached objects are revalidated with a conditional
+    GET using the ETag, an unchanged object costs a 304 response instead of the full body.
+
+    Args:
+        directory (str | None, optional): Where bodies are stored, should not be shared with another cache. A new
+            folder in the temp directory, removed with the cache, when None. Defaults to None.
+        max_bytes (int, optional): Maximum bytes stored on disk. Defaults to 512 MiB.
+        memory_max_bytes (int, optional): Maximum bytes kept in memory. Defaults to 32 MiB.
+        memory_object_max_bytes (int, optional): Objects up to this size are kept in memory. Defaults to 1 MiB.
+        revalidate_after (float, optional): Seconds a cached object is served without revalidating.
+            Defaults to 0, always revalidate.
+    """
+
+    def __init__(
+        self,
+        directory: str | None = None,
+        max_bytes: int = 512 * MB,
+        memory_max_bytes: int = 32 * MB,
+        memory_object_max_bytes: int = MB,
+        revalidate_after: float = 0,
+    ) -> None:
+        self.directory = directory or tempfile.mkdtemp(prefix="boto_buddy_cache_")
+        self.max_bytes = max_bytes
+        self.memory_max_bytes = memory_max_bytes
+        self.memory_object_max_bytes = memory_object_max_bytes
+        self.revalidate_after = revalidate_after
+
+        self._memory: OrderedDict[tuple[str, str], dict] = OrderedDict()
+        self._disk: OrderedDict[tuple[str, str], dict] = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "revalidations": 0, "bytes_saved": 0, "evictions": 0}
+
+        os.makedirs(self.directory, exist_ok=True)
+        if directory is None:
+            weakref.finalize(self, shutil.rmtree, self.directory, ignore_errors=True)
+
+    def get_object_bytes(
+        self,
+        bucket: str,
+        key: str,
+        *,
+        decompress: bool = True,
+        region_name: str | None = None,
+        session: Session = None,
+    ) -> bytes:
+        """Returns the object body from the cache or S3, decompressed based on its ContentEncoding.
+        Bodies are cached as stored in S3."""
+        cache_key = (bucket, key)
+        entry = self._get_entry(cache_key)
+
+        if entry and time.monotonic() - entry["validated"] < self.revalidate_after:
+            data = self._hit(cache_key, entry)
+            if data is not None:
+                return self._decode(entry, data, decompress=decompress)
+            entry = None
+
+        s3_client = get_s3_client(region_name, session)
+        response = self._get_if_changed(s3_client, bucket, key, entry)
+
+        if response is None:
+            data = self._hit(cache_key, entry)
+            if data is not None:
+                return self._decode(entry, data, decompress=decompress)
+            response = s3_client.get_object(Bucket=bucket, Key=key)
+
+        data = response["Body"].read()
+        with self._lock:
+            self.stats["misses"] += 1
+
+        entry = self._put(cache_key, response, data)
+        return self._decode(entry, data, decompress=decompress)
+
+    def _get_if_changed(self, s3_client, bucket: str, key: str, entry: dict | None) -> dict | None:
+        """A conditional GET with the ETag of the entry, None when the object is unchanged"""
+        kwargs = {"Bucket": bucket, "Key": key}
+        if entry:
+            kwargs["IfNoneMatch"] = entry["etag"]
+
+        try:
+            return s3_client.get_object(**kwargs)
+        except ClientError as e:
+            if entry and e.response.get("ResponseMetadata", {}).get("HTTPStatusCode") == HTTPStatus.NOT_MODIFIED:
+                entry["validated"] = time.monotonic()
+                with self._lock:
+                    self.stats["revalidations"] += 1
+                return None
+            raise
+
+    @staticmethod
+    def _decode(entry: dict, data: bytes, *, decompress: bool) -> bytes:
+        return _decompress(data, entry["compression"]) if decompress else data
+
+    def clear(self) -> None:
+        with self._lock:
+            for entry in self._disk.values():
+                self._remove_file(entry)
+            self._memory.clear()
+            self._disk.clear()
+            self._memory_bytes = 0
+            self._disk_bytes = 0
+
+    def _get_entry(self, cache_key: tuple[str, str]) -> dict | None:
+        with self._lock:
+            for tier in [self._memory, self._disk]:
+                if cache_key in tier:
+                    tier.move_to_end(cache_key)
+                    return tier[cache_key]
+
+        return None
+
+    def _hit(self, cache_key: tuple[str, str], entry: dict) -> bytes | None:
+        """The cached body, None when the file of the entry was removed outside the cache"""
+        if "data" in entry:
+            data = entry["data"]
+        else:
+            try:
+                with open(entry["path"], "rb") as file:
+                    data = file.read()
+            except FileNotFoundError:
+                with self._lock:
+                    if self._disk.get(cache_key) is entry:
+                        self._discard(cache_key, remove_file=False)
+                return None
+
+        with self._lock:
+            self.stats["hits"] += 1
+            self.stats["bytes_saved"] += len(data)
+
+        return data
+
+    def _put(self, cache_key: tuple[str, str], response: dict, data: bytes) -> dict:
+        entry = {
+            "etag": response["ETag"],
+            "compression": _content_encoding_compression(response),
+            "size": len(data),
+            "validated": time.monotonic(),
+        }
+
+        if len(data) > self.memory_object_max_bytes:
+            if len(data) > self.max_bytes:
+                with self._lock:
+                    self._discard(cache_key, remove_file=True)
+                return entry
+
+            name = hashlib.sha256(f"{cache_key[0]}/{cache_key[1]}".encode()).hexdigest()
+            entry["path"] = os.path.join(self.directory, name)
+
+            with tempfile.NamedTemporaryFile(dir=self.directory, delete=False) as file:
+                file.write(data)
+            os.replace(file.name, entry["path"])
+        else:
+            entry["data"] = data
+
+        with self._lock:
+            # The file of a disk entry was already replaced when the object is stored on disk again
+            self._discard(cache_key, remove_file="data" in entry)
+
+            if "data" in entry:
+                self._memory[cache_key] = entry
+                self._memory_bytes += entry["size"]
+            else:
+                self._disk[cache_key] = entry
+                self._disk_bytes += entry["size"]
+
+            self._evict()
+
+        return entry
+
+    def _discard(self, cache_key: tuple[str, str], *, remove_file: bool) -> None:
+        if cache_key in self._memory:
+            self._memory_bytes -= self._memory.pop(cache_key)["size"]
+
+        if cache_key in self._disk:
+            entry = self._disk.pop(cache_key)
+            self._disk_bytes -= entry["size"]
+
+            if remove_file:
+                self._remove_file(entry)
+
+    def _evict(self) -> None:
+        while self._memory_bytes > self.memory_max_bytes:
+            _, entry = self._memory.popitem(last=False)
+            self._memory_bytes -= entry["size"]
+            self.stats["evictions"] += 1
+
+        while self._disk_bytes > self.max_bytes:
+            _, entry = self._disk.popitem(last=False)
+            self._disk_bytes -= entry["size"]
+            self._remove_file(entry)
+            self.stats["evictions"] += 1
+
+    @staticmethod
+    def _remove_file(entry: dict) -> None:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(entry["path"])
+
+
+def get_object_bytes(
+    bucket: str,
+    key: str,
     *,
+    decompress: bool = True,
+    cache: S3ObjectCache | None = None,
     region_name: str | None = None,
     session: Session = None,
 ):
-    s3_client = get_s3_client(region_name, session)
+    if cache:
+        return cache.get_object_bytes(bucket, key, decompress=decompress, region_name=region_name, session=session)
 
-    source = {
-        "Bucket": source_bucket,
-        "Key": source_key,
-    }
-    response = s3_client.copy(source, destination_bucket, destination_key)
+    response = get_object(bucket, key, region_name=region_name, session=session)
+
+    if not decompress:
+        return response["Body"].read()
+
+    with _open_body_stream(response["Body"], _content_encoding_compression(response)) as stream:
+        return stream.read()
+
+
+_THROTTLING_CODES = {"SlowDown", "Throttling", "ThrottlingException", "RequestLimitExceeded", "TooManyRequests"}
+
+
+def _is_retryable(error: ClientError) -> bool:
+    """Server errors and throttling can succeed on a retry, other client errors (AccessDenied, NoSuchKey) won't"""
+    status_code = error.response.get("ResponseMetadata", {}).get("HTTPStatusCode") or 0
+    code = error.response.get("Error", {}).get("Code")
+
+    if code in _THROTTLING_CODES or status_code == HTTPStatus.TOO_MANY_REQUESTS:
+        return True
+
+    return not HTTPStatus.BAD_REQUEST <= status_code < HTTPStatus.INTERNAL_SERVER_ERROR
+
+
+def _get_range(s3_client, head: dict, byte_range: tuple[int, int], *, last_attempt: bool) -> dict | None:
+    """A ranged GET pinned to the ETag, None when a retryable error should be retried"""
+    bucket, key, etag = head["Bucket"], head["Key"], head["ETag"]
+    changed_msg = f"Object changed during download: {bucket}/{key}"
+
+    try:
+        response = s3_client.get_object(
+            Bucket=bucket, Key=key, Range=f"bytes={byte_range[0]}-{byte_range[1]}", IfMatch=etag
+        )
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") == "PreconditionFailed":
+            raise Exception(changed_msg) from e
+        if last_attempt or not _is_retryable(e):
+            raise
+        return None
+
+    if response.get("ETag") != etag:
+        raise Exception(changed_msg)
 
     return response
 
 
-def list_objects_v2(
+def _download_range(s3_client, head: dict, view: memoryview, byte_range: tuple[int, int], max_attempts: int) -> None:
+    start, end = byte_range
+
+    for attempt in range(1, max_attempts + 1):
+        if attempt > 1:
+            time.sleep(0.1 * 2 ** (attempt - 2))
+
+        response = _get_range(s3_client, head, byte_range, last_attempt=attempt == max_attempts)
+        if response is None:
+            continue
+
+        position = start
+        try:
+            while chunk := response["Body"].read(MB):
+                view[position : position + len(chunk)] = chunk
+                position += len(chunk)
+        except (BotoCoreError, OSError):
+            if attempt == max_attempts:
+                raise
+            continue
+
+        if position == end + 1:
+            return
+
+    msg = f"Incomplete range bytes={start}-{end} for {head['Bucket']}/{head['Key']}"
+    raise Exception(msg)
+
+
+def _run_concurrently(max_concurrency: int, function, arguments: list[tuple]) -> list:
+    """Runs a function for each set of arguments on a thread pool, cancelling pending calls on the first error"""
+    executor = ThreadPoolExecutor(max_workers=max_concurrency)
+    try:
+        futures = [executor.submit(function, *args) for args in arguments]
+        return [future.result() for future in futures]
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def download_object_parallel(
     bucket: str,
-    prefix: str,
-    max_keys: int | None = None,
-    continuation_token: str | None = None,
+    key: str,
+    file_path: str | None = None,
     *,
+    part_size: int = 8 * MB,
+    max_concurrency: int = 10,
+    max_attempts: int = 3,
     region_name: str | None = None,
     session: Session = None,
-):
-    s3_client = get_s3_client(region_name, session)
+) -> bytearray | None:
+    """Downloads an object with concurrent ranged GETs, each part is written directly into a preallocated buffer or
+    a memory-mapped file. Parts are requested with the ETag of the object so a change during the download fails
+    instead of mixing versions, failed parts are retried individually.
 
-    kwargs = {"Bucket": bucket, "Prefix": prefix}
+    Args:
+        bucket (str): The s3 bucket with the file
+        key (str): The s3 key to the file
+        file_path (str | None, optional): Where to write the object, kept in memory when None. Defaults to None.
+        part_size (int, optional): Bytes per ranged GET. Defaults to 8 MiB.
+        max_concurrency (int, optional): Number of parts downloaded at the same time. Defaults to 10.
+        max_attempts (int, optional): Attempts per part. Defaults to 3.
 
-    if continuation_token:
-        kwargs["ContinuationToken"] = continuation_token
+    Returns:
+        bytearray | None: The object data, None when written to a file
+    """
+    s3_client = _get_transfer_client(max_concurrency, region_name, session)
+    options = {"part_size": part_size, "max_concurrency": max_concurrency, "max_attempts": max_attempts}
 
-    if max_keys:
-        kwargs["MaxKeys"] = max_keys
+    data, _ = _download_object_parallel(s3_client, bucket, key, file_path, options)
+    return data
 
-    response = s3_client.list_objects_v2(**kwargs)
 
-    result = {"keys": [item["Key"] for item in response.get("Contents", [])]}
+def _download_object_parallel(
+    s3_client, bucket: str, key: str, file_path: str | None, options: dict
+) -> tuple[bytearray | None, str]:
+    """Downloads like download_object_parallel, returns the data and the ETag every part was requested with"""
+    part_size, max_concurrency = options["part_size"], options["max_concurrency"]
 
-    if response.get("NextContinuationToken"):
-        result["NextContinuationToken"] = response.get("NextContinuationToken")
+    response = s3_client.head_object(Bucket=bucket, Key=key)
+    size = response["ContentLength"]
+    head = {"Bucket": bucket, "Key": key, "ETag": response["ETag"]}
 
-    return result
+    def download(view: memoryview) -> None:
+        arguments = [
+            (s3_client, head, view, (start, min(start + part_size, size) - 1), options["max_attempts"])
+            for start in range(0, size, part_size)
+        ]
+        _run_concurrently(max_concurrency, _download_range, arguments)
 
+    if file_path is None:
+        data = bytearray(size)
+        with memoryview(data) as view:
+            download(view)
+        return data, head["ETag"]
 
-def execute_sql_query_simplified(
+    with open(file_path, "wb+") as file:
+        file.truncate(size)
+
+        if size > 0:
+            with mmap.mmap(file.fileno(), size) as mapped_file, memoryview(mapped_file) as view:
+                download(view)
+
+    return None, head["ETag"]
+
+
+def get_object_json(
     bucket: str,
     key: str,
-    query: str,
-    input_type: str,
     *,
+    cache: S3ObjectCache | None = None,
     region_name: str | None = None,
     session: Session = None,
-) -> list[Any]:
-    """Performs an S3 Select statement against a file in S3.
-    The aws region used is the 'DefaultRegion' in os.environ.
+):
+    s3_object = get_object_bytes(bucket, key, cache=cache, region_name=region_name, session=session)
+    return json.loads(s3_object.decode("utf-8"))
+
+
+def get_object_stream(
+    bucket: str,
+    key: str,
+    compression: Compression | None = None,
+    *,
+    region_name: str | None = None,
+    session: Session = None,
+) -> IO[bytes]:
+    """Opens an object as a binary stream that is read incrementally from S3.
 
     Args:
         bucket (str): The s3 bucket with the file
         key (str): The s3 key to the file
-        query (str): The query
-        input_type (str): The files format. Currently only the value 'csv' is supported.
+        compression (Compression | None, optional): How the object is compressed, detected from the
+            ContentEncoding and key extension when None. Defaults to None.
 
     Returns:
-        dict: The selected data
+        IO[bytes]: The decompressed object data
     """
+    response = get_object(bucket, key, region_name=region_name, session=session)
 
-    input_serializations = {
-        "csv": {
-            "CSV": {
-                "FileHeaderInfo": "Use",
-                "AllowQuotedRecordDelimiter": True,
-                "RecordDelimiter": "\n",
-                "FieldDelimiter": ",",
-                "QuoteCharacter": '"',
-            },
-            "CompressionType": "NONE",
-        }
-    }
+    if compression is None:
+        compression = _detect_compression(key, response)
 
-    input_serialization = input_serializations.get(input_type)
+    return _open_body_stream(response["Body"], compression)
 
-    if not input_serialization:
-        msg = f"Input type is not supported: {input_type}"
-        raise Exception(msg)
 
-    s3_client = get_s3_client(region_name, session)
-    resp = s3_client.select_object_content(
-        Bucket=bucket,
-        Key=key,
-        ExpressionType="SQL",
-        Expression=query,
-        InputSerialization=input_serialization,
-        OutputSerialization={
-            "JSON": {
-                "RecordDelimiter": "\n",
-            }
-        },
-    )
+def get_object_text_stream(
+    bucket: str,
+    key: str,
+    compression: Compression | None = None,
+    encoding: str = "utf-8",
+    *,
+    region_name: str | None = None,
+    session: Session = None,
+) -> io.TextIOWrapper:
+    """Opens an object as a text stream, decoded incrementally so only a buffer of the object is in memory.
+    Universal newlines are not translated, making the stream suitable for the csv module.
+    """
+    stream = get_object_stream(bucket, key, compression, region_name=region_name, session=session)
+    return io.TextIOWrapper(stream, encoding=encoding, newline="")
 
-    record_list = []
-    for event in resp["Payload"]:
-        if "Records" in event:
-            record_list.append(event["Records"]["Payload"])
-    records = "".join(r.decode("utf-8") for r in record_list)
 
-    result_list = [json.loads(item) for item in records.split("\n") if item]
+def get_object_csv_reader(
+    bucket: str,
+    key: str,
+    compression: Compression | None = None,
+    encoding: str = "utf-8",
+    *,
+    region_name: str | None = None,
+    session: Session = None,
+) -> csv.DictReader:
+    """Returns a csv.DictReader that streams rows from the object with constant memory.
+
+    Args:
+        bucket (str): The s3 bucket with the file
+        key (str): The s3 key to the file
+        compression (Compression | None, optional): How the object is compressed, detected from the
+            ContentEncoding and key extension when None. Defaults to None.
+        encoding (str, optional): The text encoding. Defaults to "utf-8".
+
+    Returns:
+        csv.DictReader: Reader for the rows in the object
+    """
+    stream = get_object_text_stream(bucket, key, compression, encoding, region_name=region_name, session=session)
+    return csv.DictReader(stream)
+
+
+def iter_object_ndjson(
+    bucket: str,
+    key: str,
+    compression: Compression | None = None,
+    *,
+    region_name: str | None = None,
+    session: Session = None,
+) -> Iterator[Any]:
+    """Yields the records of a newline delimited JSON object, reading one line at a time. Blank lines are skipped.
+
+    Args:
+        bucket (str): The s3 bucket with the file
+        key (str): The s3 key to the file
+        compression (Compression | None, optional): How the object is compressed, detected from the
+            ContentEncoding and key extension when None. Defaults to None.
+
+    Yields:
+        Iterator[Any]: The records
+    """
+    with get_object_text_stream(bucket, key, compression, region_name=region_name, session=session) as stream:
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+
+
+class _JsonArrayParser:
+    """Incrementally parses the elements of a top-level JSON array from a text stream, the buffer only holds
+    the element being parsed."""
+
+    def __init__(self, stream: IO[str], chunk_size: int) -> None:
+        self._stream = stream
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._position = 0
+        self._eof = False
+
+    def __iter__(self) -> Iterator[Any]:
+        if self._next_character() != "[":
+            msg = "Object is not a JSON array"
+            raise ValueError(msg)
+        self._position += 1
+
+        if self._next_character() == "]":
+            return
+
+        while True:
+            self._next_character()
+            yield self._decode_value()
+
+            separator = self._next_character()
+            self._position += 1
+
+            if separator == "]":
+                return
+
+            if separator != ",":
+                msg = f"Expected ',' or ']' in JSON array, found {separator!r}"
+                raise ValueError(msg)
+
+    def _fill(self, size: int) -> None:
+        chunk = self._stream.read(size)
+        self._eof = not chunk
+        self._buffer = self._buffer[self._position :] + chunk
+        self._position = 0
+
+    def _next_character(self) -> str:
+        """Skips whitespace and returns the next character without consuming it, empty at the end of the stream"""
+        while True:
+            while self._position < len(self._buffer) and self._buffer[self._position].isspace():
+                self._position += 1
+
+            if self._position < len(self._buffer) or self._eof:
+                return self._buffer[self._position : self._position + 1]
+
+            self._fill(self._chunk_size)
+
+    def _decode_value(self) -> Any:
+        size = self._chunk_size
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._position)
+
+                # A number or literal at the end of the buffer might continue in the next chunk
+                if end < len(self._buffer) or self._eof:
+                    self._position = end
+                    return value
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+
+            self._fill(size)
+            size *= 2
+
+
+def iter_object_json_array(
+    bucket: str,
+    key: str,
+    compression: Compression | None = None,
+    chunk_size: int = 64 * 1024,
+    *,
+    region_name: str | None = None,
+    session: Session = None,
+) -> Iterator[Any]:
+    """Yields the elements of an object containing a top-level JSON array, parsing the object incrementally as
+    chunks are read.
+
+    Args:
+        bucket (str): The s3 bucket with the file
+        key (str): The s3 key to the file
+        compression (Compression | None, optional): How the object is compressed, detected from the
+            ContentEncoding and key extension when None. Defaults to None.
+        chunk_size (int, optional): Number of characters read at a time. Defaults to 64 KiB.
+
+    Yields:
+        Iterator[Any]: The array elements
+    """
+    with get_object_text_stream(bucket, key, compression, region_name=region_name, session=session) as stream:
+        yield from _JsonArrayParser(stream, chunk_size)
+
+
+def upload_fileobj(
+    bucket: str,
+    key: str,
+    object_data: BytesIO,
+    *,
+    transfer_config: TransferConfig | None = None,
+    region_name: str | None = None,
+    session: Session = None,
+):
+    object_data.seek(0)
+
+    s3_client = get_s3_client(region_name, session)
+    response = s3_client.upload_fileobj(Bucket=bucket, Key=key, Fileobj=object_data, Config=transfer_config)
+
+    return response
+
+
+class _MultipartUpload:
+    """A multipart upload where parts are uploaded on a thread pool while the caller produces the next part.
+    At most `max_concurrency` parts are held in memory, `upload_part` blocks until a slot is free."""
+
+    def __init__(
+        self,
+        s3_client,
+        bucket: str,
+        key: str,
+        max_concurrency: int,
+        *,
+        extra_args: dict | None = None,
+        progress_callback: Callable[[int], None] | None = None,
+    ) -> None:
+        self._s3_client = s3_client
+        self._bucket = bucket
+        self._key = key
+        self._progress_callback = progress_callback
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency)
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._futures: list[Future] = []
+        self._error: BaseException | None = None
+        self._lock = threading.Lock()
+        self.bytes_uploaded = 0
+
+        response = s3_client.create_multipart_upload(Bucket=bucket, Key=key, **(extra_args or {}))
+        self.upload_id = response["UploadId"]
+
+    def upload_part(self, data: bytes) -> None:
+        if self._error:
+            raise self._error
+
+        self._slots.acquire()
+        part_number = len(self._futures) + 1
+        self._futures.append(self._executor.submit(self._upload_part, part_number, data))
+
+    def _upload_part(self, part_number: int, data: bytes) -> dict:
+        try:
+            response = self._s3_client.upload_part(
+                Bucket=self._bucket, Key=self._key, UploadId=self.upload_id, PartNumber=part_number, Body=data
+            )
+        except BaseException as e:
+            self._error = self._error or e
+            raise
+        finally:
+            self._slots.release()
+
+        with self._lock:
+            self.bytes_uploaded += len(data)
+
+        if self._progress_callback:
+            self._progress_callback(len(data))
+
+        return {"ETag": response["ETag"], "PartNumber": part_number}
+
+    @property
+    def part_count(self) -> int:
+        return len(self._futures)
+
+    def complete(self) -> dict:
+        try:
+            parts = [future.result() for future in self._futures]
+        finally:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+
+        return self._s3_client.complete_multipart_upload(
+            Bucket=self._bucket, Key=self._key, UploadId=self.upload_id, MultipartUpload={"Parts": parts}
+        )
+
+    def abort(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        self._s3_client.abort_multipart_upload(Bucket=self._bucket, Key=self._key, UploadId=self.upload_id)
+
+
+def _iter_parts(source, part_size: int) -> Iterator[bytes]:
+    """Splits a file path, bytes, file object or iterable of bytes into parts of `part_size` bytes"""
+    if isinstance(source, str | os.PathLike):
+        with open(source, "rb") as file:
+            size = os.fstat(file.fileno()).st_size
+            if size == 0:
+                return
+
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped_file:
+                for start in range(0, size, part_size):
+                    yield mapped_file[start : start + part_size]
+        return
+
+    if isinstance(source, bytes | bytearray | memoryview):
+        with memoryview(source) as view:
+            for start in range(0, len(view), part_size):
+                yield view[start : start + part_size].tobytes()
+        return
+
+    chunks = iter(lambda: source.read(part_size), b"") if hasattr(source, "read") else source
+
+    buffer = bytearray()
+    for chunk in chunks:
+        buffer += chunk
+        while len(buffer) >= part_size:
+            yield bytes(buffer[:part_size])
+            del buffer[:part_size]
+
+    if buffer:
+        yield bytes(buffer)
+
+
+def upload_multipart(
+    bucket: str,
+    key: str,
+    source: str | os.PathLike | bytes | IO[bytes] | Iterable[bytes],
+    *,
+    part_size: int = 8 * MB,
+    max_concurrency: int = 10,
+    threshold: int = 8 * MB,
+    extra_args: dict | None = None,
+    progress_callback: Callable[[int], None] | None = None,
+    region_name: str | None = None,
+    session: Session = None,
+) -> dict:
+    """Uploads from a file path (memory-mapped), bytes, a file object or an iterable/generator of bytes. Sources
+    smaller than the threshold are sent with a single put_object, larger ones as a multipart upload with parts
+    uploaded concurrently while the next parts are read. A failed multipart upload is aborted.
+
+    Args:
+        bucket (str): The s3 bucket
+        key (str): The s3 key
+        source (str | os.PathLike | bytes | IO[bytes] | Iterable[bytes]): The data to upload
+        part_size (int, optional): Bytes per part, at least 5 MiB. Raised for file paths and bytes that would
+            need more than 10,000 parts. Defaults to 8 MiB.
+        max_concurrency (int, optional): Number of parts uploaded at the same time. Defaults to 10.
+        threshold (int, optional): Size from which a multipart upload is used. Defaults to 8 MiB.
+        extra_args (dict | None, optional): Extra arguments for put_object/create_multipart_upload, e.g.
+            ContentType or Metadata. Defaults to None.
+        progress_callback (Callable[[int], None] | None, optional): Called with the number of bytes of each
+            uploaded part. Defaults to None.
+
+    Returns:
+        dict: The number of bytes and parts uploaded, elapsed seconds and throughput in bytes per second
+    """
+    if part_size < MIN_PART_SIZE:
+        msg = f"Part size must be at least {MIN_PART_SIZE} bytes"
+        raise Exception(msg)
+
+    options = {
+        "part_size": part_size,
+        "max_concurrency": max_concurrency,
+        "threshold": threshold,
+        "extra_args": extra_args,
+        "progress_callback": progress_callback,
+    }
+
+    s3_client = _get_transfer_client(max_concurrency, region_name, session)
+
+    _, stats = _upload(s3_client, bucket, key, source, options)
+    return stats
+
+
+def _fit_part_size(part_size: int, size: int) -> int:
+    """Raises the part size to a whole MiB that keeps an object of `size` bytes within the 10,000 part limit"""
+    minimum_part_size = -(-size // MAX_PARTS)
+    return max(part_size, -(-minimum_part_size // MB) * MB)
+
+
+def _source_size(source) -> int | None:
+    if isinstance(source, str | os.PathLike):
+        return os.path.getsize(source)
+
+    if isinstance(source, bytes | bytearray | memoryview):
+        return memoryview(source).nbytes
+
+    return None
+
+
+def _upload(s3_client, bucket: str, key: str, source, options: dict) -> tuple[dict, dict]:
+    """Uploads like upload_multipart, returns the put_object or complete_multipart_upload response and the
+    upload stats"""
+    extra_args, progress_callback = options["extra_args"] or {}, options["progress_callback"]
+    started = time.monotonic()
+
+    part_size = options["part_size"]
+    size = _source_size(source)
+    if size is not None:
+        part_size = _fit_part_size(part_size, size)
+
+    parts = _iter_parts(source, part_size)
+    buffered: list[bytes] = []
+    buffered_size = 0
+
+    for part in parts:
+        buffered.append(part)
+        buffered_size += len(part)
+        if buffered_size >= options["threshold"]:
+            break
+
+    if buffered_size < options["threshold"]:
+        response = s3_client.put_object(Bucket=bucket, Key=key, Body=b"".join(buffered), **extra_args)
+        if progress_callback:
+            progress_callback(buffered_size)
+        bytes_uploaded, part_count = buffered_size, 1
+    else:
+        upload = _MultipartUpload(
+            s3_client,
+            bucket,
+            key,
+            options["max_concurrency"],
+            extra_args=extra_args,
+            progress_callback=progress_callback,
+        )
+        try:
+            for part in buffered:
+                upload.upload_part(part)
+            del buffered
+
+            for part in parts:
+                upload.upload_part(part)
+
+            response = upload.complete()
+        except BaseException:
+            upload.abort()
+            raise
+        bytes_uploaded, part_count = upload.bytes_uploaded, upload.part_count
+
+    seconds = time.monotonic() - started
+    stats = {
+        "bytes": bytes_uploaded,
+        "parts": part_count,
+        "seconds": seconds,
+        "bytes_per_second": bytes_uploaded / seconds if seconds > 0 else 0.0,
+    }
+
+    return response, stats
+
+
+def abort_incomplete_multipart_uploads(
+    bucket: str,
+    prefix: str = "",
+    initiated_before: datetime | None = None,
+    *,
+    region_name: str | None = None,
+    session: Session = None,
+) -> list[dict]:
+    """Aborts multipart uploads left behind by processes that stopped before completing or aborting them.
+
+    Args:
+        bucket (str): The s3 bucket
+        prefix (str, optional): Only abort uploads for keys with this prefix. Defaults to "".
+        initiated_before (datetime | None, optional): Only abort uploads started before this time, all uploads
+            when None. Defaults to None.
+
+    Returns:
+        list[dict]: The Key and UploadId of each aborted upload
+    """
+    s3_client = get_s3_client(region_name, session)
+    paginator = s3_client.get_paginator("list_multipart_uploads")
+
+    aborted = []
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        for upload in page.get("Uploads", []):
+            if initiated_before and upload["Initiated"] >= initiated_before:
+                continue
+
+            s3_client.abort_multipart_upload(Bucket=bucket, Key=upload["Key"], UploadId=upload["UploadId"])
+            aborted.append({"Key": upload["Key"], "UploadId": upload["UploadId"]})
+
+    return aborted
+
+
+def put_object(
+    bucket: str,
+    key: str,
+    object_data,
+    *,
+    compression: Compression = Compression.NONE,
+    region_name: str | None = None,
+    session: Session = None,
+):
+    """Puts an object, optionally compressed with the ContentEncoding set so reads decompress it.
+
+    Args:
+        bucket (str): The s3 bucket
+        key (str): The s3 key
+        object_data: The body, bytes, str or a file object. With compression, file objects and iterables of bytes
+            are compressed as they are read and uploaded with upload_multipart.
+        compression (Compression, optional): GZIP, ZSTD or BZIP2. Defaults to Compression.NONE.
+
+    Returns:
+        dict: The put_object response, or the complete_multipart_upload response for compressed streams
+    """
+    s3_client = get_s3_client(region_name, session)
+
+    if compression == Compression.NONE:
+        return s3_client.put_object(
+            Bucket=bucket,
+            Key=key,
+            Body=object_data,
+        )
+
+    content_encoding = _CONTENT_ENCODINGS[compression]
+
+    if isinstance(object_data, str):
+        object_data = object_data.encode("utf-8")
+
+    if isinstance(object_data, bytes | bytearray | memoryview):
+        return s3_client.put_object(
+            Bucket=bucket, Key=key, Body=_compress(object_data, compression), ContentEncoding=content_encoding
+        )
+
+    chunks = iter(lambda: object_data.read(MB), b"") if hasattr(object_data, "read") else object_data
+    options = {
+        "part_size": 8 * MB,
+        "max_concurrency": DEFAULT_MAX_POOL_CONNECTIONS,
+        "threshold": 8 * MB,
+        "extra_args": {"ContentEncoding": content_encoding},
+        "progress_callback": None,
+    }
+
+    response, _ = _upload(s3_client, bucket, key, _iter_compressed(chunks, compression), options)
+    return response
+
+
+def put_object_json(
+    bucket: str,
+    key: str,
+    json_object,
+    *,
+    compression: Compression = Compression.NONE,
+    region_name: str | None = None,
+    session: Session = None,
+):
+    return put_object(
+        bucket, key, json.dumps(json_object), compression=compression, region_name=region_name, session=session
+    )
+
+
+class _TextBuffer:
+    """Collects written text until it's encoded, used as the file of csv writers"""
+
+    def __init__(self) -> None:
+        self.chunks: list[str] = []
+        self.size = 0
+
+    def write(self, text: str) -> None:
+        self.chunks.append(text)
+        self.size += len(text)
+
+    def pop(self) -> str:
+        text = "".join(self.chunks)
+        self.chunks, self.size = [], 0
+        return text
+
+
+class S3RecordWriter(ABC):
+    """Writes records to an object as they are produced. Encoded records are compressed and buffered into parts
+    that are uploaded in the background by a multipart upload while more records are written, so memory stays
+    bounded by `max_concurrency` parts. Output smaller than one part is sent with a single put_object. Used as a
+    context manager the upload is completed on exit, or aborted when an exception is raised.
+
+    Subclasses encode records by writing text to `self._text`, see S3NdjsonWriter and S3CsvWriter.
+
+    Args:
+        bucket (str): The s3 bucket
+        key (str): The s3 key
+        compression (Compression, optional): GZIP, ZSTD or BZIP2, sets the ContentEncoding.
+            Defaults to Compression.NONE.
+        encoding (str, optional): The text encoding. Defaults to "utf-8".
+        part_size (int, optional): Bytes per part, at least 5 MiB. Defaults to 8 MiB.
+        max_concurrency (int, optional): Number of parts uploaded at the same time. Defaults to 4.
+        extra_args (dict | None, optional): Extra arguments for put_object/create_multipart_upload, the
+            ContentType defaults to the type of the format. Defaults to None.
+    """
+
+    content_type = "application/octet-stream"
+
+    def __init__(
+        self,
+        bucket: str,
+        key: str,
+        *,
+        compression: Compression = Compression.NONE,
+        encoding: str = "utf-8",
+        part_size: int = 8 * MB,
+        max_concurrency: int = 4,
+        extra_args: dict | None = None,
+        region_name: str | None = None,
+        session: Session = None,
+    ) -> None:
+        if part_size < MIN_PART_SIZE:
+            msg = f"Part size must be at least {MIN_PART_SIZE} bytes"
+            raise Exception(msg)
+
+        self._s3_client = _get_transfer_client(max_concurrency, region_name, session)
+        self._bucket = bucket
+        self._key = key
+        self._encoding = encoding
+        self._part_size = part_size
+        self._max_concurrency = max_concurrency
+        self._compressor = _Compressor(compression)
+        self._text = _TextBuffer()
+        self._buffer = bytearray()
+        self._upload: _MultipartUpload | None = None
+        self._closed = False
+
+        self._extra_args = {"ContentType": self.content_type, **(extra_args or {})}
+        if compression != Compression.NONE:
+            self._extra_args["ContentEncoding"] = _CONTENT_ENCODINGS[compression]
+
+        self.records = 0
+        self.result: dict | None = None
+
+    @abstractmethod
+    def _encode(self, record) -> None:
+        """Writes the text of one record to `self._text`"""
+
+    def write(self, record) -> None:
+        if self._closed:
+            msg = "Writer is closed"
+            raise Exception(msg)
+
+        self._encode(record)
+        self.records += 1
+
+        if self._text.size >= 64 * 1024:
+            self._flush_text()
+
+    def write_records(self, records: Iterable) -> None:
+        for record in records:
+            self.write(record)
+
+    def _flush_text(self) -> None:
+        self._buffer += self._compressor.compress(self._text.pop().encode(self._encoding))
+
+        while len(self._buffer) >= self._part_size:
+            if self._upload is None:
+                self._upload = _MultipartUpload(
+                    self._s3_client, self._bucket, self._key, self._max_concurrency, extra_args=self._extra_args
+                )
+
+            self._upload.upload_part(bytes(self._buffer[: self._part_size]))
+            del self._buffer[: self._part_size]
+
+    def close(self) -> dict:
+        """Uploads the remaining records and completes the upload.
+
+        Returns:
+            dict: The number of records, bytes and parts uploaded
+        """
+        if self._closed:
+            return self.result
+
+        self._closed = True
+
+        try:
+            self._flush_text()
+            self._buffer += self._compressor.flush()
+
+            if self._upload is None:
+                self._s3_client.put_object(
+                    Bucket=self._bucket, Key=self._key, Body=bytes(self._buffer), **self._extra_args
+                )
+                uploaded_bytes, parts = len(self._buffer), 1
+            else:
+                if self._buffer:
+                    self._upload.upload_part(bytes(self._buffer))
+                self._upload.complete()
+                uploaded_bytes, parts = self._upload.bytes_uploaded, self._upload.part_count
+        except BaseException:
+            self.abort()
+            raise
+
+        self._buffer = bytearray()
+        self.result = {"records": self.records, "bytes": uploaded_bytes, "parts": parts}
+        return self.result
+
+    def abort(self) -> None:
+        """Discards the records, the multipart upload is aborted so no object is created"""
+        self._closed = True
+        self._buffer = bytearray()
+
+        if self._upload is not None:
+            self._upload.abort()
+            self._upload = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class S3NdjsonWriter(S3RecordWriter):
+    """Writes each record as a line of newline delimited JSON, the counterpart of iter_object_ndjson"""
+
+    content_type = "application/x-ndjson"
+
+    def _encode(self, record) -> None:
+        self._text.write(json.dumps(record))
+        self._text.write("\n")
+
+
+class S3CsvWriter(S3RecordWriter):
+    """Writes dict records as CSV rows with a header, the counterpart of get_object_csv_reader. The fieldnames
+    default to the keys of the first record, with fieldnames the header is written even without records."""
+
+    content_type = "text/csv"
+
+    def __init__(self, bucket: str, key: str, fieldnames: list[str] | None = None, **kwargs) -> None:
+        super().__init__(bucket, key, **kwargs)
+        self._fieldnames = fieldnames
+        self._writer: csv.DictWriter | None = None
+
+    def _encode(self, record: dict) -> None:
+        if self._writer is None:
+            self._writer = csv.DictWriter(self._text, fieldnames=self._fieldnames or list(record))
+            self._writer.writeheader()
+
+        self._writer.writerow(record)
+
+    def close(self) -> dict:
+        if self._writer is None and self._fieldnames and not self._closed:
+            self._writer = csv.DictWriter(self._text, fieldnames=self._fieldnames)
+            self._writer.writeheader()
+
+        return super().close()
+
+
+def delete_object(bucket: str, key: str, region_name: str | None = None, session: Session = None):
+    s3_client = get_s3_client(region_name, session)
+
+    response = s3_client.delete_object(Bucket=bucket, Key=key)
+
+    return response
+
+
+def delete_objects_simplified(bucket: str, keys: list[str], *, region_name: str | None = None, session: Session = None):
+    s3_client = get_s3_client(region_name, session)
+
+    delete_objects = {"Objects": [{"Key": key} for key in keys]}
+    response = s3_client.delete_objects(Bucket=bucket, Delete=delete_objects)
+
+    return response
+
+
+def _delete_identifier(item: str | tuple[str, str] | dict) -> dict:
+    if isinstance(item, str):
+        return {"Key": item}
+
+    if isinstance(item, tuple):
+        key, version_id = item
+        return {"Key": key, "VersionId": version_id}
+
+    identifier = {"Key": item["Key"]}
+    if item.get("VersionId"):
+        identifier["VersionId"] = item["VersionId"]
+
+    return identifier
+
+
+def _delete_chunk(s3_client, bucket: str, objects: list[dict], max_attempts: int) -> list[dict]:
+    errors = []
+    for attempt in range(1, max_attempts + 1):
+        response = s3_client.delete_objects(Bucket=bucket, Delete={"Objects": objects, "Quiet": True})
+        errors = response.get("Errors", [])
+
+        if not errors:
+            break
+
+        if attempt < max_attempts:
+            objects = [_delete_identifier(error) for error in errors]
+            time.sleep(0.1 * 2 ** (attempt - 1))
+
+    return errors
+
+
+def delete_objects_bulk(
+    bucket: str,
+    keys: Iterable[str | tuple[str, str] | dict],
+    *,
+    max_concurrency: int = 4,
+    max_attempts: int = 3,
+    region_name: str | None = None,
+    session: Session = None,
+) -> dict:
+    """Deletes any number of objects, chunked into delete_objects requests of 1000 keys that run concurrently.
+    Keys that fail are retried and reported with their error when they still fail.
+
+    Args:
+        bucket (str): The s3 bucket
+        keys (Iterable[str | tuple[str, str] | dict]): Keys, (key, version id) tuples or dicts with a Key and
+            optional VersionId such as the objects yielded by iter_objects. Consumed lazily.
+        max_concurrency (int, optional): Number of delete requests running at the same time. Defaults to 4.
+        max_attempts (int, optional): Attempts for keys that fail to delete. Defaults to 3.
+
+    Returns:
+        dict: The number of deleted objects and the errors (Key, VersionId, Code, Message) of objects that
+            couldn't be deleted
+    """
+    s3_client = _get_transfer_client(max_concurrency, region_name, session)
+    identifiers = map(_delete_identifier, keys)
+
+    requested = 0
+    errors = []
+
+    def collect(futures: set[Future]) -> None:
+        for future in futures:
+            errors.extend(future.result())
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        pending: set[Future] = set()
+
+        while objects := list(islice(identifiers, MAX_DELETE_KEYS)):
+            if len(pending) >= max_concurrency:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+
+            requested += len(objects)
+            pending.add(executor.submit(_delete_chunk, s3_client, bucket, objects, max_attempts))
+
+        collect(pending)
+
+    return {"deleted": requested - len(errors), "errors": errors}
+
+
+def copy(
+    source_bucket: str,
+    source_key: str,
+    destination_bucket: str,
+    destination_key: str,
+    *,
+    region_name: str | None = None,
+    session: Session = None,
+):
+    s3_client = get_s3_client(region_name, session)
+
+    source = {
+        "Bucket": source_bucket,
+        "Key": source_key,
+    }
+    response = s3_client.copy(source, destination_bucket, destination_key)
+
+    return response
+
+
+_COPY_HEADERS = ["CacheControl", "ContentDisposition", "ContentEncoding", "ContentLanguage", "ContentType", "Metadata"]
+
+
+def _copy_object(source_client, destination_client, copy_request: tuple, options: dict) -> int:
+    source_bucket, source_key, destination_bucket, destination_key, size = copy_request
+    copy_source = {"Bucket": source_bucket, "Key": source_key}
+
+    head = None
+    if size is None:
+        head = source_client.head_object(**copy_source)
+        size = head["ContentLength"]
+
+    if size <= options["multipart_threshold"]:
+        destination_client.copy_object(
+            CopySource=copy_source, Bucket=destination_bucket, Key=destination_key, MetadataDirective="COPY"
+        )
+        return size
+
+    head = head or source_client.head_object(**copy_source)
+    extra_args = {header: head[header] for header in _COPY_HEADERS if head.get(header)}
+
+    # The part size grows for objects that would need more than 10,000 parts
+    part_size = _fit_part_size(options["part_size"], size)
+
+    response = destination_client.create_multipart_upload(Bucket=destination_bucket, Key=destination_key, **extra_args)
+    upload_id = response["UploadId"]
+
+    def copy_part(part_number: int, start: int) -> dict:
+        end = min(start + part_size, size) - 1
+        response = destination_client.upload_part_copy(
+            Bucket=destination_bucket,
+            Key=destination_key,
+            UploadId=upload_id,
+            PartNumber=part_number,
+            CopySource=copy_source,
+            CopySourceRange=f"bytes={start}-{end}",
+            CopySourceIfMatch=head["ETag"],
+        )
+        return {"ETag": response["CopyPartResult"]["ETag"], "PartNumber": part_number}
+
+    try:
+        arguments = list(enumerate(range(0, size, part_size), start=1))
+        parts = _run_concurrently(options["part_concurrency"], copy_part, arguments)
+
+        destination_client.complete_multipart_upload(
+            Bucket=destination_bucket, Key=destination_key, UploadId=upload_id, MultipartUpload={"Parts": parts}
+        )
+    except BaseException:
+        destination_client.abort_multipart_upload(Bucket=destination_bucket, Key=destination_key, UploadId=upload_id)
+        raise
+
+    return size
+
+
+def _copy_many(copies: Iterable[tuple], options: dict, region_name: str | None, session: Session) -> dict:
+    if options["part_size"] < MIN_PART_SIZE:
+        msg = f"Part size must be at least {MIN_PART_SIZE} bytes"
+        raise Exception(msg)
+
+    source_client = _get_transfer_client(
+        options["max_concurrency"], options["source_region_name"] or region_name, session
+    )
+    # Each object copy runs up to part_concurrency upload_part_copy requests on the destination client
+    destination_client = _get_transfer_client(
+        options["max_concurrency"] * options["part_concurrency"], region_name, session
+    )
+    started = time.monotonic()
+
+    results = []
+
+    def copy_with_result(copy_request: tuple) -> dict:
+        result = {
+            "source_bucket": copy_request[0],
+            "source_key": copy_request[1],
+            "destination_bucket": copy_request[2],
+            "destination_key": copy_request[3],
+        }
+        try:
+            result["size"] = _copy_object(source_client, destination_client, copy_request, options)
+
+            if options["delete_source"]:
+                source_client.delete_object(Bucket=copy_request[0], Key=copy_request[1])
+
+            result["success"] = True
+        except Exception as e:
+            result["success"] = False
+            result["error"] = str(e)
+
+        return result
+
+    with ThreadPoolExecutor(max_workers=options["max_concurrency"]) as executor:
+        pending: set[Future] = set()
+
+        for copy_request in copies:
+            if len(pending) >= options["max_concurrency"] * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                results.extend(future.result() for future in done)
+
+            pending.add(executor.submit(copy_with_result, copy_request))
+
+        results.extend(future.result() for future in pending)
+
+    seconds = time.monotonic() - started
+    copied_bytes = sum(result.get("size", 0) for result in results)
+
+    return {
+        "results": results,
+        "bytes": copied_bytes,
+        "seconds": seconds,
+        "bytes_per_second": copied_bytes / seconds if seconds > 0 else 0.0,
+    }
+
+
+def copy_many(
+    copies: Iterable[tuple[str, str, str, str]],
+    *,
+    max_concurrency: int = 10,
+    multipart_threshold: int = 64 * MB,
+    part_size: int = 64 * MB,
+    part_concurrency: int = 10,
+    source_region_name: str | None = None,
+    delete_source: bool = False,
+    region_name: str | None = None,
+    session: Session = None,
+) -> dict:
+    """Copies objects concurrently. Objects up to the threshold are copied with a single copy_object, larger
+    objects with concurrent upload_part_copy requests. Metadata and content headers are preserved.
+
+    Args:
+        copies (Iterable[tuple[str, str, str, str]]): (source bucket, source key, destination bucket,
+            destination key) tuples, consumed lazily
+        max_concurrency (int, optional): Number of objects copied at the same time. Defaults to 10.
+        multipart_threshold (int, optional): Size from which a multipart copy is used, at most 5 GiB.
+            Defaults to 64 MiB.
+        part_size (int, optional): Bytes per upload_part_copy, at least 5 MiB. Raised for objects that would need
+            more than 10,000 parts. Defaults to 64 MiB.
+        part_concurrency (int, optional): Parts copied at the same time for each object. Defaults to 10.
+        source_region_name (str | None, optional): Region of the source buckets when different from the
+            destination region. Defaults to None.
+        delete_source (bool, optional): Delete each source object after it's copied, turning the copy into a
+            move. Defaults to False.
+
+    Returns:
+        dict: Results with the success, size or error of each copy, the total bytes, elapsed seconds and
+            throughput in bytes per second
+    """
+    options = {
+        "max_concurrency": max_concurrency,
+        "multipart_threshold": multipart_threshold,
+        "part_size": part_size,
+        "part_concurrency": part_concurrency,
+        "source_region_name": source_region_name,
+        "delete_source": delete_source,
+    }
+
+    return _copy_many(((*copy_request, None) for copy_request in copies), options, region_name, session)
+
+
+def copy_prefix(
+    source_bucket: str,
+    source_prefix: str,
+    destination_bucket: str,
+    destination_prefix: str,
+    *,
+    max_concurrency: int = 10,
+    multipart_threshold: int = 64 * MB,
+    part_size: int = 64 * MB,
+    part_concurrency: int = 10,
+    source_region_name: str | None = None,
+    delete_source: bool = False,
+    region_name: str | None = None,
+    session: Session = None,
+) -> dict:
+    """Copies every object under a prefix to another prefix, see copy_many. The source_prefix is replaced by the
+    destination_prefix in the destination keys. When the destination prefix is inside the source prefix of the
+    same bucket, objects under the destination prefix are not copied so copies aren't copied again.
+    """
+    options = {
+        "max_concurrency": max_concurrency,
+        "multipart_threshold": multipart_threshold,
+        "part_size": part_size,
+        "part_concurrency": part_concurrency,
+        "source_region_name": source_region_name,
+        "delete_source": delete_source,
+    }
+
+    # The source is listed while copying, copies written inside the source prefix would be listed and copied again
+    nested_destination = source_bucket == destination_bucket and destination_prefix.startswith(source_prefix)
+
+    objects = iter_objects(source_bucket, source_prefix, region_name=source_region_name or region_name, session=session)
+    copies = (
+        (
+            source_bucket,
+            item["Key"],
+            destination_bucket,
+            destination_prefix + item["Key"][len(source_prefix) :],
+            item["Size"],
+        )
+        for item in objects
+        if not (nested_destination and item["Key"].startswith(destination_prefix))
+    )
+
+    return _copy_many(copies, options, region_name, session)
+
+
+def list_objects_v2(
+    bucket: str,
+    prefix: str,
+    max_keys: int | None = None,
+    continuation_token: str | None = None,
+    *,
+    region_name: str | None = None,
+    session: Session = None,
+):
+    s3_client = get_s3_client(region_name, session)
+
+    kwargs = {"Bucket": bucket, "Prefix": prefix}
+
+    if continuation_token:
+        kwargs["ContinuationToken"] = continuation_token
+
+    if max_keys:
+        kwargs["MaxKeys"] = max_keys
+
+    response = s3_client.list_objects_v2(**kwargs)
+
+    result = {"keys": [item["Key"] for item in response.get("Contents", [])]}
+
+    if response.get("NextContinuationToken"):
+        result["NextContinuationToken"] = response.get("NextContinuationToken")
+
+    return result
+
+
+def iter_objects(
+    bucket: str,
+    prefix: str = "",
+    page_size: int | None = None,
+    *,
+    region_name: str | None = None,
+    session: Session = None,
+) -> Iterator[dict]:
+    """Yields every object under a prefix, following continuation tokens, with the metadata returned by the listing
+    (Key, Size, ETag, LastModified, StorageClass).
+
+    Args:
+        bucket (str): The s3 bucket
+        prefix (str, optional): The key prefix. Defaults to "".
+        page_size (int | None, optional): Keys per list request, S3 returns up to 1000 when None. Defaults to None.
+
+    Yields:
+        Iterator[dict]: The objects, ordered by key
+    """
+    s3_client = get_s3_client(region_name, session)
+    yield from _iter_objects(s3_client, bucket, prefix, page_size)
+
+
+def _iter_objects(s3_client, bucket: str, prefix: str, page_size: int | None) -> Iterator[dict]:
+    paginator = s3_client.get_paginator("list_objects_v2")
+
+    pagination_config = {"PageSize": page_size} if page_size else {}
+
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix, PaginationConfig=pagination_config):
+        yield from page.get("Contents", [])
+
+
+class _ConcurrentMerge:
+    """Consumes iterables on a thread pool and yields their items as they arrive. A bounded queue keeps
+    producers from running ahead of the consumer, they stop when the consumer closes the generator."""
+
+    _DONE = object()
+
+    def __init__(self, producers: list[Callable[[], Iterable]], max_concurrency: int) -> None:
+        self._producers = producers
+        self._max_concurrency = max_concurrency
+        self._items: queue.Queue = queue.Queue(maxsize=max_concurrency * 100)
+        self._stopped = threading.Event()
+
+    def __iter__(self) -> Iterator:
+        executor = ThreadPoolExecutor(max_workers=self._max_concurrency)
+        try:
+            for producer in self._producers:
+                executor.submit(self._consume, producer)
+
+            remaining = len(self._producers)
+            while remaining:
+                item = self._items.get()
+
+                if item is self._DONE:
+                    remaining -= 1
+                elif isinstance(item, _ProducerError):
+                    raise item.error
+                else:
+                    yield item
+        finally:
+            self._stopped.set()
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _put(self, item) -> None:
+        while not self._stopped.is_set():
+            try:
+                self._items.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _consume(self, producer: Callable[[], Iterable]) -> None:
+        try:
+            for item in producer():
+                if self._stopped.is_set():
+                    return
+                self._put(item)
+        except Exception as e:
+            self._put(_ProducerError(e))
+        finally:
+            self._put(self._DONE)
+
+
+class _ProducerError:
+    def __init__(self, error: Exception) -> None:
+        self.error = error
+
+
+def _list_common_prefixes(
+    s3_client, bucket: str, prefix: str, delimiter: str, page_size: int | None
+) -> tuple[list[dict], list[str]]:
+    paginator = s3_client.get_paginator("list_objects_v2")
+    pagination_config = {"PageSize": page_size} if page_size else {}
+
+    objects = []
+    prefixes = []
+    for page in paginator.paginate(
+        Bucket=bucket, Prefix=prefix, Delimiter=delimiter, PaginationConfig=pagination_config
+    ):
+        objects.extend(page.get("Contents", []))
+        prefixes.extend(common_prefix["Prefix"] for common_prefix in page.get("CommonPrefixes", []))
+
+    return objects, prefixes
+
+
+def iter_objects_parallel(
+    bucket: str,
+    prefix: str = "",
+    delimiter: str = "/",
+    *,
+    max_concurrency: int = 8,
+    page_size: int | None = None,
+    region_name: str | None = None,
+    session: Session = None,
+) -> Iterator[dict]:
+    """Yields every object under a prefix by discovering the common prefixes one level down with a delimiter and
+    listing them concurrently. Objects are yielded as pages arrive so they are not ordered by key.
+
+    Args:
+        bucket (str): The s3 bucket
+        prefix (str, optional): The key prefix. Defaults to "".
+        delimiter (str, optional): The delimiter used to shard the prefix. Defaults to "/".
+        max_concurrency (int, optional): Number of prefixes listed at the same time. Defaults to 8.
+        page_size (int | None, optional): Keys per list request, S3 returns up to 1000 when None. Defaults to None.
+
+    Yields:
+        Iterator[dict]: The objects
+    """
+    s3_client = _get_transfer_client(max_concurrency, region_name, session)
+
+    objects, prefixes = _list_common_prefixes(s3_client, bucket, prefix, delimiter, page_size)
+    yield from objects
+
+    if not prefixes:
+        return
+
+    def list_prefix(shard_prefix: str) -> Iterator[dict]:
+        return _iter_objects(s3_client, bucket, shard_prefix, page_size)
+
+    yield from _ConcurrentMerge([partial(list_prefix, shard_prefix) for shard_prefix in prefixes], max_concurrency)
+
+
+_SQL_INPUT_SERIALIZATIONS = {
+    "csv": {
+        "CSV": {
+            "FileHeaderInfo": "Use",
+            "AllowQuotedRecordDelimiter": True,
+            "RecordDelimiter": "\n",
+            "FieldDelimiter": ",",
+            "QuoteCharacter": '"',
+        },
+    },
+    "json": {"JSON": {"Type": "DOCUMENT"}},
+    "jsonl": {"JSON": {"Type": "LINES"}},
+    "parquet": {"Parquet": {}},
+}
+
+
+def _get_input_serialization(input_type: str, compression: Compression) -> dict:
+    input_serialization = _SQL_INPUT_SERIALIZATIONS.get(input_type)
+
+    if not input_serialization:
+        msg = f"Input type is not supported: {input_type}"
+        raise Exception(msg)
+
+    if compression not in [Compression.NONE, Compression.GZIP, Compression.BZIP2]:
+        msg = f"Compression is not supported: {compression.name}"
+        raise Exception(msg)
+
+    return {**input_serialization, "CompressionType": compression.name}
+
+
+def _iter_select_records(payload: Iterable[dict], progress_callback: Callable[[dict], None] | None) -> Iterator[Any]:
+    """Parses the JSON records of a select_object_content event stream as chunks arrive, records and multi-byte
+    characters can be split across chunks."""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    remainder = ""
+
+    for event in payload:
+        if "Records" in event:
+            lines = (remainder + decoder.decode(event["Records"]["Payload"])).split("\n")
+            remainder = lines.pop()
+
+            for line in lines:
+                if line:
+                    yield json.loads(line)
+        elif progress_callback and ("Stats" in event or "Progress" in event):
+            progress_callback(event)
+
+    remainder += decoder.decode(b"", final=True)
+    if remainder.strip():
+        yield json.loads(remainder)
+
+
+def _iter_sql_query(
+    s3_client,
+    bucket: str,
+    key: str,
+    query: str,
+    input_serialization: dict,
+    *,
+    scan_range: tuple[int, int] | None = None,
+    progress_callback: Callable[[dict], None] | None = None,
+) -> Iterator[Any]:
+    kwargs = {}
+    if progress_callback:
+        kwargs["RequestProgress"] = {"Enabled": True}
+
+    if scan_range:
+        kwargs["ScanRange"] = {"Start": scan_range[0], "End": scan_range[1]}
+
+        # S3 rejects scan ranges on csv that allows quoted record delimiters
+        if "CSV" in input_serialization:
+            csv = {**input_serialization["CSV"]}
+            csv.pop("AllowQuotedRecordDelimiter", None)
+            input_serialization = {**input_serialization, "CSV": csv}
+
+    resp = s3_client.select_object_content(
+        Bucket=bucket,
+        Key=key,
+        ExpressionType="SQL",
+        Expression=query,
+        InputSerialization=input_serialization,
+        OutputSerialization={
+            "JSON": {
+                "RecordDelimiter": "\n",
+            }
+        },
+        **kwargs,
+    )
+
+    yield from _iter_select_records(resp["Payload"], progress_callback)
+
+
+def iter_sql_query(
+    bucket: str,
+    key: str,
+    query: str,
+    input_type: str,
+    compression: Compression = Compression.NONE,
+    *,
+    scan_range: tuple[int, int] | None = None,
+    progress_callback: Callable[[dict], None] | None = None,
+    region_name: str | None = None,
+    session: Session = None,
+) -> Iterator[Any]:
+    """Performs an S3 Select statement against a file in S3, yielding records as the results stream in.
+
+    Args:
+        bucket (str): The s3 bucket with the file
+        key (str): The s3 key to the file
+        query (str): The query
+        input_type (str): The files format, one of 'csv', 'json', 'jsonl' (JSON lines) or 'parquet'.
+        compression (Compression, optional): NONE, GZIP or BZIP2. Defaults to Compression.NONE.
+        scan_range (tuple[int, int] | None, optional): Only query records starting in the inclusive byte range,
+            for uncompressed csv and jsonl objects. Ranged csv is read without quoted record delimiters, a quoted
+            field must not contain a newline. Defaults to None.
+        progress_callback (Callable[[dict], None] | None, optional): Called with the Progress and Stats events,
+            their Details have the BytesScanned, BytesProcessed and BytesReturned. Defaults to None.
+
+    Yields:
+        Iterator[Any]: The selected records
+    """
+    input_serialization = _get_input_serialization(input_type, compression)
+    s3_client = get_s3_client(region_name, session)
+
+    yield from _iter_sql_query(
+        s3_client,
+        bucket,
+        key,
+        query,
+        input_serialization,
+        scan_range=scan_range,
+        progress_callback=progress_callback,
+    )
+
+
+def execute_sql_query_simplified(
+    bucket: str,
+    key: str,
+    query: str,
+    input_type: str,
+    compression: Compression = Compression.NONE,
+    *,
+    region_name: str | None = None,
+    session: Session = None,
+) -> list[Any]:
+    """Performs an S3 Select statement against a file in S3.
+    The aws region used is the 'DefaultRegion' in os.environ.
+
+    Args:
+        bucket (str): The s3 bucket with the file
+        key (str): The s3 key to the file
+        query (str): The query
+        input_type (str): The files format, one of 'csv', 'json', 'jsonl' (JSON lines) or 'parquet'.
+        compression (Compression, optional): NONE, GZIP or BZIP2. Defaults to Compression.NONE.
+
+    Returns:
+        dict: The selected data
+    """
+    return list(iter_sql_query(bucket, key, query, input_type, compression, region_name=region_name, session=session))
+
+
+def iter_sql_query_parallel(
+    bucket: str,
+    key: str,
+    query: str,
+    input_type: str,
+    *,
+    part_size: int = 64 * MB,
+    max_concurrency: int = 8,
+    preserve_order: bool = True,
+    region_name: str | None = None,
+    session: Session = None,
+) -> Iterator[Any]:
+    """Performs an S3 Select statement over byte ranges of an uncompressed csv or jsonl object concurrently.
+    Every record is processed by the range it starts in. Aggregate queries (count, sum, ...) return one result
+    per range. Csv is read without quoted record delimiters, a quoted field must not contain a newline.
+
+    Args:
+        bucket (str): The s3 bucket with the file
+        key (str): The s3 key to the file
+        query (str): The query
+        input_type (str): The files format, 'csv' or 'jsonl'
+        part_size (int, optional): Bytes per scan range. Defaults to 64 MiB.
+        max_concurrency (int, optional): Number of ranges queried at the same time. Defaults to 8.
+        preserve_order (bool, optional): Yield records in object order, otherwise records are yielded as they
+            arrive. Defaults to True.
+
+    Yields:
+        Iterator[Any]: The selected records
+    """
+    if input_type not in ["csv", "jsonl"]:
+        msg = f"Scan ranges are not supported for input type: {input_type}"
+        raise Exception(msg)
+
+    input_serialization = _get_input_serialization(input_type, Compression.NONE)
+    s3_client = _get_transfer_client(max_concurrency, region_name, session)
+    size = s3_client.head_object(Bucket=bucket, Key=key)["ContentLength"]
+    scan_ranges = [(start, min(start + part_size, size) - 1) for start in range(0, size, part_size)]
+
+    def query_range(scan_range: tuple[int, int]) -> Iterator[Any]:
+        return _iter_sql_query(s3_client, bucket, key, query, input_serialization, scan_range=scan_range)
+
+    if not preserve_order:
+        yield from _ConcurrentMerge([partial(query_range, scan_range) for scan_range in scan_ranges], max_concurrency)
+        return
+
+    # Ranges are collected in memory, the window of pending ranges bounds how far ahead queries run
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        pending: list[Future] = []
+
+        for scan_range in scan_ranges:
+            if len(pending) >= max_concurrency:
+                yield from pending.pop(0).result()
+
+            pending.append(executor.submit(list, query_range(scan_range)))
 
-    return result_list
+        for future in pending:
+            yield from future.result()
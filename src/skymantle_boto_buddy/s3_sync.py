@@ -0,0 +1,453 @@
+import hashlib
+import json
+import mmap
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum
+
+from boto3 import Session
+
+from skymantle_boto_buddy import s3
+from skymantle_boto_buddy.s3 import MB, MIN_PART_SIZE
+
+MANIFEST_FILE_NAME = ".boto_buddy_sync.json"
+MANIFEST_VERSION = 1
+
+
+class SyncDirection(Enum):
+    UPLOAD = 1
+    DOWNLOAD = 2
+
+
+def compute_etag(file_path: str | os.PathLike, part_size: int | None = None) -> str:
+    """Computes the ETag S3 gives a file uploaded without SSE-KMS, the MD5 of the file for a single put or the
+    MD5 of the part MD5s followed by the part count for a multipart upload.
+
+    Args:
+        file_path (str | os.PathLike): The local file
+        part_size (int | None, optional): Bytes per part of the multipart upload, a single put when None.
+            Defaults to None.
+
+    Returns:
+        str: The quoted ETag
+    """
+    with open(file_path, "rb") as file:
+        size = os.fstat(file.fileno()).st_size
+        if size == 0:
+            return f'"{hashlib.md5(b"", usedforsecurity=False).hexdigest()}"'
+
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped_file:
+            if part_size is None:
+                return f'"{hashlib.md5(mapped_file, usedforsecurity=False).hexdigest()}"'
+
+            digests = b"".join(
+                hashlib.md5(mapped_file[start : start + part_size], usedforsecurity=False).digest()
+                for start in range(0, size, part_size)
+            )
+            part_count = -(-size // part_size)
+
+    return f'"{hashlib.md5(digests, usedforsecurity=False).hexdigest()}-{part_count}"'
+
+
+def _candidate_part_sizes(size: int, etag: str, part_size: int) -> list[int | None]:
+    """The part sizes that could have produced a multipart ETag, the sync part size and the defaults of this
+    package and the AWS CLI first, then the smallest whole MiB size giving the same part count"""
+    if "-" not in etag:
+        return [None]
+
+    part_count = int(etag.strip('"').rsplit("-", 1)[1])
+    whole_mib = -(-size // part_count // MB) * MB if part_count else 0
+
+    candidates = []
+    for candidate in [part_size, 8 * MB, MIN_PART_SIZE, 16 * MB, 64 * MB, whole_mib, whole_mib + MB]:
+        if candidate and candidate not in candidates and -(-size // candidate) == part_count:
+            candidates.append(candidate)
+
+    return candidates
+
+
+def _normalize_prefix(prefix: str) -> str:
+    return prefix if not prefix or prefix.endswith("/") else f"{prefix}/"
+
+
+def _list_local(directory: str, manifest_path: str) -> dict[str, os.stat_result]:
+    files = {}
+    excluded = os.path.abspath(manifest_path)
+
+    for root, _, names in os.walk(directory):
+        for name in names:
+            path = os.path.join(root, name)
+            if os.path.abspath(path) == excluded:
+                continue
+
+            relative_path = os.path.relpath(path, directory).replace(os.sep, "/")
+            files[relative_path] = os.stat(path)
+
+    return files
+
+
+def _list_remote(bucket: str, prefix: str, region_name: str | None, session: Session) -> dict[str, dict]:
+    return {
+        item["Key"][len(prefix) :]: item
+        for item in s3.iter_objects(bucket, prefix, region_name=region_name, session=session)
+        if not item["Key"].endswith("/")
+    }
+
+
+def _manifest_entry(stat: os.stat_result, etag: str) -> dict:
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "etag": etag}
+
+
+def load_manifest(manifest_path: str | os.PathLike) -> dict:
+    """Loads a sync manifest, an empty manifest when the file doesn't exist or has another version"""
+    try:
+        with open(manifest_path, encoding="utf-8") as file:
+            manifest = json.load(file)
+    except FileNotFoundError:
+        return {"version": MANIFEST_VERSION, "targets": {}}
+
+    if manifest.get("version") != MANIFEST_VERSION:
+        return {"version": MANIFEST_VERSION, "targets": {}}
+
+    return manifest
+
+
+def _save_manifest(manifest_path: str, manifest: dict) -> None:
+    directory = os.path.dirname(os.path.abspath(manifest_path))
+    os.makedirs(directory, exist_ok=True)
+
+    file_descriptor, temporary_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(file_descriptor, "w", encoding="utf-8") as file:
+            json.dump(manifest, file, separators=(",", ":"), sort_keys=True)
+        os.replace(temporary_path, manifest_path)
+    except BaseException:
+        os.remove(temporary_path)
+        raise
+
+
+def _compare(path: str, stat: os.stat_result, remote: dict, entry: dict | None, part_size: int) -> tuple:
+    """Returns why a file differs from its object, None when they match, and the manifest entry to keep"""
+    if stat.st_size != remote["Size"]:
+        return "size", None
+
+    etag = remote["ETag"]
+    if entry == _manifest_entry(stat, etag):
+        return None, entry
+
+    for candidate in _candidate_part_sizes(stat.st_size, etag, part_size):
+        if compute_etag(path, candidate) == etag:
+            return None, _manifest_entry(stat, etag)
+
+    return "etag", None
+
+
+def _resolve_local_path(options: dict, relative_path: str) -> str | None:
+    """The real local path of a file, None when it resolves outside the directory (e.g. a key with ..)"""
+    root = os.path.realpath(options["directory"])
+    path = os.path.realpath(os.path.join(root, *relative_path.split("/")))
+
+    if path == root or os.path.commonpath([root, path]) != root:
+        return None
+
+    return path
+
+
+def _local_path(options: dict, relative_path: str) -> str:
+    return os.path.join(options["directory"], *relative_path.split("/"))
+
+
+def _writable_local_path(options: dict, relative_path: str) -> str:
+    """The real path of a file written or deleted by a download sync, checked to be inside the directory"""
+    path = _resolve_local_path(options, relative_path)
+
+    if path is None:
+        msg = f"Path resolves outside the directory: {relative_path}"
+        raise Exception(msg)
+
+    return path
+
+
+def _target(options: dict) -> str:
+    return f"s3://{options['bucket']}/{options['prefix']}"
+
+
+def _plan(options: dict) -> tuple[dict, dict]:
+    prefix = options["prefix"]
+    local_files = _list_local(options["directory"], options["manifest_path"])
+    remote_objects = _list_remote(options["bucket"], prefix, options["region_name"], options["session"])
+    entries = load_manifest(options["manifest_path"])["targets"].get(_target(options), {})
+
+    plan = {"transfer": [], "delete": [], "unchanged": 0, "rejected": []}
+
+    sources, destinations = (local_files, remote_objects)
+    if options["direction"].name == SyncDirection.DOWNLOAD.name:
+        # Keys are untrusted, a key like prefix/../../file must not be written outside the directory
+        for relative_path in sorted(remote_objects):
+            if _resolve_local_path(options, relative_path) is None:
+                plan["rejected"].append({"path": relative_path, "key": prefix + relative_path})
+                del remote_objects[relative_path]
+
+        sources, destinations = (remote_objects, local_files)
+
+    def compare(relative_path: str) -> tuple[str, str | None, dict | None]:
+        if relative_path not in destinations:
+            return relative_path, "missing", None
+
+        local_stat, remote = local_files[relative_path], remote_objects[relative_path]
+        reason, entry = _compare(
+            _local_path(options, relative_path),
+            local_stat,
+            remote,
+            entries.get(relative_path),
+            options["part_size"],
+        )
+        return relative_path, reason, entry
+
+    with ThreadPoolExecutor(max_workers=options["max_concurrency"]) as executor:
+        comparisons = list(executor.map(compare, sorted(sources)))
+
+    manifest_entries = {}
+
+    for relative_path, reason, entry in comparisons:
+        if reason is None:
+            plan["unchanged"] += 1
+            manifest_entries[relative_path] = entry
+            continue
+
+        if options["direction"].name == SyncDirection.UPLOAD.name:
+            size = local_files[relative_path].st_size
+        else:
+            size = remote_objects[relative_path]["Size"]
+
+        plan["transfer"].append({"path": relative_path, "key": prefix + relative_path, "size": size, "reason": reason})
+
+    if options["delete"]:
+        _plan_deletes(options, sorted(set(destinations) - set(sources)), plan)
+
+    return plan, manifest_entries
+
+
+def _plan_deletes(options: dict, relative_paths: list[str], plan: dict) -> None:
+    download = options["direction"].name == SyncDirection.DOWNLOAD.name
+
+    for relative_path in relative_paths:
+        item = {"path": relative_path, "key": options["prefix"] + relative_path}
+
+        if download and _resolve_local_path(options, relative_path) is None:
+            plan["rejected"].append(item)
+        else:
+            plan["delete"].append(item)
+
+
+def _validate(options: dict) -> None:
+    if options["part_size"] < MIN_PART_SIZE:
+        msg = f"Part size must be at least {MIN_PART_SIZE} bytes"
+        raise Exception(msg)
+
+    if options["direction"].name == SyncDirection.UPLOAD.name and not os.path.isdir(options["directory"]):
+        msg = f"Directory does not exist: {options['directory']}"
+        raise Exception(msg)
+
+
+def plan_sync(
+    directory: str,
+    bucket: str,
+    prefix: str = "",
+    direction: SyncDirection = SyncDirection.UPLOAD,
+    *,
+    delete: bool = False,
+    manifest_path: str | None = None,
+    part_size: int = 8 * MB,
+    max_concurrency: int = 8,
+    region_name: str | None = None,
+    session: Session = None,
+) -> dict:
+    """Compares a local directory with an s3 prefix without changing either, see sync.
+
+    Returns:
+        dict: The files to transfer (path, key, size and reason: missing, size or etag), the files or objects
+            to delete (path, key), the number of unchanged files and the objects rejected because their local
+            path resolves outside the directory (path, key)
+    """
+    options = {
+        "directory": directory,
+        "bucket": bucket,
+        "prefix": _normalize_prefix(prefix),
+        "direction": direction,
+        "delete": delete,
+        "manifest_path": manifest_path or os.path.join(directory, MANIFEST_FILE_NAME),
+        "part_size": part_size,
+        "max_concurrency": max_concurrency,
+        "region_name": region_name,
+        "session": session,
+    }
+    _validate(options)
+
+    plan, _ = _plan(options)
+    return plan
+
+
+def _transfer(s3_client, transfer: dict, options: dict) -> dict:
+    bucket, key = options["bucket"], transfer["key"]
+    transfer_options = {
+        "part_size": options["part_size"],
+        "max_concurrency": options["part_concurrency"],
+        "max_attempts": 3,
+        "threshold": options["part_size"],
+        "extra_args": None,
+        "progress_callback": None,
+    }
+
+    if options["direction"].name == SyncDirection.UPLOAD.name:
+        path = _local_path(options, transfer["path"])
+        stat = os.stat(path)
+        response, _ = s3._upload(s3_client, bucket, key, path, transfer_options)
+        return _manifest_entry(stat, response["ETag"])
+
+    path = _writable_local_path(options, transfer["path"])
+    parent = os.path.dirname(path)
+    os.makedirs(parent, exist_ok=True)
+
+    file_descriptor, temporary_path = tempfile.mkstemp(dir=parent, prefix=f".{os.path.basename(path)}.")
+    os.close(file_descriptor)
+    try:
+        # The ETag every part was requested with, so the manifest describes the bytes written
+        _, etag = s3._download_object_parallel(s3_client, bucket, key, temporary_path, transfer_options)
+        os.replace(temporary_path, path)
+    except BaseException:
+        os.remove(temporary_path)
+        raise
+
+    return _manifest_entry(os.stat(path), etag)
+
+
+def _delete(deletes: list[dict], options: dict) -> tuple[int, list[dict]]:
+    if options["direction"].name == SyncDirection.UPLOAD.name:
+        response = s3.delete_objects_bulk(
+            options["bucket"],
+            [item["key"] for item in deletes],
+            region_name=options["region_name"],
+            session=options["session"],
+        )
+        return response["deleted"], response["errors"]
+
+    deleted, errors = 0, []
+    for item in deletes:
+        try:
+            os.remove(_writable_local_path(options, item["path"]))
+            deleted += 1
+        except Exception as e:
+            errors.append({"path": item["path"], "key": item["key"], "error": str(e)})
+
+    return deleted, errors
+
+
+def sync(
+    directory: str,
+    bucket: str,
+    prefix: str = "",
+    direction: SyncDirection = SyncDirection.UPLOAD,
+    *,
+    delete: bool = False,
+    dry_run: bool = False,
+    manifest_path: str | None = None,
+    part_size: int = 8 * MB,
+    max_concurrency: int = 8,
+    part_concurrency: int = 4,
+    region_name: str | None = None,
+    session: Session = None,
+) -> dict:
+    """Syncs a local directory with an s3 prefix in either direction. Files are compared by size and then by ETag,
+    computed locally with the part size of multipart objects, and only changed or missing files are transferred
+    on a thread pool. A manifest of the size, mtime and ETag of each file in sync is kept so unchanged files are
+    not hashed again on the next sync. When downloading, keys whose local path resolves outside the directory
+    (e.g. with .. segments or through a symlink) are rejected instead of written.
+
+    Args:
+        directory (str): The local directory
+        bucket (str): The s3 bucket
+        prefix (str, optional): The key prefix, a "/" is appended when missing. Defaults to "".
+        direction (SyncDirection, optional): UPLOAD mirrors the directory to the prefix, DOWNLOAD the prefix to
+            the directory. Defaults to SyncDirection.UPLOAD.
+        delete (bool, optional): Delete destination files or objects that don't exist in the source.
+            Defaults to False.
+        dry_run (bool, optional): Only plan the sync, nothing is transferred, deleted or saved. Defaults to False.
+        manifest_path (str | None, optional): Where the manifest is kept, `.boto_buddy_sync.json` in the directory
+            when None. The manifest is never synced. Defaults to None.
+        part_size (int, optional): Bytes per part and multipart threshold of transfers. Defaults to 8 MiB.
+        max_concurrency (int, optional): Number of files hashed or transferred at the same time. Defaults to 8.
+        part_concurrency (int, optional): Parts transferred at the same time for each file. Defaults to 4.
+
+    Returns:
+        dict: The plan (see plan_sync), results with the success, size or error of each transfer, the number of
+            deleted files or objects, the delete errors (Key, VersionId, Code, Message of objects or path, key,
+            error of files), the bytes transferred, elapsed seconds and throughput in bytes per second
+    """
+    options = {
+        "directory": directory,
+        "bucket": bucket,
+        "prefix": _normalize_prefix(prefix),
+        "direction": direction,
+        "delete": delete,
+        "manifest_path": manifest_path or os.path.join(directory, MANIFEST_FILE_NAME),
+        "part_size": part_size,
+        "max_concurrency": max_concurrency,
+        "part_concurrency": part_concurrency,
+        "region_name": region_name,
+        "session": session,
+    }
+    _validate(options)
+    started = time.monotonic()
+
+    plan, manifest_entries = _plan(options)
+    if dry_run:
+        return {
+            "plan": plan,
+            "results": [],
+            "deleted": 0,
+            "delete_errors": [],
+            "bytes": 0,
+            "seconds": 0.0,
+            "bytes_per_second": 0.0,
+        }
+
+    # Each file transfers up to part_concurrency parts, the connection pool is sized for all of them
+    s3_client = s3._get_transfer_client(max_concurrency * part_concurrency, region_name, session)
+
+    def transfer_with_result(transfer: dict) -> dict:
+        result = {"path": transfer["path"], "key": transfer["key"]}
+        try:
+            manifest_entries[transfer["path"]] = _transfer(s3_client, transfer, options)
+            result["size"] = transfer["size"]
+            result["success"] = True
+        except Exception as e:
+            result["success"] = False
+            result["error"] = str(e)
+
+        return result
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            results = list(executor.map(transfer_with_result, plan["transfer"]))
+
+        deleted, delete_errors = _delete(plan["delete"], options) if plan["delete"] else (0, [])
+    finally:
+        manifest = load_manifest(options["manifest_path"])
+        manifest["targets"][_target(options)] = manifest_entries
+        _save_manifest(options["manifest_path"], manifest)
+
+    seconds = time.monotonic() - started
+    transferred_bytes = sum(result.get("size", 0) for result in results)
+
+    return {
+        "plan": plan,
+        "results": results,
+        "deleted": deleted,
+        "delete_errors": delete_errors,
+        "bytes": transferred_bytes,
+        "seconds": seconds,
+        "bytes_per_second": transferred_bytes / seconds if seconds > 0 else 0.0,
+    }
@@ -1,11 +1,18 @@
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
 
 from boto3 import Session
 from botocore.client import Config
+from botocore.exceptions import BotoCoreError, ClientError
 
 from skymantle_boto_buddy import EnableCache, get_boto3_client
 
+MAX_GET_PARAMETERS = 10
+_THROTTLING_ERRORS = {"ThrottlingException", "Throttling", "TooManyRequestsException", "RequestLimitExceeded"}
+
 
 def get_ssm_client(
     region_name: str | None = None,
@@ -37,3 +44,420 @@ def get_parameter_decrypted(key: str, *, region_name: str | None = None, session
     value = response.get("Parameter", {}).get("Value")
 
     return value
+
+
+def get_parameters(
+    names: list[str],
+    *,
+    decrypt: bool = False,
+    max_concurrency: int = 4,
+    region_name: str | None = None,
+    session: Session = None,
+) -> dict[str, str]:
+    """Gets many parameters with get_parameters calls of 10 names that run concurrently.
+
+    Args:
+        names (list[str]): The parameter names
+        decrypt (bool, optional): Decrypt SecureString values. Defaults to False.
+        max_concurrency (int, optional): Number of get_parameters calls running at the same time. Defaults to 4.
+
+    Returns:
+        dict[str, str]: The value of each parameter by name, names that don't exist are left out
+    """
+    client = get_ssm_client(region_name, session)
+    names = list(dict.fromkeys(names))
+    chunks = [names[start : start + MAX_GET_PARAMETERS] for start in range(0, len(names), MAX_GET_PARAMETERS)]
+
+    def get_chunk(chunk: list[str]) -> list[dict]:
+        return client.get_parameters(Names=chunk, WithDecryption=decrypt).get("Parameters", [])
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        responses = list(executor.map(get_chunk, chunks))
+
+    values = {parameter["Name"]: parameter["Value"] for response in responses for parameter in response}
+
+    return {name: values[name] for name in names if name in values}
+
+
+def _nest_parameters(path: str, values: dict[str, str]) -> dict[str, Any]:
+    nested: dict[str, Any] = {}
+
+    for name, value in values.items():
+        *parents, leaf = [part for part in name[len(path) :].split("/") if part]
+
+        node = nested
+        for part in parents:
+            node = node.setdefault(part, {})
+            if not isinstance(node, dict):
+                msg = f"Parameter conflicts with a nested path: {name}"
+                raise Exception(msg)
+
+        if isinstance(node.get(leaf), dict):
+            msg = f"Parameter conflicts with a nested path: {name}"
+            raise Exception(msg)
+
+        node[leaf] = value
+
+    return nested
+
+
+def get_parameters_by_path(
+    path: str,
+    *,
+    recursive: bool = True,
+    decrypt: bool = False,
+    nested: bool = False,
+    region_name: str | None = None,
+    session: Session = None,
+) -> dict[str, Any]:
+    """Gets every parameter under a path, following NextToken until all pages are read.
+
+    Args:
+        path (str): The parameter hierarchy, e.g. /my-service/prod
+        recursive (bool, optional): Include parameters in nested paths. Defaults to True.
+        decrypt (bool, optional): Decrypt SecureString values. Defaults to False.
+        nested (bool, optional): Return nested dicts keyed by the path components below `path` instead of
+            full names, /my-service/prod/db/host becomes {"db": {"host": ...}}. Defaults to False.
+
+    Returns:
+        dict[str, Any]: The value of each parameter by name, or nested by path component
+    """
+    client = get_ssm_client(region_name, session)
+    paginator = client.get_paginator("get_parameters_by_path")
+
+    values = {}
+    for page in paginator.paginate(Path=path, Recursive=recursive, WithDecryption=decrypt):
+        for parameter in page.get("Parameters", []):
+            values[parameter["Name"]] = parameter["Value"]
+
+    return _nest_parameters(path, values) if nested else values
+
+
+def _is_transient_error(error: Exception) -> bool:
+    if isinstance(error, ClientError):
+        return error.response.get("Error", {}).get("Code") in _THROTTLING_ERRORS
+
+    return isinstance(error, BotoCoreError)
+
+
+class ParameterCache:
+    """An in-process cache of parameter values with a TTL per parameter, similar to the Parameters and Secrets
+    Lambda extension. A value read in the last `refresh_ahead` seconds before it expires is refreshed in the
+    background while the cached value is served. An expired value is refreshed by the reader, other readers get
+    the stale value meanwhile, and when SSM throttles or can't be reached the stale value is served for up to
+    `max_stale` seconds after it expired. Decrypted values are cached separately from encrypted ones.
+
+    Args:
+        ttl (float, optional): Default seconds a value is fresh. Defaults to 300.
+        refresh_ahead (float, optional): Seconds before expiry a read starts a background refresh, at most half
+            the TTL. Defaults to 30.
+        max_stale (float | None, optional): Seconds after expiry a value is served when SSM throttles or fails,
+            None serves it indefinitely. Defaults to 3600.
+        max_concurrency (int, optional): Number of background refreshes running at the same time. Defaults to 4.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 300.0,
+        refresh_ahead: float = 30.0,
+        max_stale: float | None = 3600.0,
+        *,
+        max_concurrency: int = 4,
+        region_name: str | None = None,
+        session: Session = None,
+    ) -> None:
+        self.ttl = ttl
+        self.refresh_ahead = refresh_ahead
+        self.max_stale = max_stale
+        self.max_concurrency = max_concurrency
+        self._region_name = region_name
+        self._session = session
+        self._entries: dict[tuple[str, bool], dict] = {}
+        self._refreshing: set[tuple[str, bool]] = set()
+        self._lock = threading.Lock()
+        self._executor: ThreadPoolExecutor | None = None
+
+        self.stats = {"hits": 0, "misses": 0, "refreshes": 0, "stale_hits": 0, "errors": 0}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _store(self, key: tuple[str, bool], value: str, ttl: float) -> None:
+        """Stores a value, the lock must be held"""
+        now = time.monotonic()
+        self._entries[key] = {
+            "value": value,
+            "ttl": ttl,
+            "expires": now + ttl,
+            "refresh_at": now + ttl - min(self.refresh_ahead, ttl / 2),
+        }
+        self._refreshing.discard(key)
+
+    def set(self, name: str, value: str, *, decrypt: bool = False, ttl: float | None = None) -> None:
+        """Caches a value read elsewhere, e.g. with get_parameters_by_path."""
+        with self._lock:
+            self._store((name, decrypt), value, self.ttl if ttl is None else ttl)
+
+    def invalidate(self, name: str | None = None, *, decrypt: bool | None = None) -> None:
+        """Removes a parameter from the cache, every parameter when the name is None. Both the decrypted and
+        encrypted values are removed unless decrypt is given."""
+        with self._lock:
+            for key in list(self._entries):
+                if (name is None or key[0] == name) and (decrypt is None or key[1] == decrypt):
+                    del self._entries[key]
+
+    def _serve_stale(self, entry: dict | None, now: float, error: Exception) -> bool:
+        if entry is None or not _is_transient_error(error):
+            return False
+
+        return self.max_stale is None or now < entry["expires"] + self.max_stale
+
+    def _lookup(self, key: tuple[str, bool], now: float) -> tuple[dict | None, bool]:
+        """Returns the entry and whether it can be served without a fetch, the lock must be held"""
+        entry = self._entries.get(key)
+
+        if entry and now < entry["expires"]:
+            self.stats["hits"] += 1
+            if now >= entry["refresh_at"]:
+                self._schedule_refresh(key)
+            return entry, True
+
+        if entry and key in self._refreshing:
+            self.stats["stale_hits"] += 1
+            return entry, True
+
+        if entry is None:
+            self.stats["misses"] += 1
+
+        self._refreshing.add(key)
+        return entry, False
+
+    def _schedule_refresh(self, key: tuple[str, bool]) -> None:
+        """Refreshes a value in the background, the lock must be held"""
+        if key in self._refreshing:
+            return
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="ssm_cache")
+
+        self._refreshing.add(key)
+        self._executor.submit(self._refresh, key)
+
+    def _refresh(self, key: tuple[str, bool]) -> None:
+        try:
+            value = self._get_parameter(key)
+        except Exception:
+            with self._lock:
+                self._refreshing.discard(key)
+                self.stats["errors"] += 1
+            return
+
+        with self._lock:
+            entry = self._entries.get(key)
+            self._store(key, value, entry["ttl"] if entry else self.ttl)
+            self.stats["refreshes"] += 1
+
+    def _get_parameter(self, key: tuple[str, bool]) -> str:
+        client = get_ssm_client(self._region_name, self._session)
+        return client.get_parameter(Name=key[0], WithDecryption=key[1])["Parameter"]["Value"]
+
+    def get(self, name: str, *, decrypt: bool = False, ttl: float | None = None) -> str:
+        """Returns the value of a parameter from the cache, reading it from SSM when missing or expired.
+
+        Args:
+            name (str): The parameter name
+            decrypt (bool, optional): Decrypt SecureString values. Defaults to False.
+            ttl (float | None, optional): Seconds the value is fresh, applied when the value is read from SSM.
+                The TTL of the cache when None and not cached before. Defaults to None.
+
+        Returns:
+            str: The value
+        """
+        key = (name, decrypt)
+        now = time.monotonic()
+
+        with self._lock:
+            entry, cached = self._lookup(key, now)
+            if cached:
+                return entry["value"]
+
+        try:
+            value = self._get_parameter(key)
+        except Exception as e:
+            with self._lock:
+                self._refreshing.discard(key)
+                if self._serve_stale(entry, now, e):
+                    self.stats["stale_hits"] += 1
+                    return entry["value"]
+                self.stats["errors"] += 1
+            raise
+
+        with self._lock:
+            self._store(key, value, ttl or (entry["ttl"] if entry else self.ttl))
+            if entry:
+                self.stats["refreshes"] += 1
+
+        return value
+
+    def get_many(self, names: list[str], *, decrypt: bool = False, ttl: float | None = None) -> dict[str, str]:
+        """Returns the values of many parameters, see get. Missing and expired values are read with batched
+        get_parameters calls, names that don't exist are left out.
+        """
+        now = time.monotonic()
+        values = {}
+        fetches = {}
+
+        with self._lock:
+            for name in dict.fromkeys(names):
+                entry, cached = self._lookup((name, decrypt), now)
+                if cached:
+                    values[name] = entry["value"]
+                else:
+                    fetches[name] = entry
+
+        if fetches:
+            try:
+                response = get_parameters(
+                    list(fetches), decrypt=decrypt, region_name=self._region_name, session=self._session
+                )
+            except Exception as e:
+                with self._lock:
+                    self._refreshing.difference_update((name, decrypt) for name in fetches)
+
+                    if not all(self._serve_stale(entry, now, e) for entry in fetches.values()):
+                        self.stats["errors"] += 1
+                        raise
+
+                    self.stats["stale_hits"] += len(fetches)
+                    values.update((name, entry["value"]) for name, entry in fetches.items())
+            else:
+                with self._lock:
+                    self._refreshing.difference_update((name, decrypt) for name in fetches)
+
+                    for name, value in response.items():
+                        entry = fetches[name]
+                        self._store((name, decrypt), value, ttl or (entry["ttl"] if entry else self.ttl))
+                        values[name] = value
+
+                        if entry:
+                            self.stats["refreshes"] += 1
+
+        return {name: values[name] for name in names if name in values}
+
+    def close(self) -> None:
+        """Stops the background refreshes."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+
+_parameter_caches: dict[tuple, ParameterCache] = {}
+_parameter_caches_lock = threading.Lock()
+
+
+def get_parameter_cache(*, region_name: str | None = None, session: Session = None) -> ParameterCache:
+    """Returns the module cache for a region and session, the TTL defaults to the BOTO_BUDDY_SSM_CACHE_TTL
+    environment variable or 300 seconds."""
+    with _parameter_caches_lock:
+        cache = _parameter_caches.get((region_name, session))
+
+        if cache is None:
+            ttl = float(os.environ.get("BOTO_BUDDY_SSM_CACHE_TTL", "300"))
+            cache = ParameterCache(ttl, region_name=region_name, session=session)
+            _parameter_caches[(region_name, session)] = cache
+
+    return cache
+
+
+def get_parameter_cached(
+    key: str,
+    *,
+    decrypt: bool = False,
+    ttl: float | None = None,
+    region_name: str | None = None,
+    session: Session = None,
+) -> str:
+    """Gets a parameter through the module cache, see ParameterCache.get."""
+    cache = get_parameter_cache(region_name=region_name, session=session)
+    return cache.get(key, decrypt=decrypt, ttl=ttl)
+
+
+_prefetch_entries: dict[tuple[str, bool], None] = {}
+
+
+def register_prefetch(*entries: str, decrypt: bool = False) -> None:
+    """Declares parameters loaded by prefetch_parameters, names ending with a "/" are paths loaded recursively."""
+    for entry in entries:
+        _prefetch_entries[(entry, decrypt)] = None
+
+
+def _environment_prefetch_entries() -> list[tuple[str, bool]]:
+    entries = [entry.strip() for entry in os.environ.get("BOTO_BUDDY_SSM_PREFETCH", "").split(",") if entry.strip()]
+    decrypt = os.environ.get("BOTO_BUDDY_SSM_PREFETCH_DECRYPT", "false") in ["1", "true", "yes", "on"]
+
+    return [(entry, decrypt) for entry in entries]
+
+
+def prefetch_parameters(
+    entries: list[str] | None = None,
+    *,
+    decrypt: bool = False,
+    region_name: str | None = None,
+    session: Session = None,
+) -> dict[str, str]:
+    """Loads parameters into the module cache (see get_parameter_cached) with batched get_parameters calls and
+    paths with get_parameters_by_path, all running concurrently. Meant for the init phase of a lambda function,
+    a missing parameter or an empty path raises instead of failing the first request.
+
+    Args:
+        entries (list[str] | None, optional): Names and paths ending with a "/", the registered entries and
+            those in the BOTO_BUDDY_SSM_PREFETCH environment variable when None. Defaults to None.
+        decrypt (bool, optional): Decrypt SecureString values of the given entries. Defaults to False.
+
+    Returns:
+        dict[str, str]: The value of each parameter by name
+    """
+    if entries is None:
+        requested = list(dict.fromkeys([*_prefetch_entries, *_environment_prefetch_entries()]))
+    else:
+        requested = [(entry, decrypt) for entry in entries]
+
+    cache = get_parameter_cache(region_name=region_name, session=session)
+
+    def load_names(names: list[str], *, decrypt: bool) -> dict[str, str]:
+        values = cache.get_many(names, decrypt=decrypt)
+
+        if missing := [name for name in names if name not in values]:
+            msg = f"Parameters not found: {', '.join(missing)}"
+            raise Exception(msg)
+
+        return values
+
+    def load_path(path: str, *, decrypt: bool) -> dict[str, str]:
+        values = get_parameters_by_path(path, decrypt=decrypt, region_name=region_name, session=session)
+
+        if not values:
+            msg = f"No parameters found under path: {path}"
+            raise Exception(msg)
+
+        for name, value in values.items():
+            cache.set(name, value, decrypt=decrypt)
+
+        return values
+
+    tasks = [(load_path, entry, entry_decrypt) for entry, entry_decrypt in requested if entry.endswith("/")]
+    for names_decrypt in (False, True):
+        names = [entry for entry, entry_decrypt in requested if entry_decrypt == names_decrypt]
+        if names := [name for name in names if not name.endswith("/")]:
+            tasks.append((load_names, names, names_decrypt))
+
+    with ThreadPoolExecutor(max_workers=max(len(tasks), 1)) as executor:
+        futures = [executor.submit(function, entry, decrypt=decrypt) for function, entry, decrypt in tasks]
+        results = [future.result() for future in futures]
+
+    return {name: value for result in results for name, value in result.items()}
+
+
+# When imported in a lambda function will load the declared parameters during initialization
+if os.environ.get("AWS_LAMBDA_FUNCTION_NAME") is not None and os.environ.get("BOTO_BUDDY_SSM_PREFETCH"):
+    prefetch_parameters()
@@ -106,3 +106,312 @@ def test_get_stack_outputs():
     outputs = cloudformation.get_stack_outputs("some_stack")
 
     assert "some_stack-s3bucket-" in outputs["S3Bucket"]
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_get_stack_outputs_cache(mocker: MockerFixture):
+    reload(cloudformation)
+
+    cfn_client = boto3.client("cloudformation", region_name="ca-central-1")
+    cfn_client.create_stack(StackName="some_stack", TemplateBody=json.dumps(cfn_template))
+
+    monotonic = mocker.patch("skymantle_boto_buddy.cloudformation.time.monotonic", return_value=1000.0)
+    describe_stacks = mocker.spy(cloudformation.get_cloudformation_client(), "describe_stacks")
+
+    outputs = cloudformation.get_stack_outputs("some_stack", ttl=60)
+    outputs["S3Bucket"] = "changed"
+
+    assert cloudformation.get_stack_outputs("some_stack", ttl=60) != outputs
+    assert describe_stacks.call_count == 1
+
+    assert cloudformation.get_stack_outputs("some_stack") != outputs
+    assert describe_stacks.call_count == 2
+
+    monotonic.return_value = 1060.0
+    cloudformation.get_stack_outputs("some_stack", ttl=60)
+    assert describe_stacks.call_count == 3
+
+    cloudformation.clear_stack_outputs_cache()
+    cloudformation.get_stack_outputs("some_stack", ttl=60)
+    assert describe_stacks.call_count == 4
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_get_outputs_for_stacks(mocker: MockerFixture):
+    reload(cloudformation)
+
+    cfn_client = boto3.client("cloudformation", region_name="ca-central-1")
+    for count in range(5):
+        cfn_client.create_stack(StackName=f"some_stack_{count}", TemplateBody=json.dumps(cfn_template))
+    cfn_client.create_stack(StackName="no_outputs", TemplateBody=json.dumps({**cfn_template, "Outputs": {}}))
+
+    describe_stacks = mocker.spy(cloudformation.get_cloudformation_client(), "describe_stacks")
+    stack_names = [f"some_stack_{count}" for count in range(5)] + ["no_outputs"]
+
+    outputs = cloudformation.get_outputs_for_stacks(stack_names, ttl=300)
+
+    assert list(outputs) == stack_names
+    assert all(f"some_stack_{count}-s3bucket-" in outputs[f"some_stack_{count}"]["S3Bucket"] for count in range(5))
+    assert outputs["no_outputs"] == {}
+    assert describe_stacks.call_count == 6
+
+    assert cloudformation.get_outputs_for_stacks(stack_names, ttl=300) == outputs
+    assert describe_stacks.call_count == 6
+
+    with pytest.raises(Exception) as e:
+        cloudformation.get_outputs_for_stacks(["some_stack_0", "missing_stack"])
+
+    assert str(e.value) == "Cannot find stack missing_stack in ca-central-1"
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_get_outputs_for_stacks_all_stacks(mocker: MockerFixture):
+    reload(cloudformation)
+
+    cfn_client = boto3.client("cloudformation", region_name="ca-central-1")
+    for count in range(5):
+        cfn_client.create_stack(StackName=f"some_stack_{count}", TemplateBody=json.dumps(cfn_template))
+
+    describe_stacks = mocker.spy(cloudformation.get_cloudformation_client(), "describe_stacks")
+
+    outputs = cloudformation.get_outputs_for_stacks(["some_stack_3", "some_stack_1"], all_stacks=True)
+
+    assert list(outputs) == ["some_stack_3", "some_stack_1"]
+    assert "some_stack_3-s3bucket-" in outputs["some_stack_3"]["S3Bucket"]
+    assert describe_stacks.call_count == 1
+    assert "StackName" not in describe_stacks.call_args.kwargs
+
+    assert cloudformation.get_stack_outputs("some_stack_4", ttl=300) == cloudformation.get_stack_outputs("some_stack_4")
+    assert describe_stacks.call_count == 2
+
+    with pytest.raises(Exception) as e:
+        cloudformation.get_outputs_for_stacks(["missing_stack"], all_stacks=True)
+
+    assert str(e.value) == "Cannot find stack missing_stack in ca-central-1"
+
+
+def export_template(exports: dict[str, str]) -> str:
+    return json.dumps(
+        {
+            **cfn_template,
+            "Outputs": {
+                f"Output{count}": {"Value": value, "Export": {"Name": name}}
+                for count, (name, value) in enumerate(exports.items())
+            },
+        }
+    )
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_exports(mocker: MockerFixture):
+    reload(cloudformation)
+
+    cfn_client = boto3.client("cloudformation", region_name="ca-central-1")
+    cfn_client.create_stack(
+        StackName="network", TemplateBody=export_template({"network-vpc-id": "vpc-1", "network-subnet-a": "subnet-a"})
+    )
+    cfn_client.create_stack(
+        StackName="data", TemplateBody=export_template({"data-table-name": "table", "network2-id": "other"})
+    )
+
+    monotonic = mocker.patch("skymantle_boto_buddy.cloudformation.time.monotonic", return_value=1000.0)
+    list_exports = mocker.spy(cloudformation.get_cloudformation_client(), "list_exports")
+
+    assert cloudformation.get_exports() == {
+        "network-vpc-id": "vpc-1",
+        "network-subnet-a": "subnet-a",
+        "data-table-name": "table",
+        "network2-id": "other",
+    }
+    assert list_exports.call_count == 1
+
+    assert cloudformation.get_export_value("network-vpc-id", ttl=60) == "vpc-1"
+    assert cloudformation.get_export_values(["data-table-name", "network-vpc-id"], ttl=60) == {
+        "data-table-name": "table",
+        "network-vpc-id": "vpc-1",
+    }
+    assert cloudformation.get_exports_by_prefix("network-", ttl=60) == {
+        "network-subnet-a": "subnet-a",
+        "network-vpc-id": "vpc-1",
+    }
+    assert cloudformation.get_exports_by_prefix("missing", ttl=60) == {}
+    assert len(cloudformation.get_exports_by_prefix("", ttl=60)) == 4
+    assert list_exports.call_count == 1
+
+    monotonic.return_value = 1060.0
+    cloudformation.get_export_value("network-vpc-id", ttl=60)
+    assert list_exports.call_count == 2
+
+    cloudformation.clear_exports_cache()
+    cloudformation.get_export_value("network-vpc-id", ttl=60)
+    assert list_exports.call_count == 3
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_exports_missing():
+    reload(cloudformation)
+
+    cfn_client = boto3.client("cloudformation", region_name="ca-central-1")
+    cfn_client.create_stack(StackName="network", TemplateBody=export_template({"network-vpc-id": "vpc-1"}))
+
+    with pytest.raises(Exception) as e:
+        cloudformation.get_export_value("missing-export")
+
+    assert str(e.value) == "Cannot find export missing-export in ca-central-1"
+
+    with pytest.raises(Exception) as e:
+        cloudformation.get_export_values(["network-vpc-id", "missing-export", "other-export"])
+
+    assert str(e.value) == "Cannot find exports missing-export, other-export in ca-central-1"
+
+
+two_bucket_template = {
+    **cfn_template,
+    "Resources": {**cfn_template["Resources"], "OtherBucket": {"Type": "AWS::S3::Bucket"}},
+}
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_iter_stack_resources():
+    reload(cloudformation)
+
+    cfn_client = boto3.client("cloudformation", region_name="ca-central-1")
+    cfn_client.create_stack(StackName="some_stack", TemplateBody=json.dumps(two_bucket_template))
+
+    resources = list(cloudformation.iter_stack_resources("some_stack"))
+
+    assert sorted(resource["LogicalResourceId"] for resource in resources) == ["OtherBucket", "S3Bucket"]
+    assert all(resource["ResourceType"] == "AWS::S3::Bucket" for resource in resources)
+
+    with pytest.raises(Exception) as e:
+        list(cloudformation.iter_stack_resources("missing_stack"))
+
+    assert str(e.value) == "Cannot find stack missing_stack in ca-central-1"
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_iter_stack_events():
+    reload(cloudformation)
+
+    cfn_client = boto3.client("cloudformation", region_name="ca-central-1")
+    cfn_client.create_stack(StackName="some_stack", TemplateBody=json.dumps(cfn_template))
+
+    history = list(cloudformation.iter_stack_events("some_stack"))
+
+    assert [event["ResourceStatus"] for event in history] == ["CREATE_COMPLETE", "CREATE_IN_PROGRESS"]
+    assert list(cloudformation.iter_stack_events("some_stack", follow=True)) == []
+
+    cfn_client.update_stack(StackName="some_stack", TemplateBody=json.dumps(two_bucket_template))
+
+    events = list(cloudformation.iter_stack_events("some_stack", after_event_id=history[0]["EventId"]))
+    assert [event["ResourceStatus"] for event in events] == ["UPDATE_COMPLETE", "UPDATE_IN_PROGRESS"]
+
+    events = list(cloudformation.iter_stack_events("some_stack", follow=True, after_event_id=history[0]["EventId"]))
+    assert [event["ResourceStatus"] for event in events] == ["UPDATE_IN_PROGRESS", "UPDATE_COMPLETE"]
+
+    with pytest.raises(Exception) as e:
+        list(cloudformation.iter_stack_events("missing_stack", follow=True))
+
+    assert str(e.value) == "Cannot find stack missing_stack in ca-central-1"
+
+
+class RecordingEvent:
+    def __init__(self) -> None:
+        self.waits = []
+        self.clock = 1000.0
+
+    def wait(self, timeout: float) -> bool:
+        self.waits.append(timeout)
+        self.clock += timeout
+        return False
+
+
+def stack_event(event_id: str, status: str, logical_resource_id: str = "some_stack") -> dict:
+    return {
+        "EventId": event_id,
+        "StackId": "some_stack_id",
+        "LogicalResourceId": logical_resource_id,
+        "PhysicalResourceId": "some_stack_id" if logical_resource_id == "some_stack" else "some_resource",
+        "ResourceType": "AWS::CloudFormation::Stack" if logical_resource_id == "some_stack" else "AWS::S3::Bucket",
+        "ResourceStatus": status,
+    }
+
+
+def test_tail_stack_events_adaptive_polling(mocker: MockerFixture):
+    previous = stack_event("e0", "CREATE_COMPLETE")
+    started = stack_event("e1", "UPDATE_IN_PROGRESS")
+    resource = stack_event("e2", "UPDATE_COMPLETE", "S3Bucket")
+    completed = stack_event("e3", "UPDATE_COMPLETE")
+
+    iter_events = mocker.patch.object(
+        cloudformation,
+        "_iter_events",
+        side_effect=[
+            [started, previous],
+            [started, previous],
+            [started, previous],
+            [started, previous],
+            [completed, resource, started, previous],
+        ],
+    )
+    stopped = RecordingEvent()
+    polling = {"min_interval": 1.0, "max_interval": 4.0, "timeout": None, "stop_on_terminal": True}
+
+    events = list(cloudformation._tail_stack_events(None, "some_stack", None, polling, stopped))
+
+    assert events == [started, resource, completed]
+    assert stopped.waits == [1.0, 2.0, 4.0, 4.0]
+    assert [call.args[1] for call in iter_events.call_args_list] == ["some_stack"] + ["some_stack_id"] * 4
+
+
+def test_tail_stack_events_timeout(mocker: MockerFixture):
+    completed = stack_event("e1", "CREATE_COMPLETE")
+
+    mocker.patch.object(cloudformation, "_iter_events", return_value=[completed])
+    stopped = RecordingEvent()
+    mocker.patch("skymantle_boto_buddy.cloudformation.time.monotonic", side_effect=lambda: stopped.clock)
+    polling = {"min_interval": 1.0, "max_interval": 8.0, "timeout": 10.0, "stop_on_terminal": False}
+
+    assert list(cloudformation._tail_stack_events(None, "some_stack", None, polling, stopped)) == []
+    assert stopped.waits == [2.0, 4.0]
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_iter_events_for_stacks():
+    reload(cloudformation)
+
+    cfn_client = boto3.client("cloudformation", region_name="ca-central-1")
+    after_event_ids = {}
+    for stack_name in ["first_stack", "second_stack", "idle_stack"]:
+        cfn_client.create_stack(StackName=stack_name, TemplateBody=json.dumps(cfn_template))
+        after_event_ids[stack_name] = next(cloudformation.iter_stack_events(stack_name))["EventId"]
+
+    cfn_client.update_stack(StackName="first_stack", TemplateBody=json.dumps(two_bucket_template))
+    cfn_client.update_stack(StackName="second_stack", TemplateBody=json.dumps(two_bucket_template))
+
+    events = list(
+        cloudformation.iter_events_for_stacks(
+            ["first_stack", "second_stack", "idle_stack"],
+            after_event_ids={"first_stack": after_event_ids["first_stack"]},
+        )
+    )
+
+    first_stack_events = [event["ResourceStatus"] for event in events if event["StackName"] == "first_stack"]
+    second_stack_events = [event["ResourceStatus"] for event in events if event["StackName"] == "second_stack"]
+
+    assert first_stack_events == ["UPDATE_IN_PROGRESS", "UPDATE_COMPLETE"]
+    assert second_stack_events == []
+    assert len(events) == 2
+
+    with pytest.raises(Exception) as e:
+        list(cloudformation.iter_events_for_stacks(["first_stack", "missing_stack"]))
+
+    assert str(e.value) == "Cannot find stack missing_stack in ca-central-1"
@@ -1,10 +1,12 @@
 import os
+import time
 from importlib import reload
 
 import boto3
 import pytest
 from boto3 import Session
-from boto3.dynamodb.conditions import Key
+from boto3.dynamodb.conditions import Attr, Key
+from botocore.exceptions import ClientError
 from moto import mock_aws
 from pytest_mock import MockerFixture
 
@@ -389,3 +391,297 @@ def test_query_no_paging_project_expressions():
     assert len(result) == 2
     assert result[0] == {"Field_Name": "some value 1"}
     assert result[1] == {"Field_Name": "some value 2"}
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_scan_parallel():
+    reload(dynamodb)
+
+    dynamodb_client = boto3.client("dynamodb")
+
+    dynamodb_client.create_table(
+        BillingMode="PAY_PER_REQUEST",
+        TableName="some_table",
+        AttributeDefinitions=[{"AttributeName": "PK", "AttributeType": "S"}],
+        KeySchema=[{"AttributeName": "PK", "KeyType": "HASH"}],
+    )
+    for count in range(10):
+        dynamodb_client.put_item(TableName="some_table", Item={"PK": {"S": f"some_pk_{count}"}})
+
+    items = dynamodb.scan_parallel("some_table", 3)
+
+    assert sorted(item["PK"] for item in items) == [f"some_pk_{count}" for count in range(10)]
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_table_snapshot():
+    reload(dynamodb)
+
+    dynamodb_client = boto3.client("dynamodb")
+
+    dynamodb_client.create_table(
+        BillingMode="PAY_PER_REQUEST",
+        TableName="some_table",
+        AttributeDefinitions=[
+            {"AttributeName": "PK", "AttributeType": "S"},
+            {"AttributeName": "SK", "AttributeType": "S"},
+        ],
+        KeySchema=[
+            {"AttributeName": "PK", "KeyType": "HASH"},
+            {"AttributeName": "SK", "KeyType": "RANGE"},
+        ],
+    )
+    dynamodb_client.put_item(
+        TableName="some_table", Item={"PK": {"S": "pk_1"}, "SK": {"S": "sk_2"}, "Name": {"S": "some value"}}
+    )
+    dynamodb_client.put_item(
+        TableName="some_table", Item={"PK": {"S": "pk_1"}, "SK": {"S": "sk_1"}, "Name": {"S": "some value"}}
+    )
+    dynamodb_client.put_item(
+        TableName="some_table", Item={"PK": {"S": "pk_2"}, "SK": {"S": "sk_1"}, "Name": {"S": "other value"}}
+    )
+
+    snapshot = dynamodb.TableSnapshot("some_table", ["Name"])
+
+    assert len(snapshot) == 3
+    assert snapshot.get_item({"PK": "pk_1", "SK": "sk_2"}) == {"PK": "pk_1", "SK": "sk_2", "Name": "some value"}
+    assert snapshot.get_item({"PK": "pk_3", "SK": "sk_1"}) == {}
+
+    result = snapshot.query("PK", "pk_1")
+    assert [item["SK"] for item in result] == ["sk_1", "sk_2"]
+
+    result = snapshot.query("Name", "other value")
+    assert result == [{"PK": "pk_2", "SK": "sk_1", "Name": "other value"}]
+
+    with pytest.raises(Exception) as e:
+        snapshot.query("Description", "some value")
+
+    assert str(e.value) == "Attribute is not indexed: Description"
+
+    dynamodb_client.put_item(TableName="some_table", Item={"PK": {"S": "pk_3"}, "SK": {"S": "sk_1"}})
+    snapshot.load()
+
+    assert snapshot.get_item({"PK": "pk_3", "SK": "sk_1"}) == {"PK": "pk_3", "SK": "sk_1"}
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_table_snapshot_background_refresh():
+    reload(dynamodb)
+
+    dynamodb_client = boto3.client("dynamodb")
+
+    dynamodb_client.create_table(
+        BillingMode="PAY_PER_REQUEST",
+        TableName="some_table",
+        AttributeDefinitions=[{"AttributeName": "PK", "AttributeType": "S"}],
+        KeySchema=[{"AttributeName": "PK", "KeyType": "HASH"}],
+    )
+
+    with dynamodb.TableSnapshot("some_table", refresh_interval=0.05) as snapshot:
+        assert snapshot.get_item({"PK": "some_pk"}) == {}
+
+        dynamodb_client.put_item(TableName="some_table", Item={"PK": {"S": "some_pk"}})
+
+        for _ in range(100):
+            if snapshot.get_item({"PK": "some_pk"}):
+                break
+            time.sleep(0.05)
+
+        assert snapshot.get_item({"PK": "some_pk"}) == {"PK": "some_pk"}
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_update_item_simplified_atomic_updates():
+    reload(dynamodb)
+
+    dynamodb_client = boto3.client("dynamodb")
+
+    dynamodb_client.create_table(
+        BillingMode="PAY_PER_REQUEST",
+        TableName="some_table",
+        AttributeDefinitions=[{"AttributeName": "PK", "AttributeType": "S"}],
+        KeySchema=[{"AttributeName": "PK", "KeyType": "HASH"}],
+    )
+    dynamodb_client.put_item(
+        TableName="some_table",
+        Item={"PK": {"S": "some_pk"}, "Count": {"N": "1"}, "Name": {"S": "some value"}, "Old": {"S": "old"}},
+    )
+
+    for _ in range(2):
+        dynamodb.update_item_simplified(
+            "some_table",
+            {"PK": "some_pk"},
+            {"Name": "some new value"},
+            add_map={"Count": 2},
+            remove=["Old"],
+            append_map={"Tags": ["tag"]},
+            if_not_exists_map={"Created": "first"},
+        )
+
+    item = dynamodb.get_item("some_table", {"PK": "some_pk"})
+
+    assert item == {"PK": "some_pk", "Count": 5, "Name": "some new value", "Tags": ["tag", "tag"], "Created": "first"}
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_update_item_simplified_condition_expression():
+    reload(dynamodb)
+
+    dynamodb_client = boto3.client("dynamodb")
+
+    dynamodb_client.create_table(
+        BillingMode="PAY_PER_REQUEST",
+        TableName="some_table",
+        AttributeDefinitions=[{"AttributeName": "PK", "AttributeType": "S"}],
+        KeySchema=[{"AttributeName": "PK", "KeyType": "HASH"}],
+    )
+    dynamodb_client.put_item(TableName="some_table", Item={"PK": {"S": "some_pk"}, "Version": {"N": "1"}})
+
+    response = dynamodb.update_item_simplified(
+        "some_table",
+        {"PK": "some_pk"},
+        {},
+        ReturnValues.UPDATED_NEW,
+        add_map={"Version": 1},
+        condition_expression=Attr("Version").eq(1),
+    )
+    assert response["Attributes"] == {"Version": 2}
+
+    with pytest.raises(Exception) as e:
+        dynamodb.update_item_simplified(
+            "some_table",
+            {"PK": "some_pk"},
+            {},
+            add_map={"Version": 1},
+            condition_expression=Attr("Version").eq(1),
+        )
+
+    assert "ConditionalCheckFailedException" in str(e.value)
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_update_item_simplified_no_updates():
+    reload(dynamodb)
+
+    with pytest.raises(Exception) as e:
+        dynamodb.update_item_simplified("some_table", {"PK": "some_pk"}, {})
+
+    assert str(e.value) == "At least one attribute must be updated"
+
+
+def test_update_expression_cache_is_bounded():
+    reload(dynamodb)
+
+    for count in range(dynamodb.UPDATE_EXPRESSION_CACHE_SIZE + 10):
+        dynamodb._build_update_expression((f"field_{count}",), (), (), (), ())
+
+    assert dynamodb._build_update_expression.cache_info().currsize == dynamodb.UPDATE_EXPRESSION_CACHE_SIZE
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_transact_write_items():
+    reload(dynamodb)
+
+    dynamodb_client = boto3.client("dynamodb")
+
+    dynamodb_client.create_table(
+        BillingMode="PAY_PER_REQUEST",
+        TableName="some_table",
+        AttributeDefinitions=[{"AttributeName": "PK", "AttributeType": "S"}],
+        KeySchema=[{"AttributeName": "PK", "KeyType": "HASH"}],
+    )
+    dynamodb_client.put_item(TableName="some_table", Item={"PK": {"S": "some_pk_1"}, "Count": {"N": "1"}})
+    dynamodb_client.put_item(TableName="some_table", Item={"PK": {"S": "some_pk_2"}})
+
+    operations = [dynamodb.transact_put("some_table", {"PK": f"new_pk_{count}"}) for count in range(150)]
+    operations.append(
+        dynamodb.transact_update(
+            "some_table",
+            {"PK": "some_pk_1"},
+            {"Name": "some value"},
+            add_map={"Count": 1},
+            condition_expression=Attr("Count").eq(1),
+        )
+    )
+    operations.append(dynamodb.transact_delete("some_table", {"PK": "some_pk_2"}))
+
+    dynamodb.transact_write_items(operations)
+
+    items = dynamodb.transact_get_items(
+        [dynamodb.transact_get("some_table", {"PK": f"new_pk_{count}"}) for count in range(150)]
+        + [
+            dynamodb.transact_get("some_table", {"PK": "some_pk_1"}),
+            dynamodb.transact_get("some_table", {"PK": "some_pk_2"}),
+        ],
+        transaction_size=25,
+    )
+
+    assert len(items) == 152
+    assert items[149] == {"PK": "new_pk_149"}
+    assert items[150] == {"PK": "some_pk_1", "Count": 2, "Name": "some value"}
+    assert items[151] == {}
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_transact_write_items_cancelled():
+    reload(dynamodb)
+
+    dynamodb_client = boto3.client("dynamodb")
+
+    dynamodb_client.create_table(
+        BillingMode="PAY_PER_REQUEST",
+        TableName="some_table",
+        AttributeDefinitions=[{"AttributeName": "PK", "AttributeType": "S"}],
+        KeySchema=[{"AttributeName": "PK", "KeyType": "HASH"}],
+    )
+    dynamodb_client.put_item(TableName="some_table", Item={"PK": {"S": "some_pk"}})
+
+    operations = [
+        dynamodb.transact_put("some_table", {"PK": "new_pk"}),
+        dynamodb.transact_condition_check("some_table", {"PK": "some_pk"}, Attr("PK").not_exists()),
+    ]
+
+    with pytest.raises(dynamodb.TransactionCancelledError) as e:
+        dynamodb.transact_write_items(operations)
+
+    assert [reason["Code"] for reason in e.value.reasons] == ["None", "ConditionalCheckFailed"]
+    assert e.value.operations == operations
+
+    response = dynamodb_client.get_item(TableName="some_table", Key={"PK": {"S": "new_pk"}})
+    assert response.get("Item") is None
+
+
+def test_transact_write_items_conflict_retry(mocker: MockerFixture):
+    mocker.patch("skymantle_boto_buddy.dynamodb.time.sleep")
+    mock_resource = mocker.patch("skymantle_boto_buddy.dynamodb.get_dynamodb_resource")
+
+    conflict = ClientError(
+        {
+            "Error": {"Code": "TransactionCanceledException", "Message": "Transaction cancelled"},
+            "CancellationReasons": [{"Code": "TransactionConflict"}],
+        },
+        "TransactWriteItems",
+    )
+    mock_client = mock_resource.return_value.meta.client
+    mock_client.transact_write_items.side_effect = [conflict, conflict, {}]
+
+    dynamodb.transact_write_items([dynamodb.transact_put("some_table", {"PK": "some_pk"})])
+
+    assert mock_client.transact_write_items.call_count == 3
+
+    mock_client.transact_write_items.reset_mock()
+    mock_client.transact_write_items.side_effect = conflict
+
+    with pytest.raises(dynamodb.TransactionCancelledError) as e:
+        dynamodb.transact_write_items([dynamodb.transact_put("some_table", {"PK": "some_pk"})], max_attempts=2)
+
+    assert mock_client.transact_write_items.call_count == 2
+    assert e.value.reasons == [{"Code": "TransactionConflict"}]
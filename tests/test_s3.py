@@ -1,10 +1,21 @@
+import bz2
+import csv
+import gzip
+import io
+import json
 import os
+import time
+import zipfile
+from datetime import UTC, datetime
 from importlib import reload
 from io import BytesIO
 
 import boto3
 import pytest
 from boto3 import Session
+from boto3.s3.transfer import TransferConfig
+from botocore.client import Config
+from botocore.exceptions import ClientError
 from moto import mock_aws
 from pytest_mock import MockerFixture
 
@@ -109,6 +120,313 @@ def test_put_object_signed_url():
     assert "X-Amz-Signature" in url
 
 
+@mock_aws
+@pytest.mark.usefixtures("environment")
+@pytest.mark.parametrize(
+    ("bucket", "method", "client_method"),
+    [("some_bucket", "GET", "get_object"), ("some_bucket", "PUT", "put_object"), ("somebucket", "GET", "get_object")],
+)
+@pytest.mark.parametrize(
+    "environment_variables",
+    [
+        {},
+        {"AWS_DEFAULT_REGION": "eu-west-1"},
+        {"AWS_ENDPOINT_URL_S3": "http://127.0.0.1:9000"},
+        {"AWS_ENDPOINT_URL_S3": "http://localhost:4566"},
+        {"AWS_DEFAULT_REGION": "us-west-2", "AWS_USE_DUALSTACK_ENDPOINT": "true"},
+        {"AWS_DEFAULT_REGION": "us-west-2", "AWS_USE_FIPS_ENDPOINT": "true"},
+    ],
+)
+def test_presign_many_matches_botocore(mocker: MockerFixture, bucket, method, client_method, environment_variables):
+    mocker.patch.dict(os.environ, environment_variables)
+    reload(s3)
+
+    now = datetime(2026, 1, 2, 3, 4, 5, tzinfo=UTC)
+    keys = ["some_key", "some dir/ünïcode+key~1.txt"]
+
+    mocker.patch("botocore.auth.get_current_datetime", return_value=now.replace(tzinfo=None))
+    mocker.patch("skymantle_boto_buddy.s3.datetime").now.return_value = now
+
+    urls = s3.presign_many(bucket, keys, method, 600)
+
+    s3_client = boto3.client("s3", config=Config(signature_version="s3v4"))
+    expected = {
+        key: s3_client.generate_presigned_url(
+            client_method, Params={"Bucket": bucket, "Key": key}, HttpMethod=method, ExpiresIn=600
+        )
+        for key in keys
+    }
+
+    assert urls == expected
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_presign_many_lower_case_method(mocker: MockerFixture):
+    reload(s3)
+
+    now = datetime(2026, 1, 2, 3, 4, 5, tzinfo=UTC)
+    mocker.patch("skymantle_boto_buddy.s3.datetime").now.return_value = now
+
+    assert s3.presign_many("some_bucket", ["some_key"], "put") == s3.presign_many("some_bucket", ["some_key"], "PUT")
+
+
+def test_presign_many_unsupported_method():
+    with pytest.raises(Exception) as e:
+        s3.presign_many("some_bucket", ["some_key"], "post")
+
+    assert str(e.value) == "Method is not supported: POST"
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_presign_many_session_token(monkeypatch: pytest.MonkeyPatch):
+    reload(s3)
+
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "akid")
+    monkeypatch.setenv("AWS_SESSION_TOKEN", "token")
+
+    urls = s3.presign_many("some_bucket", ["some_key"], session=boto3.Session())
+
+    assert "X-Amz-Security-Token=token" in urls["some_key"]
+    assert "X-Amz-Credential=akid%2F" in urls["some_key"]
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_presign_many_client_cache(mocker: MockerFixture):
+    reload(s3)
+
+    s3.presign_many("somebucket", ["some_key"])
+    s3_client = s3.get_s3_client(config=s3._S3V4_CONFIG)
+    generate_presigned_url = mocker.spy(s3_client, "generate_presigned_url")
+
+    s3.presign_many("somebucket", ["some_key", "another_key"])
+    s3.presign_many("somebucket", ["some_key", "another_key"])
+
+    assert generate_presigned_url.call_count == 2
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_presign_many_unsupported_signature(mocker: MockerFixture):
+    reload(s3)
+
+    def generate_sigv4a_url(client_method, **kwargs):
+        return f"https://example.com/{kwargs['Params']['Key']}?X-Amz-Algorithm=AWS4-ECDSA-P256-SHA256"
+
+    s3_client = s3.get_s3_client(config=s3._S3V4_CONFIG)
+    mocker.patch.object(s3_client, "generate_presigned_url", side_effect=generate_sigv4a_url)
+
+    urls = s3.presign_many("somebucket", ["some_key", "another_key"])
+
+    assert urls == {
+        "some_key": "https://example.com/some_key?X-Amz-Algorithm=AWS4-ECDSA-P256-SHA256",
+        "another_key": "https://example.com/another_key?X-Amz-Algorithm=AWS4-ECDSA-P256-SHA256",
+    }
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_get_object_range():
+    reload(s3)
+
+    s3_client = boto3.client("s3")
+    s3_client.create_bucket(Bucket="some_bucket")
+    s3_client.put_object(Bucket="some_bucket", Key="some_key", Body=b"0123456789")
+    s3_client.put_object(Bucket="some_bucket", Key="empty_key", Body=b"")
+
+    assert s3.get_object_range("some_bucket", "some_key", 0, 3) == b"0123"
+    assert s3.get_object_range("some_bucket", "some_key", 5) == b"56789"
+    assert s3.get_object_range("some_bucket", "some_key", 8, 100) == b"89"
+
+    assert s3.get_object_tail("some_bucket", "some_key", 3) == b"789"
+    assert s3.get_object_tail("some_bucket", "some_key", 100) == b"0123456789"
+    assert s3.get_object_tail("some_bucket", "some_key", 0) == b""
+    assert s3.get_object_tail("some_bucket", "empty_key", 3) == b""
+
+    with pytest.raises(ClientError):
+        s3.get_object_tail("some_bucket", "missing_key", 3)
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_s3_file():
+    reload(s3)
+
+    s3_client = boto3.client("s3")
+    s3_client.create_bucket(Bucket="some_bucket")
+
+    data = os.urandom(3 * s3.MB + 100)
+    s3_client.put_object(Bucket="some_bucket", Key="some_key", Body=data)
+
+    with s3.S3File("some_bucket", "some_key") as file:
+        assert file.readable()
+        assert file.seekable()
+        assert file.size == len(data)
+
+        assert file.read(10) == data[:10]
+        assert file.read(10) == data[10:20]
+        assert file.requests == 1
+
+        assert file.seek(-100, os.SEEK_END) == 3 * s3.MB
+        assert file.read() == data[-100:]
+        assert file.read(10) == b""
+        assert file.requests == 2
+
+        file.seek(s3.MB - 5)
+        assert file.read(10) == data[s3.MB - 5 : s3.MB + 5]
+        assert file.tell() == s3.MB + 5
+
+        file.seek(10, os.SEEK_SET)
+        file.seek(10, os.SEEK_CUR)
+        assert file.read(2 * s3.MB) == data[20 : 20 + 2 * s3.MB]
+
+        with pytest.raises(ValueError):
+            file.seek(-1)
+
+    with pytest.raises(ValueError):
+        file.read(10)
+
+    with s3.S3File("some_bucket", "some_key") as file:
+        assert file.read() == data
+        assert file.requests == 1
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_s3_file_libraries():
+    reload(s3)
+
+    s3_client = boto3.client("s3")
+    s3_client.create_bucket(Bucket="some_bucket")
+
+    archive = BytesIO()
+    with zipfile.ZipFile(archive, "w") as zip_file:
+        zip_file.writestr("first.txt", os.urandom(s3.MB).hex())
+        zip_file.writestr("second.txt", "Second File")
+    s3_client.put_object(Bucket="some_bucket", Key="archive.zip", Body=archive.getvalue())
+    s3_client.put_object(Bucket="some_bucket", Key="data.csv", Body=b"id,name\r\n1,a\r\n2,b\r\n")
+
+    with s3.S3File("some_bucket", "archive.zip", buffer_size=64 * 1024) as file, zipfile.ZipFile(file) as zip_file:
+        assert zip_file.namelist() == ["first.txt", "second.txt"]
+        assert zip_file.read("second.txt") == b"Second File"
+        assert file.requests < 5
+
+    with io.TextIOWrapper(io.BufferedReader(s3.S3File("some_bucket", "data.csv")), newline="") as stream:
+        assert list(csv.DictReader(stream)) == [{"id": "1", "name": "a"}, {"id": "2", "name": "b"}]
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_s3_file_changed():
+    reload(s3)
+
+    s3_client = boto3.client("s3")
+    s3_client.create_bucket(Bucket="some_bucket")
+    s3_client.put_object(Bucket="some_bucket", Key="some_key", Body=b"File Data")
+
+    with s3.S3File("some_bucket", "some_key") as file:
+        s3_client.put_object(Bucket="some_bucket", Key="some_key", Body=b"Changed Data")
+
+        with pytest.raises(Exception) as e:
+            file.read()
+
+    assert str(e.value) == "Object changed during read: some_bucket/some_key"
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_head_object():
+    reload(s3)
+
+    s3_client = boto3.client("s3")
+    s3_client.create_bucket(Bucket="some_bucket")
+    s3_client.put_object(
+        Bucket="some_bucket", Key="some_key", Body=b"File Data", ContentType="text/plain", Metadata={"a": "b"}
+    )
+
+    response = s3.head_object("some_bucket", "some_key")
+
+    assert response["ContentLength"] == 9
+    assert response["ContentType"] == "text/plain"
+    assert response["Metadata"] == {"a": "b"}
+    assert response["ETag"] == s3_client.head_object(Bucket="some_bucket", Key="some_key")["ETag"]
+    assert "LastModified" in response
+    assert "ResponseMetadata" not in response
+
+    assert s3.head_object("some_bucket", "missing_key") is None
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_head_objects(mocker: MockerFixture):
+    reload(s3)
+
+    s3_client = boto3.client("s3")
+    s3_client.create_bucket(Bucket="some_bucket")
+    for count in range(50):
+        s3_client.put_object(Bucket="some_bucket", Key=f"key_{count}", Body=b"x" * count)
+
+    keys = [f"key_{count}" for count in range(60)]
+    response = s3.head_objects("some_bucket", keys, max_concurrency=4)
+
+    assert list(response) == keys
+    assert [response[f"key_{count}"]["ContentLength"] for count in range(50)] == list(range(50))
+    assert all(response[f"key_{count}"] is None for count in range(50, 60))
+
+    head_object = mocker.spy(s3._get_transfer_client(16), "head_object")
+    s3.head_objects("some_bucket", keys)
+
+    assert head_object.call_count == 60
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_object_index(mocker: MockerFixture):
+    reload(s3)
+
+    s3_client = boto3.client("s3")
+    s3_client.create_bucket(Bucket="some_bucket")
+    for count in range(5):
+        s3_client.put_object(Bucket="some_bucket", Key=f"some_prefix/key_{count}", Body=b"x" * count)
+    s3_client.put_object(Bucket="some_bucket", Key="other_prefix/key_0", Body=b"x")
+
+    index = s3.S3ObjectIndex("some_bucket", "some_prefix/")
+    etag = s3_client.head_object(Bucket="some_bucket", Key="some_prefix/key_1")["ETag"]
+
+    assert len(index) == 5
+    assert list(index) == [f"some_prefix/key_{count}" for count in range(5)]
+    assert "some_prefix/key_1" in index
+    assert index.exists("some_prefix/key_4")
+    assert not index.exists("other_prefix/key_0")
+    assert index.size("some_prefix/key_3") == 3
+    assert index.size("some_prefix/missing") is None
+    assert index.get("some_prefix/key_1")["ETag"] == etag
+    assert index.get("some_prefix/missing") is None
+    assert not index.changed("some_prefix/key_1", etag)
+    assert index.changed("some_prefix/key_2", etag)
+    assert index.changed("some_prefix/missing", etag)
+
+    s3_client.put_object(Bucket="some_bucket", Key="some_prefix/key_5", Body=b"x")
+
+    assert not index.exists("some_prefix/key_5")
+
+    index.load()
+
+    assert index.exists("some_prefix/key_5")
+
+    monotonic = mocker.patch("skymantle_boto_buddy.s3.time.monotonic", return_value=1000.0)
+    index = s3.S3ObjectIndex("some_bucket", "some_prefix/", max_age=60)
+    s3_client.delete_object(Bucket="some_bucket", Key="some_prefix/key_5")
+
+    monotonic.return_value = 1059.0
+    assert index.exists("some_prefix/key_5")
+
+    monotonic.return_value = 1060.0
+    assert not index.exists("some_prefix/key_5")
+
+
 @mock_aws
 @pytest.mark.usefixtures("environment")
 def test_get_object():
@@ -348,6 +666,1021 @@ def test_execute_sql_query_simplified_invalid_input_type():
     query = "SELECT count(*) FROM S3Object"
 
     with pytest.raises(Exception) as e:
-        s3.execute_sql_query_simplified("some_bucket", "some_key", query, "json")
+        s3.execute_sql_query_simplified("some_bucket", "some_key", query, "xml")
+
+    assert str(e.value) == "Input type is not supported: xml"
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_get_object_csv_reader_multiline_values():
+    reload(s3)
+
+    s3_client = boto3.client("s3")
+    s3_client.create_bucket(Bucket="some_bucket")
+    s3_client.put_object(Bucket="some_bucket", Key="some_key", Body='col1,col2\n"line 1\nline 2",café\n'.encode())
+
+    data = list(s3.get_object_csv_reader("some_bucket", "some_key"))
+
+    assert data == [{"col1": "line 1\nline 2", "col2": "café"}]
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_get_object_csv_reader_gzip():
+    reload(s3)
+
+    body = gzip.compress(b"col1,col2\n" + b"".join(f"value{i},{i}\n".encode() for i in range(1000)))
+
+    s3_client = boto3.client("s3")
+    s3_client.create_bucket(Bucket="some_bucket")
+    s3_client.put_object(Bucket="some_bucket", Key="some_key.csv.gz", Body=body)
+    s3_client.put_object(Bucket="some_bucket", Key="some_key", Body=body, ContentEncoding="gzip")
+
+    data = list(s3.get_object_csv_reader("some_bucket", "some_key.csv.gz"))
+
+    assert len(data) == 1000
+    assert data[999] == {"col1": "value999", "col2": "999"}
+
+    data = list(s3.get_object_csv_reader("some_bucket", "some_key"))
+
+    assert len(data) == 1000
+
+    stream = s3.get_object_stream("some_bucket", "some_key.csv.gz", s3.Compression.NONE)
+
+    assert stream.read() == body
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_iter_object_ndjson():
+    reload(s3)
+
+    s3_client = boto3.client("s3")
+    s3_client.create_bucket(Bucket="some_bucket")
+    s3_client.put_object(Bucket="some_bucket", Key="some_key", Body=b'{"id": 1}\n\n{"id": 2, "name": "two"}\n')
+    s3_client.put_object(Bucket="some_bucket", Key="some_key.gz", Body=gzip.compress(b'{"id": 1}\n{"id": 2}'))
+
+    records = s3.iter_object_ndjson("some_bucket", "some_key")
+
+    assert next(records) == {"id": 1}
+    assert list(records) == [{"id": 2, "name": "two"}]
+
+    assert list(s3.iter_object_ndjson("some_bucket", "some_key.gz")) == [{"id": 1}, {"id": 2}]
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_iter_object_json_array():
+    reload(s3)
+
+    records = [12345678, "a, string]", {"nested": [1, 2, {"key": "value"}]}, None, True, -1.5e10, []]
+
+    s3_client = boto3.client("s3")
+    s3_client.create_bucket(Bucket="some_bucket")
+    s3_client.put_object(Bucket="some_bucket", Key="some_key", Body=json.dumps(records, indent=2).encode())
+    s3_client.put_object(Bucket="some_bucket", Key="empty_key", Body=b" [ ] ")
+
+    assert list(s3.iter_object_json_array("some_bucket", "some_key", chunk_size=3)) == records
+    assert list(s3.iter_object_json_array("some_bucket", "some_key")) == records
+    assert list(s3.iter_object_json_array("some_bucket", "empty_key")) == []
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_iter_object_json_array_invalid():
+    reload(s3)
+
+    s3_client = boto3.client("s3")
+    s3_client.create_bucket(Bucket="some_bucket")
+    s3_client.put_object(Bucket="some_bucket", Key="object_key", Body=b'{"key": "value"}')
+    s3_client.put_object(Bucket="some_bucket", Key="truncated_key", Body=b'[{"key": "value"}, {"key": ')
+
+    with pytest.raises(ValueError) as e:
+        list(s3.iter_object_json_array("some_bucket", "object_key"))
+
+    assert str(e.value) == "Object is not a JSON array"
+
+    records = s3.iter_object_json_array("some_bucket", "truncated_key", chunk_size=4)
+
+    assert next(records) == {"key": "value"}
+
+    with pytest.raises(json.JSONDecodeError):
+        next(records)
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_iter_object_json_array_zstd():
+    zstandard = pytest.importorskip("zstandard")
+    reload(s3)
+
+    body = zstandard.ZstdCompressor().compress(json.dumps([{"id": i} for i in range(100)]).encode())
+
+    s3_client = boto3.client("s3")
+    s3_client.create_bucket(Bucket="some_bucket")
+    s3_client.put_object(Bucket="some_bucket", Key="some_key.json.zst", Body=body)
+
+    records = list(s3.iter_object_json_array("some_bucket", "some_key.json.zst"))
+
+    assert records == [{"id": i} for i in range(100)]
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_download_object_parallel(tmp_path):
+    reload(s3)
+
+    body = os.urandom(1000)
+
+    s3_client = boto3.client("s3")
+    s3_client.create_bucket(Bucket="some_bucket")
+    s3_client.put_object(Bucket="some_bucket", Key="some_key", Body=body)
+    s3_client.put_object(Bucket="some_bucket", Key="empty_key", Body=b"")
+
+    assert s3.download_object_parallel("some_bucket", "some_key", part_size=64, max_concurrency=4) == body
+    assert s3.download_object_parallel("some_bucket", "empty_key") == b""
+
+    file_path = tmp_path / "some_file"
+    assert s3.download_object_parallel("some_bucket", "some_key", str(file_path), part_size=300) is None
+    assert file_path.read_bytes() == body
+
+    file_path = tmp_path / "empty_file"
+    s3.download_object_parallel("some_bucket", "empty_key", str(file_path))
+    assert file_path.read_bytes() == b""
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_transfer_client_pool_size(mocker: MockerFixture):
+    reload(s3)
+
+    s3_client = boto3.client("s3")
+    s3_client.create_bucket(Bucket="some_bucket")
+    s3_client.put_object(Bucket="some_bucket", Key="some_key", Body=b"File Data")
+
+    assert s3._get_transfer_client(10) is s3.get_s3_client()
+
+    transfer_client = s3._get_transfer_client(32)
+    assert transfer_client is not s3.get_s3_client()
+    assert transfer_client is s3._get_transfer_client(32)
+    assert transfer_client.meta.config.max_pool_connections == 32
+
+    get_object = mocker.spy(transfer_client, "get_object")
+
+    assert s3.download_object_parallel("some_bucket", "some_key", part_size=2, max_concurrency=32) == b"File Data"
+    assert get_object.call_count == 5
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_download_object_parallel_retry(mocker: MockerFixture):
+    reload(s3)
+    sleep = mocker.patch("skymantle_boto_buddy.s3.time.sleep")
+
+    s3_client = boto3.client("s3")
+    s3_client.create_bucket(Bucket="some_bucket")
+    s3_client.put_object(Bucket="some_bucket", Key="some_key", Body=b"File Data")
+
+    client = s3.get_s3_client()
+    get_object = client.get_object
+    error = ClientError({"Error": {"Code": "InternalError", "Message": "Internal Error"}}, "GetObject")
+    mock_get_object = mocker.patch.object(
+        client, "get_object", side_effect=[error, get_object(Bucket="some_bucket", Key="some_key", Range="bytes=0-8")]
+    )
+
+    data = s3.download_object_parallel("some_bucket", "some_key")
+
+    assert data == b"File Data"
+    assert mock_get_object.call_count == 2
+    sleep.assert_called_once_with(0.1)
+
+    throttled = ClientError({"Error": {"Code": "SlowDown"}, "ResponseMetadata": {"HTTPStatusCode": 503}}, "GetObject")
+    mock_get_object.side_effect = [throttled, throttled, throttled]
+    sleep.reset_mock()
+
+    with pytest.raises(ClientError):
+        s3.download_object_parallel("some_bucket", "some_key")
+
+    assert [call.args[0] for call in sleep.call_args_list] == [0.1, 0.2]
+
+    denied = ClientError({"Error": {"Code": "AccessDenied"}, "ResponseMetadata": {"HTTPStatusCode": 403}}, "GetObject")
+    mock_get_object.side_effect = [denied]
+    mock_get_object.reset_mock()
+
+    with pytest.raises(ClientError) as e:
+        s3.download_object_parallel("some_bucket", "some_key")
+
+    assert e.value.response["Error"]["Code"] == "AccessDenied"
+    assert mock_get_object.call_count == 1
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_download_object_parallel_changed(mocker: MockerFixture):
+    reload(s3)
+
+    s3_client = boto3.client("s3")
+    s3_client.create_bucket(Bucket="some_bucket")
+    s3_client.put_object(Bucket="some_bucket", Key="some_key", Body=b"File Data")
+
+    client = s3.get_s3_client()
+    head_object = client.head_object(Bucket="some_bucket", Key="some_key")
+    mocker.patch.object(client, "head_object", return_value={**head_object, "ETag": '"some other etag"'})
+
+    with pytest.raises(Exception) as e:
+        s3.download_object_parallel("some_bucket", "some_key")
+
+    assert str(e.value) == "Object changed during download: some_bucket/some_key"
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_upload_fileobj_transfer_config():
+    reload(s3)
+
+    s3_client = boto3.client("s3")
+    s3_client.create_bucket(Bucket="some_bucket")
+
+    transfer_config = TransferConfig(multipart_threshold=5 * s3.MB, multipart_chunksize=5 * s3.MB)
+    body = os.urandom(11 * s3.MB)
+
+    s3.upload_fileobj("some_bucket", "some_key", BytesIO(body), transfer_config=transfer_config)
+
+    response = s3_client.get_object(Bucket="some_bucket", Key="some_key")
+
+    assert response["ETag"].endswith('-3"')
+    assert response["Body"].read() == body
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_upload_multipart(tmp_path):
+    reload(s3)
+
+    s3_client = boto3.client("s3")
+    s3_client.create_bucket(Bucket="some_bucket")
+
+    body = os.urandom(11 * s3.MB)
+    file_path = tmp_path / "some_file"
+    file_path.write_bytes(body)
+
+    def generate_chunks():
+        for start in range(0, len(body), 1000 * 1000):
+            yield body[start : start + 1000 * 1000]
+
+    sources = [str(file_path), file_path, body, BytesIO(body), generate_chunks()]
+
+    for index, source in enumerate(sources):
+        progress = []
+        result = s3.upload_multipart(
+            "some_bucket",
+            f"some_key_{index}",
+            source,
+            part_size=5 * s3.MB,
+            max_concurrency=2,
+            extra_args={"ContentType": "application/octet-stream"},
+            progress_callback=progress.append,
+        )
+
+        assert result["bytes"] == len(body)
+        assert result["parts"] == 3
+        assert result["bytes_per_second"] > 0
+        assert sum(progress) == len(body)
+
+        response = s3_client.get_object(Bucket="some_bucket", Key=f"some_key_{index}")
+
+        assert response["ContentType"] == "application/octet-stream"
+        assert response["ETag"].endswith('-3"')
+        assert response["Body"].read() == body
+
+
+def test_fit_part_size():
+    assert s3._fit_part_size(8 * s3.MB, 80 * 1024 * s3.MB) == 9 * s3.MB
+    assert s3._fit_part_size(8 * s3.MB, 10000 * 8 * s3.MB) == 8 * s3.MB
+    assert s3._fit_part_size(8 * s3.MB, 10000 * 8 * s3.MB + 1) == 9 * s3.MB
+    assert s3._fit_part_size(64 * s3.MB, 10) == 64 * s3.MB
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_upload_multipart_part_limit(tmp_path, mocker: MockerFixture):
+    reload(s3)
+    mocker.patch.object(s3, "MAX_PARTS", 2)
+
+    s3_client = boto3.client("s3")
+    s3_client.create_bucket(Bucket="some_bucket")
+
+    data = os.urandom(11 * s3.MB)
+    file_path = tmp_path / "some_file"
+    file_path.write_bytes(data)
+
+    for source in [data, str(file_path)]:
+        response = s3.upload_multipart("some_bucket", "some_key", source, part_size=5 * s3.MB, threshold=5 * s3.MB)
+
+        assert response["parts"] == 2
+        assert s3_client.get_object(Bucket="some_bucket", Key="some_key")["Body"].read() == data
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_upload_multipart_below_threshold(tmp_path):
+    reload(s3)
+
+    s3_client = boto3.client("s3")
+    s3_client.create_bucket(Bucket="some_bucket")
+
+    file_path = tmp_path / "empty_file"
+    file_path.write_bytes(b"")
+
+    result = s3.upload_multipart("some_bucket", "some_key", iter([b"File ", b"Data"]))
+
+    assert result["bytes"] == 9
+    assert result["parts"] == 1
+    assert s3_client.get_object(Bucket="some_bucket", Key="some_key")["Body"].read() == b"File Data"
+
+    s3.upload_multipart("some_bucket", "empty_key", file_path)
+
+    assert s3_client.get_object(Bucket="some_bucket", Key="empty_key")["Body"].read() == b""
+
+    with pytest.raises(Exception) as e:
+        s3.upload_multipart("some_bucket", "some_key", b"File Data", part_size=1024)
+
+    assert str(e.value) == "Part size must be at least 5242880 bytes"
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_upload_multipart_failure_aborts():
+    reload(s3)
+
+    s3_client = boto3.client("s3")
+    s3_client.create_bucket(Bucket="some_bucket")
+
+    def generate_chunks():
+        yield os.urandom(6 * s3.MB)
+        msg = "Generator failed"
+        raise Exception(msg)
+
+    with pytest.raises(Exception) as e:
+        s3.upload_multipart("some_bucket", "some_key", generate_chunks(), part_size=5 * s3.MB, threshold=5 * s3.MB)
+
+    assert str(e.value) == "Generator failed"
+    assert s3_client.list_multipart_uploads(Bucket="some_bucket").get("Uploads", []) == []
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_abort_incomplete_multipart_uploads():
+    reload(s3)
+
+    s3_client = boto3.client("s3")
+    s3_client.create_bucket(Bucket="some_bucket")
+    upload_id = s3_client.create_multipart_upload(Bucket="some_bucket", Key="prefix1/some_key")["UploadId"]
+    s3_client.create_multipart_upload(Bucket="some_bucket", Key="prefix2/some_key")
+
+    aborted = s3.abort_incomplete_multipart_uploads("some_bucket", "prefix1/")
+
+    assert aborted == [{"Key": "prefix1/some_key", "UploadId": upload_id}]
+
+    aborted = s3.abort_incomplete_multipart_uploads("some_bucket", initiated_before=datetime(2000, 1, 1, tzinfo=UTC))
+
+    assert aborted == []
+    assert len(s3_client.list_multipart_uploads(Bucket="some_bucket")["Uploads"]) == 1
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_iter_objects():
+    reload(s3)
+
+    s3_client = boto3.client("s3")
+    s3_client.create_bucket(Bucket="some_bucket")
+    for count in range(5):
+        s3_client.put_object(Bucket="some_bucket", Key=f"prefix1/some_key_{count}", Body=b"File Data")
+    s3_client.put_object(Bucket="some_bucket", Key="prefix2/some_key", Body=b"File Data")
+
+    objects = list(s3.iter_objects("some_bucket", "prefix1/", page_size=2))
+
+    assert [item["Key"] for item in objects] == [f"prefix1/some_key_{count}" for count in range(5)]
+    assert objects[0]["Size"] == 9
+    assert objects[0]["ETag"] == s3_client.head_object(Bucket="some_bucket", Key="prefix1/some_key_0")["ETag"]
+    assert "LastModified" in objects[0]
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_iter_objects_parallel(mocker: MockerFixture):
+    reload(s3)
+
+    keys = ["root_key", *[f"prefix{shard}/some_key_{count}" for shard in range(4) for count in range(5)]]
+
+    s3_client = boto3.client("s3")
+    s3_client.create_bucket(Bucket="some_bucket")
+    for key in keys:
+        s3_client.put_object(Bucket="some_bucket", Key=key, Body=b"File Data")
+
+    objects = list(s3.iter_objects_parallel("some_bucket", max_concurrency=2, page_size=2))
+
+    assert sorted(item["Key"] for item in objects) == sorted(keys)
+    assert all(item["Size"] == 9 for item in objects)
+
+    objects = s3.iter_objects_parallel("some_bucket", "prefix1/", max_concurrency=2)
+
+    assert sorted(item["Key"] for item in objects) == [f"prefix1/some_key_{count}" for count in range(5)]
+
+    objects = s3.iter_objects_parallel("some_bucket", max_concurrency=1, page_size=1)
+    next(objects)
+    next(objects)
+    objects.close()
+
+    transfer_client = s3._get_transfer_client(16)
+    list_objects_v2 = mocker.spy(transfer_client, "list_objects_v2")
+
+    objects = list(s3.iter_objects_parallel("some_bucket", max_concurrency=16, page_size=2))
+
+    assert sorted(item["Key"] for item in objects) == sorted(keys)
+    assert all(call.kwargs["MaxKeys"] == 2 for call in list_objects_v2.call_args_list)
+    assert list_objects_v2.call_count == 3 + 4 * 3
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_delete_objects_bulk():
+    reload(s3)
+
+    s3_client = boto3.client("s3")
+    s3_client.create_bucket(Bucket="some_bucket")
+    for count in range(2500):
+        s3_client.put_object(Bucket="some_bucket", Key=f"prefix1/some_key_{count}", Body=b"")
+    s3_client.put_object(Bucket="some_bucket", Key="prefix2/some_key", Body=b"")
+
+    result = s3.delete_objects_bulk("some_bucket", s3.iter_objects("some_bucket", "prefix1/"), max_concurrency=2)
+
+    assert result == {"deleted": 2500, "errors": []}
+    assert [item["Key"] for item in s3.iter_objects("some_bucket")] == ["prefix2/some_key"]
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_delete_objects_bulk_versions():
+    reload(s3)
+
+    s3_client = boto3.client("s3")
+    s3_client.create_bucket(Bucket="some_bucket")
+    s3_client.put_bucket_versioning(Bucket="some_bucket", VersioningConfiguration={"Status": "Enabled"})
+    version_1 = s3_client.put_object(Bucket="some_bucket", Key="some_key", Body=b"1")["VersionId"]
+    version_2 = s3_client.put_object(Bucket="some_bucket", Key="some_key", Body=b"2")["VersionId"]
+
+    result = s3.delete_objects_bulk(
+        "some_bucket", [("some_key", version_1), {"Key": "some_key", "VersionId": version_2}]
+    )
+
+    assert result == {"deleted": 2, "errors": []}
+    assert s3_client.list_object_versions(Bucket="some_bucket").get("Versions", []) == []
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_delete_objects_bulk_errors(mocker: MockerFixture):
+    reload(s3)
+    mocker.patch("skymantle_boto_buddy.s3.time.sleep")
+
+    client = s3.get_s3_client()
+    mock_delete_objects = mocker.patch.object(
+        client,
+        "delete_objects",
+        side_effect=[
+            {"Errors": [{"Key": "key_2", "Code": "InternalError", "Message": "Error"}]},
+            {"Errors": [{"Key": "key_2", "Code": "InternalError", "Message": "Error"}]},
+        ],
+    )
+
+    result = s3.delete_objects_bulk("some_bucket", ["key_1", "key_2"], max_attempts=2)
+
+    assert result == {"deleted": 1, "errors": [{"Key": "key_2", "Code": "InternalError", "Message": "Error"}]}
+    mock_delete_objects.assert_called_with(Bucket="some_bucket", Delete={"Objects": [{"Key": "key_2"}], "Quiet": True})
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_copy_many():
+    reload(s3)
+
+    large_body = os.urandom(11 * s3.MB)
+
+    s3_client = boto3.client("s3")
+    s3_client.create_bucket(Bucket="some_bucket")
+    s3_client.create_bucket(Bucket="another_bucket")
+    s3_client.put_object(Bucket="some_bucket", Key="small_key", Body=b"File Data", Metadata={"name": "small"})
+    s3_client.put_object(
+        Bucket="some_bucket", Key="large_key", Body=large_body, ContentType="text/csv", Metadata={"name": "large"}
+    )
+
+    result = s3.copy_many(
+        [
+            ("some_bucket", "small_key", "another_bucket", "small_copy"),
+            ("some_bucket", "large_key", "another_bucket", "large_copy"),
+            ("some_bucket", "missing_key", "another_bucket", "missing_copy"),
+        ],
+        multipart_threshold=5 * s3.MB,
+        part_size=5 * s3.MB,
+    )
+
+    results = {item["source_key"]: item for item in result["results"]}
+
+    assert results["small_key"]["success"]
+    assert results["large_key"]["success"]
+    assert results["large_key"]["size"] == len(large_body)
+    assert not results["missing_key"]["success"]
+    assert "Not Found" in results["missing_key"]["error"]
+    assert result["bytes"] == len(large_body) + 9
+
+    response = s3_client.get_object(Bucket="another_bucket", Key="small_copy")
+    assert response["Body"].read() == b"File Data"
+    assert response["Metadata"] == {"name": "small"}
+
+    response = s3_client.get_object(Bucket="another_bucket", Key="large_copy")
+    assert response["Body"].read() == large_body
+    assert response["ETag"].endswith('-3"')
+    assert response["ContentType"] == "text/csv"
+    assert response["Metadata"] == {"name": "large"}
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_copy_many_part_limit(mocker: MockerFixture):
+    reload(s3)
+    mocker.patch.object(s3, "MAX_PARTS", 2)
+
+    large_body = os.urandom(11 * s3.MB)
+
+    s3_client = boto3.client("s3")
+    s3_client.create_bucket(Bucket="some_bucket")
+    s3_client.put_object(Bucket="some_bucket", Key="large_key", Body=large_body)
+
+    result = s3.copy_many(
+        [("some_bucket", "large_key", "some_bucket", "large_copy")], multipart_threshold=5 * s3.MB, part_size=5 * s3.MB
+    )
+
+    assert result["results"][0]["success"]
+
+    response = s3_client.get_object(Bucket="some_bucket", Key="large_copy")
+    assert response["Body"].read() == large_body
+    assert response["ETag"].endswith('-2"')
+
+    with pytest.raises(Exception) as e:
+        s3.copy_many([("some_bucket", "large_key", "some_bucket", "large_copy")], part_size=s3.MB)
+
+    assert str(e.value) == "Part size must be at least 5242880 bytes"
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_copy_prefix():
+    reload(s3)
+
+    s3_client = boto3.client("s3")
+    s3_client.create_bucket(Bucket="some_bucket")
+    for count in range(5):
+        s3_client.put_object(Bucket="some_bucket", Key=f"prefix1/some_key_{count}", Body=b"File Data")
+    s3_client.put_object(Bucket="some_bucket", Key="prefix2/some_key", Body=b"File Data")
+
+    result = s3.copy_prefix("some_bucket", "prefix1/", "some_bucket", "prefix3/", max_concurrency=2)
+
+    assert all(item["success"] for item in result["results"])
+    assert result["bytes"] == 45
+
+    keys = [item["Key"] for item in s3.iter_objects("some_bucket", "prefix3/")]
+    assert keys == [f"prefix3/some_key_{count}" for count in range(5)]
+
+    s3.copy_prefix("some_bucket", "prefix3/", "some_bucket", "prefix4/", delete_source=True)
+
+    keys = [item["Key"] for item in s3.iter_objects("some_bucket")]
+    assert keys == [
+        *[f"prefix1/some_key_{count}" for count in range(5)],
+        "prefix2/some_key",
+        *[f"prefix4/some_key_{count}" for count in range(5)],
+    ]
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_copy_prefix_nested_destination(mocker: MockerFixture):
+    reload(s3)
+
+    s3_client = boto3.client("s3")
+    s3_client.create_bucket(Bucket="some_bucket")
+    s3_client.put_object(Bucket="some_bucket", Key="data/some_key", Body=b"File Data")
+    s3_client.put_object(Bucket="some_bucket", Key="data/backup/old_key", Body=b"Old Data")
+
+    result = s3.copy_prefix("some_bucket", "data/", "some_bucket", "data/backup/", max_concurrency=4)
+
+    assert [item["destination_key"] for item in result["results"]] == ["data/backup/some_key"]
+
+    keys = [item["Key"] for item in s3.iter_objects("some_bucket")]
+    assert keys == ["data/backup/old_key", "data/backup/some_key", "data/some_key"]
+
+    get_transfer_client = mocker.spy(s3, "_get_transfer_client")
+    s3.copy_prefix("some_bucket", "data/", "some_bucket", "copy/", max_concurrency=4, part_concurrency=5)
+
+    assert [call.args[0] for call in get_transfer_client.call_args_list] == [4, 20]
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_iter_sql_query_json_lines():
+    reload(s3)
+
+    s3_client = boto3.client("s3")
+    s3_client.create_bucket(Bucket="some_bucket")
+    s3_client.put_object(Bucket="some_bucket", Key="some_key", Body=b'{"a": 1}\n{"a": 2}\n')
+
+    events = []
+    records = s3.iter_sql_query(
+        "some_bucket", "some_key", "SELECT * FROM S3Object s", "jsonl", progress_callback=events.append
+    )
+
+    assert list(records) == [{"a": 1}, {"a": 2}]
+    assert events[0]["Stats"]["Details"]["BytesScanned"] > 0
+
+
+def test_iter_sql_query_split_records(mocker: MockerFixture):
+    mock_client = mocker.patch("skymantle_boto_buddy.s3.get_s3_client").return_value
+    mock_client.select_object_content.return_value = {
+        "Payload": [
+            {"Records": {"Payload": b'{"a": "caf\xc3'}},
+            {"Records": {"Payload": b'\xa9"}\n{"a"'}},
+            {"Progress": {"Details": {"BytesScanned": 10}}},
+            {"Records": {"Payload": b': 2}\n{"a": 3}'}},
+            {"End": {}},
+        ]
+    }
+
+    events = []
+    records = s3.iter_sql_query(
+        "some_bucket",
+        "some_key",
+        "SELECT * FROM S3Object",
+        "csv",
+        s3.Compression.GZIP,
+        progress_callback=events.append,
+    )
+
+    assert list(records) == [{"a": "café"}, {"a": 2}, {"a": 3}]
+    assert events == [{"Progress": {"Details": {"BytesScanned": 10}}}]
+
+    kwargs = mock_client.select_object_content.call_args.kwargs
+    assert kwargs["InputSerialization"]["CompressionType"] == "GZIP"
+    assert kwargs["RequestProgress"] == {"Enabled": True}
+
+
+def test_iter_sql_query_unsupported_compression():
+    with pytest.raises(Exception) as e:
+        list(s3.iter_sql_query("some_bucket", "some_key", "SELECT * FROM S3Object", "csv", s3.Compression.ZSTD))
+
+    assert str(e.value) == "Compression is not supported: ZSTD"
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_get_object_stream_bzip2():
+    reload(s3)
+
+    s3_client = boto3.client("s3")
+    s3_client.create_bucket(Bucket="some_bucket")
+    s3_client.put_object(Bucket="some_bucket", Key="some_key.bz2", Body=bz2.compress(b"File Data"))
+
+    assert s3.get_object_stream("some_bucket", "some_key.bz2").read() == b"File Data"
+
+
+def test_iter_sql_query_parallel(mocker: MockerFixture):
+    mock_get_transfer_client = mocker.patch("skymantle_boto_buddy.s3._get_transfer_client")
+    mock_client = mock_get_transfer_client.return_value
+    mock_client.head_object.return_value = {"ContentLength": 250}
+
+    def select_object_content(**kwargs):
+        start = kwargs["ScanRange"]["Start"]
+        time.sleep((250 - start) / 1000)
+        return {"Payload": [{"Records": {"Payload": f'{{"start": {start}}}\n{{"start": {start}}}\n'.encode()}}]}
+
+    mock_client.select_object_content.side_effect = select_object_content
+
+    records = s3.iter_sql_query_parallel(
+        "some_bucket", "some_key", "SELECT * FROM S3Object", "csv", part_size=100, max_concurrency=2
+    )
+
+    assert list(records) == [{"start": 0}, {"start": 0}, {"start": 100}, {"start": 100}, {"start": 200}, {"start": 200}]
+
+    scan_ranges = [call.kwargs["ScanRange"] for call in mock_client.select_object_content.call_args_list]
+    assert sorted(scan_ranges, key=lambda scan_range: scan_range["Start"]) == [
+        {"Start": 0, "End": 99},
+        {"Start": 100, "End": 199},
+        {"Start": 200, "End": 249},
+    ]
+
+    mock_get_transfer_client.assert_called_with(2, None, None)
+    input_serialization = mock_client.select_object_content.call_args.kwargs["InputSerialization"]
+    assert "AllowQuotedRecordDelimiter" not in input_serialization["CSV"]
+    assert input_serialization["CSV"]["FileHeaderInfo"] == "Use"
+
+    records = s3.iter_sql_query_parallel(
+        "some_bucket", "some_key", "SELECT * FROM S3Object", "jsonl", part_size=100, preserve_order=False
+    )
+
+    assert sorted(record["start"] for record in records) == [0, 0, 100, 100, 200, 200]
+
+
+def test_iter_sql_query_parallel_invalid_input_type():
+    with pytest.raises(Exception) as e:
+        list(s3.iter_sql_query_parallel("some_bucket", "some_key", "SELECT * FROM S3Object", "parquet"))
+
+    assert str(e.value) == "Scan ranges are not supported for input type: parquet"
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_s3_object_cache(tmp_path, mocker: MockerFixture):
+    reload(s3)
+
+    s3_client = boto3.client("s3")
+    s3_client.create_bucket(Bucket="some_bucket")
+    s3_client.put_object(Bucket="some_bucket", Key="small_key", Body=b'{"key": "value"}')
+    s3_client.put_object(Bucket="some_bucket", Key="large_key", Body=b"x" * 100)
+
+    cache = s3.S3ObjectCache(str(tmp_path), max_bytes=150, memory_object_max_bytes=50)
+    get_object = mocker.spy(s3.get_s3_client(), "get_object")
+
+    assert s3.get_object_json("some_bucket", "small_key", cache=cache) == {"key": "value"}
+    assert s3.get_object_json("some_bucket", "small_key", cache=cache) == {"key": "value"}
+    assert s3.get_object_bytes("some_bucket", "large_key", cache=cache) == b"x" * 100
+    assert s3.get_object_bytes("some_bucket", "large_key", cache=cache) == b"x" * 100
+
+    assert len(list(tmp_path.iterdir())) == 1
+    assert "IfNoneMatch" in get_object.call_args.kwargs
+    assert cache.stats == {"hits": 2, "misses": 2, "revalidations": 2, "bytes_saved": 116, "evictions": 0}
+
+    s3_client.put_object(Bucket="some_bucket", Key="large_key", Body=b"y" * 100)
+
+    assert s3.get_object_bytes("some_bucket", "large_key", cache=cache) == b"y" * 100
+    assert cache.stats["misses"] == 3
+
+    s3_client.put_object(Bucket="some_bucket", Key="another_key", Body=b"z" * 100)
+
+    assert s3.get_object_bytes("some_bucket", "another_key", cache=cache) == b"z" * 100
+    assert cache.stats["evictions"] == 1
+    assert len(list(tmp_path.iterdir())) == 1
+
+    cache.clear()
+
+    assert list(tmp_path.iterdir()) == []
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_s3_object_cache_revalidate_after(tmp_path, mocker: MockerFixture):
+    reload(s3)
+
+    s3_client = boto3.client("s3")
+    s3_client.create_bucket(Bucket="some_bucket")
+    s3_client.put_object(Bucket="some_bucket", Key="some_key", Body=b"File Data")
+
+    cache = s3.S3ObjectCache(str(tmp_path), revalidate_after=60)
+    get_object = mocker.spy(s3.get_s3_client(), "get_object")
+
+    assert s3.get_object_bytes("some_bucket", "some_key", cache=cache) == b"File Data"
+    assert s3.get_object_bytes("some_bucket", "some_key", cache=cache) == b"File Data"
+
+    assert get_object.call_count == 1
+    assert cache.stats["hits"] == 1
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_s3_object_cache_directories():
+    reload(s3)
+
+    s3_client = boto3.client("s3")
+    s3_client.create_bucket(Bucket="some_bucket")
+    s3_client.put_object(Bucket="some_bucket", Key="some_key", Body=b"x" * 100)
+
+    cache_one = s3.S3ObjectCache(memory_object_max_bytes=50)
+    cache_two = s3.S3ObjectCache(memory_object_max_bytes=50)
+    directory = cache_one.directory
+
+    assert directory != cache_two.directory
+
+    assert s3.get_object_bytes("some_bucket", "some_key", cache=cache_one) == b"x" * 100
+    assert s3.get_object_bytes("some_bucket", "some_key", cache=cache_two) == b"x" * 100
+
+    cache_two.clear()
+
+    assert s3.get_object_bytes("some_bucket", "some_key", cache=cache_one) == b"x" * 100
+    assert cache_one.stats["hits"] == 1
+
+    del cache_one
+    assert not os.path.exists(directory)
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_s3_object_cache_missing_file(tmp_path):
+    reload(s3)
+
+    s3_client = boto3.client("s3")
+    s3_client.create_bucket(Bucket="some_bucket")
+    s3_client.put_object(Bucket="some_bucket", Key="some_key", Body=b"x" * 100)
+
+    for revalidate_after in [0, 60]:
+        cache = s3.S3ObjectCache(str(tmp_path), memory_object_max_bytes=50, revalidate_after=revalidate_after)
+
+        assert s3.get_object_bytes("some_bucket", "some_key", cache=cache) == b"x" * 100
+
+        for path in tmp_path.iterdir():
+            path.unlink()
+
+        assert s3.get_object_bytes("some_bucket", "some_key", cache=cache) == b"x" * 100
+        assert cache.stats["misses"] == 2
+        assert cache.stats["hits"] == 0
+        assert len(list(tmp_path.iterdir())) == 1
+
+        cache.clear()
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_put_object_compression():
+    reload(s3)
+
+    s3_client = boto3.client("s3")
+    s3_client.create_bucket(Bucket="some_bucket")
+
+    compressions = [s3.Compression.GZIP, s3.Compression.BZIP2]
+    if s3.zstandard:
+        compressions.append(s3.Compression.ZSTD)
+
+    for compression in compressions:
+        s3.put_object_json("some_bucket", "some_key", {"key": "value" * 100}, compression=compression)
+
+        response = s3_client.get_object(Bucket="some_bucket", Key="some_key")
+        assert response["ContentEncoding"] == s3._CONTENT_ENCODINGS[compression]
+        assert response["ContentLength"] < 100
+
+        assert s3.get_object_json("some_bucket", "some_key") == {"key": "value" * 100}
+        assert len(s3.get_object_bytes("some_bucket", "some_key", decompress=False)) < 100
+
+    s3.put_object("some_bucket", "some_key", "File Data", compression=s3.Compression.GZIP)
+
+    assert gzip.decompress(s3.get_object_bytes("some_bucket", "some_key", decompress=False)) == b"File Data"
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_put_object_compression_stream(tmp_path):
+    reload(s3)
+
+    s3_client = boto3.client("s3")
+    s3_client.create_bucket(Bucket="some_bucket")
+
+    lines = [f'{{"id": {count}}}\n'.encode() for count in range(10000)]
+
+    responses = {
+        "some_key": s3.put_object("some_bucket", "some_key", iter(lines), compression=s3.Compression.GZIP),
+        "another_key": s3.put_object(
+            "some_bucket", "another_key", BytesIO(b"".join(lines)), compression=s3.Compression.BZIP2
+        ),
+    }
+
+    for key in ["some_key", "another_key"]:
+        assert responses[key]["ETag"] == s3_client.head_object(Bucket="some_bucket", Key=key)["ETag"]
+        assert s3.get_object_stream("some_bucket", key).read() == b"".join(lines)
+        assert len(list(s3.iter_object_ndjson("some_bucket", key))) == 10000
+
+    data = os.urandom(9 * s3.MB)
+    response = s3.put_object("some_bucket", "large_key", BytesIO(data), compression=s3.Compression.GZIP)
+
+    assert response["ETag"] == s3_client.head_object(Bucket="some_bucket", Key="large_key")["ETag"]
+    assert response["ETag"].endswith('-2"')
+    assert s3.get_object_bytes("some_bucket", "large_key") == data
+
+    cache = s3.S3ObjectCache(str(tmp_path))
+
+    assert s3.get_object_bytes("some_bucket", "some_key", cache=cache) == b"".join(lines)
+    assert s3.get_object_bytes("some_bucket", "some_key", cache=cache) == b"".join(lines)
+    assert cache.stats["bytes_saved"] < len(b"".join(lines))
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_ndjson_writer():
+    reload(s3)
+
+    s3_client = boto3.client("s3")
+    s3_client.create_bucket(Bucket="some_bucket")
+
+    with s3.S3NdjsonWriter("some_bucket", "some_key") as writer:
+        writer.write({"id": 0})
+        writer.write_records({"id": count} for count in range(1, 1000))
+
+    response = s3_client.head_object(Bucket="some_bucket", Key="some_key")
+
+    assert writer.result == {"records": 1000, "bytes": response["ContentLength"], "parts": 1}
+    assert response["ContentType"] == "application/x-ndjson"
+    assert list(s3.iter_object_ndjson("some_bucket", "some_key")) == [{"id": count} for count in range(1000)]
+
+    with pytest.raises(Exception) as e:
+        writer.write({"id": 1000})
+
+    assert str(e.value) == "Writer is closed"
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_ndjson_writer_multipart_compression():
+    reload(s3)
+
+    s3_client = boto3.client("s3")
+    s3_client.create_bucket(Bucket="some_bucket")
+
+    records = [{"id": count, "data": os.urandom(512).hex()} for count in range(15000)]
+
+    with s3.S3NdjsonWriter("some_bucket", "some_key", compression=s3.Compression.GZIP, part_size=5 * s3.MB) as writer:
+        writer.write_records(records)
+
+    assert writer.result["parts"] == 2
+    assert writer.result["records"] == 15000
+
+    response = s3_client.head_object(Bucket="some_bucket", Key="some_key")
+    assert response["ContentEncoding"] == "gzip"
+    assert response["ContentLength"] == writer.result["bytes"]
+    assert list(s3.iter_object_ndjson("some_bucket", "some_key")) == records
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_csv_writer():
+    reload(s3)
+
+    s3_client = boto3.client("s3")
+    s3_client.create_bucket(Bucket="some_bucket")
+
+    rows = [{"id": str(count), "name": f"name, {count}"} for count in range(100)]
+
+    with s3.S3CsvWriter("some_bucket", "some_key.csv.bz2", compression=s3.Compression.BZIP2) as writer:
+        writer.write_records(rows)
+
+    assert list(s3.get_object_csv_reader("some_bucket", "some_key.csv.bz2")) == rows
+    assert s3_client.head_object(Bucket="some_bucket", Key="some_key.csv.bz2")["ContentType"] == "text/csv"
+
+    with s3.S3CsvWriter("some_bucket", "empty.csv", ["id", "name"], extra_args={"ContentType": "text/plain"}):
+        pass
+
+    response = s3_client.get_object(Bucket="some_bucket", Key="empty.csv")
+    assert response["Body"].read() == b"id,name\r\n"
+    assert response["ContentType"] == "text/plain"
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_record_writer_abort():
+    reload(s3)
+
+    s3_client = boto3.client("s3")
+    s3_client.create_bucket(Bucket="some_bucket")
+
+    records = [{"data": os.urandom(512).hex()} for _ in range(6000)]
+
+    with pytest.raises(ValueError), s3.S3NdjsonWriter("some_bucket", "some_key", part_size=5 * s3.MB) as writer:
+        writer.write_records(records)
+        raise ValueError
+
+    assert "Contents" not in s3_client.list_objects_v2(Bucket="some_bucket")
+    assert "Uploads" not in s3_client.list_multipart_uploads(Bucket="some_bucket")
+
+    with pytest.raises(Exception) as e:
+        s3.S3NdjsonWriter("some_bucket", "some_key", part_size=s3.MB)
+
+    assert str(e.value) == "Part size must be at least 5242880 bytes"
+
+    with pytest.raises(TypeError):
+        s3.S3RecordWriter("some_bucket", "some_key")
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_record_writer_close_failure_aborts(mocker: MockerFixture):
+    reload(s3)
+
+    s3_client = boto3.client("s3")
+    s3_client.create_bucket(Bucket="some_bucket")
+
+    writer = s3.S3NdjsonWriter("some_bucket", "some_key", part_size=5 * s3.MB)
+    writer.write_records({"data": os.urandom(512).hex()} for _ in range(6000))
+    mocker.patch.object(writer, "_flush_text", side_effect=Exception("Part upload failed"))
+
+    with pytest.raises(Exception) as e:
+        writer.close()
 
-    assert str(e.value) == "Input type is not supported: json"
+    assert str(e.value) == "Part upload failed"
+    assert "Uploads" not in s3_client.list_multipart_uploads(Bucket="some_bucket")
+    assert "Contents" not in s3_client.list_objects_v2(Bucket="some_bucket")
@@ -0,0 +1,376 @@
+import json
+import os
+from importlib import reload
+
+import boto3
+import pytest
+from moto import mock_aws
+from pytest_mock import MockerFixture
+
+from skymantle_boto_buddy import s3, s3_sync
+from skymantle_boto_buddy.s3 import MB
+from skymantle_boto_buddy.s3_sync import SyncDirection
+
+
+@pytest.fixture()
+def environment(mocker: MockerFixture):
+    return mocker.patch.dict(
+        os.environ,
+        {"AWS_DEFAULT_REGION": "us-east-1", "AWS_LAMBDA_FUNCTION_NAME": "Test_Lambda_Function"},
+    )
+
+
+def write_files(directory, files: dict[str, bytes]) -> None:
+    for relative_path, data in files.items():
+        path = directory.joinpath(*relative_path.split("/"))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_compute_etag(tmp_path):
+    reload(s3)
+    reload(s3_sync)
+
+    s3_client = boto3.client("s3")
+    s3_client.create_bucket(Bucket="some_bucket")
+
+    data = os.urandom(11 * MB)
+    write_files(tmp_path, {"small": b"File Data", "large": data, "empty": b""})
+
+    s3_client.put_object(Bucket="some_bucket", Key="small", Body=b"File Data")
+    s3_client.put_object(Bucket="some_bucket", Key="empty", Body=b"")
+    s3.upload_multipart("some_bucket", "large", data, part_size=5 * MB, threshold=5 * MB)
+
+    assert s3_sync.compute_etag(tmp_path / "small") == s3_client.head_object(Bucket="some_bucket", Key="small")["ETag"]
+    assert s3_sync.compute_etag(tmp_path / "empty") == s3_client.head_object(Bucket="some_bucket", Key="empty")["ETag"]
+    assert (
+        s3_sync.compute_etag(tmp_path / "large", 5 * MB)
+        == s3_client.head_object(Bucket="some_bucket", Key="large")["ETag"]
+    )
+    assert s3_sync.compute_etag(tmp_path / "large", 5 * MB).endswith('-3"')
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_sync_upload(tmp_path, mocker: MockerFixture):
+    reload(s3)
+    reload(s3_sync)
+
+    s3_client = boto3.client("s3")
+    s3_client.create_bucket(Bucket="some_bucket")
+
+    write_files(tmp_path, {"a.txt": b"File A", "sub/b.txt": b"File B", "sub/deeper/c.txt": b"File C"})
+
+    response = s3_sync.sync(str(tmp_path), "some_bucket", "some_prefix")
+
+    assert [transfer["key"] for transfer in response["plan"]["transfer"]] == [
+        "some_prefix/a.txt",
+        "some_prefix/sub/b.txt",
+        "some_prefix/sub/deeper/c.txt",
+    ]
+    assert all(result["success"] for result in response["results"])
+    assert response["bytes"] == 18
+    assert s3_client.get_object(Bucket="some_bucket", Key="some_prefix/sub/b.txt")["Body"].read() == b"File B"
+    assert (tmp_path / s3_sync.MANIFEST_FILE_NAME).exists()
+
+    keys = [item["Key"] for item in s3.iter_objects("some_bucket")]
+    assert s3_sync.MANIFEST_FILE_NAME not in ",".join(keys)
+
+    compute_etag = mocker.spy(s3_sync, "compute_etag")
+    response = s3_sync.sync(str(tmp_path), "some_bucket", "some_prefix")
+
+    assert response["plan"] == {"transfer": [], "delete": [], "unchanged": 3, "rejected": []}
+    compute_etag.assert_not_called()
+
+    write_files(tmp_path, {"a.txt": b"File Z", "sub/b.txt": b"File BB"})
+    os.utime(tmp_path / "a.txt", ns=(0, 0))
+
+    response = s3_sync.sync(str(tmp_path), "some_bucket", "some_prefix")
+
+    assert [(transfer["path"], transfer["reason"]) for transfer in response["plan"]["transfer"]] == [
+        ("a.txt", "etag"),
+        ("sub/b.txt", "size"),
+    ]
+    assert response["plan"]["unchanged"] == 1
+    assert s3_client.get_object(Bucket="some_bucket", Key="some_prefix/a.txt")["Body"].read() == b"File Z"
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_sync_upload_rehashes_without_manifest(tmp_path):
+    reload(s3)
+    reload(s3_sync)
+
+    s3_client = boto3.client("s3")
+    s3_client.create_bucket(Bucket="some_bucket")
+
+    data = os.urandom(11 * MB)
+    write_files(tmp_path, {"large": data, "small": b"File Data"})
+    s3.upload_multipart("some_bucket", "large", data, part_size=5 * MB, threshold=5 * MB)
+    s3_client.put_object(Bucket="some_bucket", Key="small", Body=b"File Data")
+
+    response = s3_sync.sync(str(tmp_path), "some_bucket")
+
+    assert response["plan"] == {"transfer": [], "delete": [], "unchanged": 2, "rejected": []}
+
+    with open(tmp_path / s3_sync.MANIFEST_FILE_NAME, encoding="utf-8") as file:
+        manifest = json.load(file)
+
+    assert manifest["targets"]["s3://some_bucket/"]["large"]["etag"].endswith('-3"')
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_sync_upload_delete_dry_run(tmp_path):
+    reload(s3)
+    reload(s3_sync)
+
+    s3_client = boto3.client("s3")
+    s3_client.create_bucket(Bucket="some_bucket")
+    s3_client.put_object(Bucket="some_bucket", Key="some_prefix/extra.txt", Body=b"Extra")
+    s3_client.put_object(Bucket="some_bucket", Key="other_prefix/keep.txt", Body=b"Keep")
+
+    write_files(tmp_path, {"a.txt": b"File A"})
+
+    response = s3_sync.sync(str(tmp_path), "some_bucket", "some_prefix/", delete=True, dry_run=True)
+
+    assert response["plan"]["transfer"] == [
+        {"path": "a.txt", "key": "some_prefix/a.txt", "size": 6, "reason": "missing"}
+    ]
+    assert response["plan"]["delete"] == [{"path": "extra.txt", "key": "some_prefix/extra.txt"}]
+    assert response["results"] == []
+    assert response["delete_errors"] == []
+    assert not (tmp_path / s3_sync.MANIFEST_FILE_NAME).exists()
+    assert [item["Key"] for item in s3.iter_objects("some_bucket")] == [
+        "other_prefix/keep.txt",
+        "some_prefix/extra.txt",
+    ]
+
+    assert s3_sync.plan_sync(str(tmp_path), "some_bucket", "some_prefix", delete=True) == response["plan"]
+
+    response = s3_sync.sync(str(tmp_path), "some_bucket", "some_prefix", delete=True)
+
+    assert response["deleted"] == 1
+    assert response["delete_errors"] == []
+    assert [item["Key"] for item in s3.iter_objects("some_bucket")] == ["other_prefix/keep.txt", "some_prefix/a.txt"]
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_sync_upload_delete_errors(tmp_path, mocker: MockerFixture):
+    reload(s3)
+    reload(s3_sync)
+
+    s3_client = boto3.client("s3")
+    s3_client.create_bucket(Bucket="some_bucket")
+    s3_client.put_object(Bucket="some_bucket", Key="extra.txt", Body=b"Extra")
+
+    errors = [{"Key": "extra.txt", "Code": "AccessDenied", "Message": "Access Denied"}]
+    mocker.patch.object(s3, "delete_objects_bulk", return_value={"deleted": 0, "errors": errors})
+
+    response = s3_sync.sync(str(tmp_path), "some_bucket", delete=True)
+
+    assert response["deleted"] == 0
+    assert response["delete_errors"] == errors
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_sync_download(tmp_path):
+    reload(s3)
+    reload(s3_sync)
+
+    s3_client = boto3.client("s3")
+    s3_client.create_bucket(Bucket="some_bucket")
+
+    data = os.urandom(11 * MB)
+    s3.upload_multipart("some_bucket", "some_prefix/data/large", data, part_size=5 * MB, threshold=5 * MB)
+    s3_client.put_object(Bucket="some_bucket", Key="some_prefix/small.txt", Body=b"File Data")
+    s3_client.put_object(Bucket="some_bucket", Key="some_prefix/folder/", Body=b"")
+
+    directory = tmp_path / "download"
+    write_files(directory, {"extra.txt": b"Extra"})
+
+    response = s3_sync.sync(
+        str(directory), "some_bucket", "some_prefix", SyncDirection.DOWNLOAD, delete=True, part_size=5 * MB
+    )
+
+    assert [transfer["path"] for transfer in response["plan"]["transfer"]] == ["data/large", "small.txt"]
+    assert all(result["success"] for result in response["results"])
+    assert response["deleted"] == 1
+    assert (directory / "data" / "large").read_bytes() == data
+    assert (directory / "small.txt").read_bytes() == b"File Data"
+    assert not (directory / "extra.txt").exists()
+    assert sorted(os.listdir(directory)) == [s3_sync.MANIFEST_FILE_NAME, "data", "small.txt"]
+
+    response = s3_sync.sync(str(directory), "some_bucket", "some_prefix", SyncDirection.DOWNLOAD, delete=True)
+
+    assert response["plan"] == {"transfer": [], "delete": [], "unchanged": 2, "rejected": []}
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_sync_download_failure(tmp_path, mocker: MockerFixture):
+    reload(s3)
+    reload(s3_sync)
+
+    s3_client = boto3.client("s3")
+    s3_client.create_bucket(Bucket="some_bucket")
+    s3_client.put_object(Bucket="some_bucket", Key="a.txt", Body=b"File A")
+    s3_client.put_object(Bucket="some_bucket", Key="b.txt", Body=b"File B")
+
+    download_object_parallel = s3._download_object_parallel
+
+    def fail_for_b(s3_client, bucket, key, *args, **kwargs):
+        if key == "b.txt":
+            msg = "Download failed"
+            raise Exception(msg)
+        return download_object_parallel(s3_client, bucket, key, *args, **kwargs)
+
+    mocker.patch.object(s3, "_download_object_parallel", side_effect=fail_for_b)
+
+    manifest_path = tmp_path / "manifest.json"
+    directory = tmp_path / "download"
+
+    response = s3_sync.sync(
+        str(directory), "some_bucket", direction=SyncDirection.DOWNLOAD, manifest_path=manifest_path
+    )
+
+    assert response["results"] == [
+        {"path": "a.txt", "key": "a.txt", "size": 6, "success": True},
+        {"path": "b.txt", "key": "b.txt", "success": False, "error": "Download failed"},
+    ]
+    assert sorted(os.listdir(directory)) == ["a.txt"]
+
+    manifest = s3_sync.load_manifest(manifest_path)
+    assert list(manifest["targets"]["s3://some_bucket/"]) == ["a.txt"]
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_sync_download_delete_failure(tmp_path, mocker: MockerFixture):
+    reload(s3)
+    reload(s3_sync)
+
+    s3_client = boto3.client("s3")
+    s3_client.create_bucket(Bucket="some_bucket")
+    s3_client.put_object(Bucket="some_bucket", Key="a.txt", Body=b"File A")
+
+    write_files(tmp_path, {"extra_a.txt": b"Extra A", "extra_b.txt": b"Extra B"})
+
+    remove = os.remove
+
+    def fail_for_b(path):
+        if path.endswith("extra_b.txt"):
+            msg = "Permission denied"
+            raise PermissionError(msg)
+        remove(path)
+
+    mocker.patch.object(s3_sync.os, "remove", side_effect=fail_for_b)
+
+    response = s3_sync.sync(str(tmp_path), "some_bucket", direction=SyncDirection.DOWNLOAD, delete=True)
+
+    assert response["results"] == [{"path": "a.txt", "key": "a.txt", "size": 6, "success": True}]
+    assert response["deleted"] == 1
+    assert response["delete_errors"] == [{"path": "extra_b.txt", "key": "extra_b.txt", "error": "Permission denied"}]
+    assert sorted(os.listdir(tmp_path)) == [s3_sync.MANIFEST_FILE_NAME, "a.txt", "extra_b.txt"]
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_sync_download_rejects_keys_outside_directory(tmp_path):
+    reload(s3)
+    reload(s3_sync)
+
+    s3_client = boto3.client("s3")
+    s3_client.create_bucket(Bucket="some_bucket")
+    s3_client.put_object(Bucket="some_bucket", Key="p/../../escaped.txt", Body=b"Escaped")
+    s3_client.put_object(Bucket="some_bucket", Key="p/link/linked.txt", Body=b"Linked")
+    s3_client.put_object(Bucket="some_bucket", Key="p/ok.txt", Body=b"File Data")
+
+    directory = tmp_path / "nested" / "download"
+    outside = tmp_path / "outside"
+    outside.mkdir()
+    directory.mkdir(parents=True)
+    (directory / "link").symlink_to(outside, target_is_directory=True)
+    (directory / "outside_file").symlink_to(outside / "target.txt")
+    (outside / "target.txt").write_bytes(b"Target")
+
+    response = s3_sync.sync(str(directory), "some_bucket", "p", SyncDirection.DOWNLOAD, delete=True)
+
+    assert response["plan"]["transfer"] == [{"path": "ok.txt", "key": "p/ok.txt", "size": 9, "reason": "missing"}]
+    assert response["plan"]["delete"] == []
+    assert response["plan"]["rejected"] == [
+        {"path": "../../escaped.txt", "key": "p/../../escaped.txt"},
+        {"path": "link/linked.txt", "key": "p/link/linked.txt"},
+        {"path": "outside_file", "key": "p/outside_file"},
+    ]
+    assert all(result["success"] for result in response["results"])
+
+    assert (directory / "ok.txt").read_bytes() == b"File Data"
+    assert (outside / "target.txt").read_bytes() == b"Target"
+    assert sorted(os.listdir(outside)) == ["target.txt"]
+    assert sorted(os.listdir(tmp_path)) == ["nested", "outside"]
+
+    with pytest.raises(Exception) as e:
+        s3_sync._writable_local_path({"directory": str(directory)}, "../escaped.txt")
+
+    assert str(e.value) == "Path resolves outside the directory: ../escaped.txt"
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_sync_manifest_etag_from_transfer(tmp_path, mocker: MockerFixture):
+    reload(s3)
+    reload(s3_sync)
+
+    s3_client = boto3.client("s3")
+    s3_client.create_bucket(Bucket="some_bucket")
+    s3_client.put_object(Bucket="some_bucket", Key="a.txt", Body=b"File A")
+
+    download_object_parallel = s3._download_object_parallel
+
+    def overwrite_before_download(*args, **kwargs):
+        s3_client.put_object(Bucket="some_bucket", Key="a.txt", Body=b"File Z")
+        return download_object_parallel(*args, **kwargs)
+
+    mocker.patch.object(s3, "_download_object_parallel", side_effect=overwrite_before_download)
+
+    directory = tmp_path / "download"
+    s3_sync.sync(str(directory), "some_bucket", direction=SyncDirection.DOWNLOAD)
+
+    manifest = s3_sync.load_manifest(directory / s3_sync.MANIFEST_FILE_NAME)
+    assert (directory / "a.txt").read_bytes() == b"File Z"
+    assert manifest["targets"]["s3://some_bucket/"]["a.txt"]["etag"] == s3_sync.compute_etag(directory / "a.txt")
+
+    write_files(tmp_path / "upload", {"b.txt": b"File B"})
+    head_object = mocker.spy(s3._get_transfer_client(8 * 4), "head_object")
+
+    s3_sync.sync(str(tmp_path / "upload"), "some_bucket")
+
+    head_object.assert_not_called()
+    manifest = s3_sync.load_manifest(tmp_path / "upload" / s3_sync.MANIFEST_FILE_NAME)
+    assert manifest["targets"]["s3://some_bucket/"]["b.txt"]["etag"] == s3_sync.compute_etag(
+        tmp_path / "upload" / "b.txt"
+    )
+
+
+def test_sync_invalid_options(tmp_path):
+    with pytest.raises(Exception) as e:
+        s3_sync.sync(str(tmp_path), "some_bucket", part_size=MB)
+
+    assert str(e.value) == "Part size must be at least 5242880 bytes"
+
+    with pytest.raises(Exception) as e:
+        s3_sync.plan_sync(str(tmp_path / "missing"), "some_bucket")
+
+    assert str(e.value) == f"Directory does not exist: {tmp_path / 'missing'}"
+
+
+def test_load_manifest_other_version(tmp_path):
+    manifest_path = tmp_path / "manifest.json"
+    manifest_path.write_text(json.dumps({"version": 0, "targets": {"s3://some_bucket/": {}}}))
+
+    assert s3_sync.load_manifest(manifest_path) == {"version": 1, "targets": {}}
@@ -4,6 +4,7 @@ from importlib import reload
 import boto3
 import pytest
 from boto3 import Session
+from botocore.exceptions import ClientError
 from moto import mock_aws
 from pytest_mock import MockerFixture
 
@@ -77,3 +78,335 @@ def test_get_parameter_decrypted():
     result = ssm.get_parameter_decrypted("some_key")
 
     assert result == "some value"
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_get_parameters(mocker: MockerFixture):
+    reload(ssm)
+
+    ssm_client = boto3.client("ssm")
+    for count in range(25):
+        ssm_client.put_parameter(Name=f"some_key_{count}", Type="String", Value=f"value {count}")
+    ssm_client.put_parameter(Name="encrypted_key", Type="SecureString", Value="encrypted value")
+
+    get_parameters = mocker.spy(ssm.get_ssm_client(), "get_parameters")
+
+    names = [f"some_key_{count}" for count in range(25)] + ["missing_key", "encrypted_key", "some_key_0"]
+    result = ssm.get_parameters(names, decrypt=True)
+
+    assert result == {
+        **{f"some_key_{count}": f"value {count}" for count in range(25)},
+        "encrypted_key": "encrypted value",
+    }
+    assert list(result)[-1] == "encrypted_key"
+    assert get_parameters.call_count == 3
+    assert all(len(call.kwargs["Names"]) <= 10 for call in get_parameters.call_args_list)
+
+    assert ssm.get_parameters(["encrypted_key"])["encrypted_key"] != "encrypted value"
+    assert ssm.get_parameters([]) == {}
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_get_parameters_by_path():
+    reload(ssm)
+
+    ssm_client = boto3.client("ssm")
+    ssm_client.put_parameter(Name="/service/prod/name", Type="String", Value="service")
+    ssm_client.put_parameter(Name="/service/prod/db/host", Type="String", Value="localhost")
+    ssm_client.put_parameter(Name="/service/prod/db/password", Type="SecureString", Value="secret")
+    ssm_client.put_parameter(Name="/service/dev/name", Type="String", Value="dev service")
+    for count in range(15):
+        ssm_client.put_parameter(Name=f"/service/prod/flags/flag_{count}", Type="String", Value=str(count))
+
+    result = ssm.get_parameters_by_path("/service/prod", decrypt=True)
+
+    assert len(result) == 18
+    assert result["/service/prod/db/password"] == "secret"
+    assert "/service/dev/name" not in result
+
+    assert ssm.get_parameters_by_path("/service/prod", recursive=False) == {"/service/prod/name": "service"}
+
+    nested = ssm.get_parameters_by_path("/service/prod/", decrypt=True, nested=True)
+
+    assert nested["name"] == "service"
+    assert nested["db"] == {"host": "localhost", "password": "secret"}
+    assert nested["flags"]["flag_14"] == "14"
+
+
+def test_nest_parameters_conflict():
+    with pytest.raises(Exception) as e:
+        ssm._nest_parameters("/service", {"/service/db": "a", "/service/db/host": "b"})
+
+    assert str(e.value) == "Parameter conflicts with a nested path: /service/db/host"
+
+    with pytest.raises(Exception) as e:
+        ssm._nest_parameters("/service", {"/service/db/host": "b", "/service/db": "a"})
+
+    assert str(e.value) == "Parameter conflicts with a nested path: /service/db"
+
+
+def throttling_error() -> ClientError:
+    return ClientError({"Error": {"Code": "ThrottlingException", "Message": "Rate exceeded"}}, "GetParameter")
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_parameter_cache(mocker: MockerFixture):
+    reload(ssm)
+
+    ssm_client = boto3.client("ssm")
+    ssm_client.put_parameter(Name="some_key", Type="String", Value="some value")
+    ssm_client.put_parameter(Name="encrypted_key", Type="SecureString", Value="encrypted value")
+
+    monotonic = mocker.patch("skymantle_boto_buddy.ssm.time.monotonic", return_value=1000.0)
+    get_parameter = mocker.spy(ssm.get_ssm_client(), "get_parameter")
+
+    cache = ssm.ParameterCache(ttl=60, refresh_ahead=10)
+
+    assert cache.get("some_key") == "some value"
+    assert cache.get("some_key") == "some value"
+    assert cache.get("encrypted_key", decrypt=True) == "encrypted value"
+    assert cache.get("encrypted_key") != "encrypted value"
+    assert get_parameter.call_count == 3
+    assert len(cache) == 3
+    assert cache.stats == {"hits": 1, "misses": 3, "refreshes": 0, "stale_hits": 0, "errors": 0}
+
+    ssm_client.put_parameter(Name="some_key", Type="String", Value="new value", Overwrite=True)
+
+    monotonic.return_value = 1055.0
+    assert cache.get("some_key") == "some value"
+    cache.close()
+
+    assert get_parameter.call_count == 4
+    assert cache.stats["refreshes"] == 1
+    assert cache.get("some_key") == "new value"
+
+    monotonic.return_value = 1200.0
+    ssm_client.put_parameter(Name="some_key", Type="String", Value="newer value", Overwrite=True)
+
+    assert cache.get("some_key") == "newer value"
+    assert cache.stats["refreshes"] == 2
+
+    cache.invalidate("encrypted_key", decrypt=True)
+    assert len(cache) == 2
+    cache.invalidate()
+    assert len(cache) == 0
+
+    with pytest.raises(ClientError):
+        cache.get("missing_key")
+
+    assert cache.stats["errors"] == 1
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_parameter_cache_per_parameter_ttl(mocker: MockerFixture):
+    reload(ssm)
+
+    ssm_client = boto3.client("ssm")
+    ssm_client.put_parameter(Name="some_key", Type="String", Value="some value")
+
+    monotonic = mocker.patch("skymantle_boto_buddy.ssm.time.monotonic", return_value=1000.0)
+    get_parameter = mocker.spy(ssm.get_ssm_client(), "get_parameter")
+
+    cache = ssm.ParameterCache(ttl=60)
+    cache.get("some_key", ttl=600)
+    cache.set("other_key", "other value", ttl=5)
+
+    monotonic.return_value = 1100.0
+
+    assert cache.get("some_key") == "some value"
+    assert get_parameter.call_count == 1
+
+    with pytest.raises(ClientError):
+        cache.get("other_key")
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_parameter_cache_stale_while_throttled(mocker: MockerFixture):
+    reload(ssm)
+
+    ssm_client = boto3.client("ssm")
+    ssm_client.put_parameter(Name="some_key", Type="String", Value="some value")
+
+    monotonic = mocker.patch("skymantle_boto_buddy.ssm.time.monotonic", return_value=1000.0)
+
+    cache = ssm.ParameterCache(ttl=60, max_stale=300)
+    assert cache.get("some_key") == "some value"
+
+    get_parameter = mocker.patch.object(ssm.get_ssm_client(), "get_parameter", side_effect=throttling_error())
+
+    monotonic.return_value = 1100.0
+    assert cache.get("some_key") == "some value"
+    assert cache.stats["stale_hits"] == 1
+
+    monotonic.return_value = 1400.0
+    with pytest.raises(ClientError):
+        cache.get("some_key")
+
+    get_parameter.side_effect = ClientError({"Error": {"Code": "AccessDeniedException"}}, "GetParameter")
+    monotonic.return_value = 1100.0
+    with pytest.raises(ClientError):
+        cache.get("some_key")
+
+    assert cache.stats["errors"] == 2
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_parameter_cache_serves_stale_during_refresh(mocker: MockerFixture):
+    reload(ssm)
+
+    ssm_client = boto3.client("ssm")
+    ssm_client.put_parameter(Name="some_key", Type="String", Value="some value")
+
+    monotonic = mocker.patch("skymantle_boto_buddy.ssm.time.monotonic", return_value=1000.0)
+
+    cache = ssm.ParameterCache(ttl=60)
+    cache.get("some_key")
+
+    monotonic.return_value = 1100.0
+    cache._refreshing.add(("some_key", False))
+    get_parameter = mocker.spy(ssm.get_ssm_client(), "get_parameter")
+
+    assert cache.get("some_key") == "some value"
+    assert get_parameter.call_count == 0
+    assert cache.stats["stale_hits"] == 1
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_parameter_cache_get_many(mocker: MockerFixture):
+    reload(ssm)
+
+    ssm_client = boto3.client("ssm")
+    for count in range(15):
+        ssm_client.put_parameter(Name=f"some_key_{count}", Type="String", Value=f"value {count}")
+
+    monotonic = mocker.patch("skymantle_boto_buddy.ssm.time.monotonic", return_value=1000.0)
+    cache = ssm.ParameterCache(ttl=60)
+    cache.get("some_key_0")
+
+    get_parameters = mocker.spy(ssm.get_ssm_client(), "get_parameters")
+    names = [f"some_key_{count}" for count in range(15)] + ["missing_key"]
+
+    result = cache.get_many(names)
+
+    assert result == {f"some_key_{count}": f"value {count}" for count in range(15)}
+    assert get_parameters.call_count == 2
+    assert cache.get_many(names) == result
+    assert get_parameters.call_count == 3
+
+    get_parameters.side_effect = throttling_error()
+    monotonic.return_value = 1100.0
+
+    assert cache.get_many(names[:15]) == result
+
+    with pytest.raises(ClientError):
+        cache.get_many(names)
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_get_parameter_cached(mocker: MockerFixture):
+    reload(ssm)
+
+    ssm_client = boto3.client("ssm")
+    ssm_client.put_parameter(Name="some_key", Type="String", Value="some value")
+
+    mocker.patch.dict(os.environ, {"BOTO_BUDDY_SSM_CACHE_TTL": "120"})
+    get_parameter = mocker.spy(ssm.get_ssm_client(), "get_parameter")
+
+    assert ssm.get_parameter_cached("some_key") == "some value"
+    assert ssm.get_parameter_cached("some_key") == "some value"
+    assert get_parameter.call_count == 1
+
+    assert ssm.get_parameter_cache() is ssm.get_parameter_cache()
+    assert ssm.get_parameter_cache().ttl == 120
+    assert ssm.get_parameter_cache(region_name="us-east-1") is not ssm.get_parameter_cache()
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_prefetch_parameters(mocker: MockerFixture):
+    reload(ssm)
+
+    ssm_client = boto3.client("ssm")
+    for count in range(12):
+        ssm_client.put_parameter(Name=f"some_key_{count}", Type="String", Value=f"value {count}")
+    ssm_client.put_parameter(Name="encrypted_key", Type="SecureString", Value="encrypted value")
+    ssm_client.put_parameter(Name="/service/db/host", Type="String", Value="localhost")
+    ssm_client.put_parameter(Name="/service/db/password", Type="SecureString", Value="password")
+
+    ssm.register_prefetch(*[f"some_key_{count}" for count in range(12)])
+    ssm.register_prefetch("encrypted_key", "/service/", decrypt=True)
+
+    result = ssm.prefetch_parameters()
+
+    assert len(result) == 15
+    assert result["encrypted_key"] == "encrypted value"
+    assert result["/service/db/password"] == "password"
+
+    get_parameter = mocker.spy(ssm.get_ssm_client(), "get_parameter")
+
+    assert ssm.get_parameter_cached("some_key_11") == "value 11"
+    assert ssm.get_parameter_cached("/service/db/password", decrypt=True) == "password"
+    assert get_parameter.call_count == 0
+
+    assert ssm.prefetch_parameters(["/service/db/host"]) == {"/service/db/host": "localhost"}
+
+
+@mock_aws
+@pytest.mark.usefixtures("environment")
+def test_prefetch_parameters_missing():
+    reload(ssm)
+
+    ssm_client = boto3.client("ssm")
+    ssm_client.put_parameter(Name="some_key", Type="String", Value="some value")
+
+    with pytest.raises(Exception) as e:
+        ssm.prefetch_parameters(["some_key", "missing_key", "other_missing_key"])
+
+    assert str(e.value) == "Parameters not found: missing_key, other_missing_key"
+
+    with pytest.raises(Exception) as e:
+        ssm.prefetch_parameters(["/missing/"])
+
+    assert str(e.value) == "No parameters found under path: /missing/"
+
+    assert ssm.prefetch_parameters() == {}
+
+
+@mock_aws
+def test_prefetch_parameters_on_import(mocker: MockerFixture):
+    mocker.patch.dict(os.environ, {"AWS_DEFAULT_REGION": "ca-central-1"})
+
+    ssm_client = boto3.client("ssm")
+    ssm_client.put_parameter(Name="some_key", Type="String", Value="some value")
+    ssm_client.put_parameter(Name="/service/db/password", Type="SecureString", Value="password")
+
+    mocker.patch.dict(
+        os.environ,
+        {
+            "AWS_LAMBDA_FUNCTION_NAME": "Test_Lambda_Function",
+            "BOTO_BUDDY_SSM_PREFETCH": "some_key, /service/",
+            "BOTO_BUDDY_SSM_PREFETCH_DECRYPT": "true",
+        },
+    )
+    reload(ssm)
+
+    get_parameter = mocker.spy(ssm.get_ssm_client(), "get_parameter")
+
+    assert ssm.get_parameter_cached("some_key", decrypt=True) == "some value"
+    assert ssm.get_parameter_cached("/service/db/password", decrypt=True) == "password"
+    assert get_parameter.call_count == 0
+
+    mocker.patch.dict(os.environ, {"BOTO_BUDDY_SSM_PREFETCH": "some_key,missing_key"})
+
+    with pytest.raises(Exception) as e:
+        reload(ssm)
+
+    assert str(e.value) == "Parameters not found: missing_key"